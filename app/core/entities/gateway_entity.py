@@ -12,6 +12,9 @@ class GatewayEntity:
         self, name: str, version: str, listen_address: str, listen_port: int,
         allowed_ips: list[str], blocked_ips: list[str], redirection: dict | None = None,
         load_balancing: dict | None = None, logging: dict | None = None, security: dict | None = None,
+        allowed_ip_feeds: list[str] | None = None, blocked_ip_feeds: list[str] | None = None,
+        config_reload: dict | None = None, caching: dict | None = None, coalescing: dict | None = None,
+        metrics: dict | None = None, admin: dict | None = None,
     ):
         """
         Initializes a new instance of the GatewayEntity.
@@ -25,6 +28,14 @@ class GatewayEntity:
         :param redirection: Redirection rules
         :param load_balancing: Load balancing settings
         :param logging: Logging settings
+        :param security: Security settings
+        :param allowed_ip_feeds: Paths to plain-text files of allowed addresses and CIDR ranges
+        :param blocked_ip_feeds: Paths to plain-text files of blocked addresses and CIDR ranges
+        :param config_reload: Hot configuration reload settings
+        :param caching: Response cache settings
+        :param coalescing: Request coalescing settings
+        :param metrics: Prometheus metrics settings
+        :param admin: Admin endpoints settings
         """
         self.name = name
         self.version = version
@@ -36,3 +47,10 @@ class GatewayEntity:
         self.load_balancing = load_balancing or {}
         self.logging = logging or {}
         self.security = security or {}
+        self.allowed_ip_feeds = allowed_ip_feeds or []
+        self.blocked_ip_feeds = blocked_ip_feeds or []
+        self.config_reload = config_reload or {}
+        self.caching = caching or {}
+        self.coalescing = coalescing or {}
+        self.metrics = metrics or {}
+        self.admin = admin or {}
@@ -1,38 +1,210 @@
 # app/core/services/auth.py
 from __future__ import annotations
 
+import calendar
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from collections.abc import Callable
 from datetime import datetime
 from datetime import timedelta
 
 from fastapi import Depends
 from fastapi import HTTPException
 from fastapi.security import OAuth2PasswordBearer
+from jose import jwk
 from jose import jwt
 from jose import JWTError
+from jose.backends.base import Key
+from jose.constants import ALGORITHMS
+from jose.utils import base64url_encode
 
 SECRET_KEY = 'supersecretkey'
 ALGORITHM = 'HS256'
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Claims holding a time, encoded as seconds since the epoch
+TIME_CLAIMS = ('exp', 'iat', 'nbf')
+
 # OAuth2 scheme for token authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl='token')
 
-def create_access_token(data: dict, expires_delta: timedelta | None = None):
+
+class KeySet:
+    """
+    Verification keys by key ID ("kid"), parsed once into key objects, plus the key that
+    signs the tokens issued by the gateway. HMAC secrets and RSA or EC keys from a local
+    JWKS file can be mixed; a key is only accepted for the algorithm it is declared with.
+    """
+
+    def __init__(self, keys: dict[str, tuple[str, Key]], signing_kid: str | None = None):
+        """
+        :param keys: Key ID mapped to (algorithm, key); '' is the key of tokens without a kid
+        :param signing_kid: ID of the key signing issued tokens, None if the gateway does not issue tokens
+        :raises ValueError: If the signing key is unknown or is a public key
+        """
+        self.keys: dict[str, tuple[str, Key]] = {}
+        for kid, (algorithm, key) in keys.items():
+            # Private asymmetric keys are kept for signing, verification only needs the public half
+            public = key if algorithm in ALGORITHMS.HMAC or key.is_public() else key.public_key()
+            self.keys[kid] = (algorithm, public)
+
+        self.signing_key: Key | None = None
+        if signing_kid is not None:
+            if signing_kid not in keys:
+                raise ValueError(f"Unknown signing key: {signing_kid}")
+            algorithm, key = keys[signing_kid]
+            if algorithm not in ALGORITHMS.HMAC and key.is_public():
+                raise ValueError(f"Signing key {signing_kid} has no private key")
+            header = {'alg': algorithm, 'typ': 'JWT'}
+            if signing_kid:
+                header['kid'] = signing_kid
+            self.signing_key = key
+            # The header of issued tokens never changes, so it is encoded once
+            self.header_segment = base64url_encode(json.dumps(header, separators=(',', ':')).encode())
+
+    @classmethod
+    def from_config(cls, authentication: dict) -> KeySet:
+        """
+        Builds the key set of the `security.authentication` settings.
+
+        :param authentication: The settings; `secret_key` and `algorithm` define the key of tokens
+            without a kid, `jwks_file` a local JWK Set and `signing_key` the kid of the signing key
+        :return: The key set
+        :raises ValueError: If a key is invalid or uses an unsupported algorithm
+        """
+        keys: dict[str, tuple[str, Key]] = {}
+        jwks_file = authentication.get('jwks_file')
+        if 'secret_key' in authentication or not jwks_file:
+            algorithm = authentication.get('algorithm', ALGORITHM)
+            keys[''] = (algorithm, cls.construct(authentication.get('secret_key', SECRET_KEY), algorithm))
+
+        if jwks_file:
+            with open(jwks_file) as file:
+                jwks = json.load(file)
+            for jwk_data in jwks.get('keys', []):
+                algorithm = jwk_data.get('alg') or authentication.get('algorithm')
+                if not algorithm:
+                    raise ValueError(f"Key {jwk_data.get('kid', '')!r} of {jwks_file} declares no algorithm")
+                keys[jwk_data.get('kid', '')] = (algorithm, cls.construct(jwk_data, algorithm))
+
+        return cls(keys, authentication.get('signing_key', '' if '' in keys else None))
+
+    @staticmethod
+    def construct(key_data: str | dict, algorithm: str) -> Key:
+        if algorithm not in ALGORITHMS.SUPPORTED:
+            raise ValueError(f"Unsupported JWT algorithm: {algorithm}")
+        try:
+            return jwk.construct(key_data, algorithm)
+        except JWTError as e:
+            raise ValueError(f"Invalid {algorithm} key: {e}") from e
+
+    def encode(self, claims: dict) -> str:
+        """
+        Signs claims into a token with the signing key.
+
+        :param claims: The claims; datetimes in exp, iat and nbf are converted to timestamps
+        :return: The compact JWS
+        """
+        if self.signing_key is None:
+            raise ValueError('No signing key is configured')
+        claims = {
+            name: calendar.timegm(value.utctimetuple()) if name in TIME_CLAIMS and isinstance(value, datetime) else value
+            for name, value in claims.items()
+        }
+        signing_input = self.header_segment + b'.' + base64url_encode(json.dumps(claims, separators=(',', ':')).encode())
+        return (signing_input + b'.' + base64url_encode(self.signing_key.sign(signing_input))).decode()
+
+    def decode(self, token: str) -> dict:
+        """
+        Verifies a token with the key named by its kid header.
+
+        :param token: The token
+        :return: The verified claims
+        :raises JWTError: If the token is malformed, its key is unknown, its signature is
+            invalid or its claims are expired or not valid yet
+        """
+        header = jwt.get_unverified_header(token)
+        entry = self.keys.get(header.get('kid', ''))
+        if entry is None:
+            raise JWTError('Unknown key ID')
+        algorithm, key = entry
+        return jwt.decode(token, key, algorithms=[algorithm])
+
+
+class TokenVerifier:
+    """
+    Verifies tokens with a key set and keeps the claims of verified tokens in a bounded LRU
+    cache keyed by a digest of the token, so a token presented many times is only decoded and
+    checked once. Entries expire with the token, and after `max_cache_ttl` seconds at most.
+    """
+
+    def __init__(
+        self, key_set: KeySet, cache_size: int = 10_000, max_cache_ttl: float = 300,
+        clock: Callable[[], float] = time.time,
+    ):
+        """
+        :param key_set: The keys tokens are verified with
+        :param cache_size: Maximum number of verified tokens kept
+        :param max_cache_ttl: Seconds after which a token is verified again even if it has not expired
+        :param clock: Returns the current time
+        """
+        self.key_set = key_set
+        self.cache_size = cache_size
+        self.max_cache_ttl = max_cache_ttl
+        self.clock = clock
+        self.verified: OrderedDict[bytes, tuple[dict, float]] = OrderedDict()  # digest -> (claims, valid until)
+
+    def verify(self, token: str) -> dict:
+        """
+        Verifies a token.
+
+        :param token: The token
+        :return: The verified claims, shared with later calls for the same token
+        :raises HTTPException: If the token is invalid or expired
+        """
+        digest = hashlib.blake2b(token.encode(), digest_size=16).digest()
+        now = self.clock()
+        cached = self.verified.get(digest)
+        if cached is not None:
+            if now < cached[1]:
+                self.verified.move_to_end(digest)
+                return cached[0]
+            del self.verified[digest]
+
+        try:
+            payload = self.key_set.decode(token)
+        except JWTError:
+            raise HTTPException(status_code=401, detail='Invalid or expired token')
+
+        valid_until = now + self.max_cache_ttl
+        if isinstance(payload.get('exp'), (int, float)):
+            valid_until = min(valid_until, payload['exp'])
+        if self.cache_size > 0:
+            self.verified[digest] = (payload, valid_until)
+            if len(self.verified) > self.cache_size:
+                self.verified.popitem(last=False)
+        return payload
+
+
+# Verifier of the default HS256 secret, used where no gateway configuration is at hand
+default_verifier = TokenVerifier(KeySet.from_config({}))
+
+def create_access_token(data: dict, expires_delta: timedelta | None = None, key_set: KeySet | None = None):
     """
     Create a JWT token that encodes the given data.
 
     :param data: The payload (user claims)
     :param expires_delta: Optional expiration time for the token
+    :param key_set: Key set signing the token, the default secret if not given
     :return: Encoded JWT token
     """
     to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.now() + expires_delta
-    else:
-        expire = datetime.now() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({'exp': expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+    if expires_delta is None:
+        expires_delta = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+    to_encode.update({'exp': int(time.time() + expires_delta.total_seconds())})
+    return (key_set or default_verifier.key_set).encode(to_encode)
 
 def verify_token(token: str = Depends(oauth2_scheme)):
     """
@@ -42,8 +214,4 @@ def verify_token(token: str = Depends(oauth2_scheme)):
     :return: Decoded token data if valid
     :raises HTTPException: If the token is invalid or expired
     """
-    try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
-    except JWTError:
-        raise HTTPException(status_code=401, detail='Invalid or expired token')
+    return default_verifier.verify(token)
@@ -0,0 +1,196 @@
+# app/core/services/circuit_breaker.py
+from __future__ import annotations
+
+import time
+from array import array
+from collections.abc import Callable
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+DEFAULT_CIRCUIT_BREAKER_CONFIG = {
+    'window': 10.0,  # seconds of requests the rates are computed over
+    'buckets': 10,  # slots of the rolling window
+    'min_requests': 20,  # requests in the window before the circuit may open
+    'failure_rate_threshold': 0.5,  # share of failed requests opening the circuit
+    'slow_call_duration': 5.0,  # seconds after which a response counts as slow
+    'slow_call_rate_threshold': 0.8,  # share of slow responses opening the circuit
+    'open_duration': 30.0,  # seconds before an open circuit lets probe requests through
+    'half_open_requests': 3,  # probe requests that must succeed to close the circuit
+}
+
+# Called with the server and its new state whenever a circuit changes, e.g. to publish metrics
+circuit_listeners: list[Callable[[dict, str], None]] = []
+
+
+def add_circuit_listener(listener: Callable[[dict, str], None]):
+    """
+    Registers a function called on every circuit state change, once whatever the number of calls.
+    """
+    if listener not in circuit_listeners:
+        circuit_listeners.append(listener)
+
+
+def notify_circuit_change(server: dict, state: str):
+    """
+    Reports a circuit state change to the registered listeners.
+
+    :param server: The backend whose circuit changed
+    :param state: Its new state
+    """
+    for listener in circuit_listeners:
+        listener(server, state)
+
+
+class RollingCounts:
+    """
+    Request, failure and slow response counts over the last `window` seconds, kept in a ring
+    of fixed time slots with running totals. Recording and reading are O(1): a slot is
+    cleared when the ring comes back to it.
+    """
+
+    __slots__ = ('width', 'size', 'epoch', 'requests', 'failures', 'slow', 'totals')
+
+    def __init__(self, window: float = 10.0, buckets: int = 10):
+        """
+        :param window: Seconds covered by the counts
+        :param buckets: Number of slots the window is divided into
+        """
+        if window <= 0 or buckets < 1:
+            raise ValueError('The rolling window needs a positive duration and at least one bucket')
+        self.width = window / buckets
+        self.size = buckets
+        self.epoch = 0  # Number of the newest slot since the clock origin
+        self.requests = array('I', bytes(4 * buckets))
+        self.failures = array('I', bytes(4 * buckets))
+        self.slow = array('I', bytes(4 * buckets))
+        self.totals = [0, 0, 0]
+
+    def _advance(self, now: float) -> int:
+        epoch = int(now / self.width)
+        if epoch > self.epoch:
+            # Clear the slots the clock went past, at most the whole ring
+            for number in range(max(self.epoch + 1, epoch - self.size + 1), epoch + 1):
+                slot = number % self.size
+                self.totals[0] -= self.requests[slot]
+                self.totals[1] -= self.failures[slot]
+                self.totals[2] -= self.slow[slot]
+                self.requests[slot] = self.failures[slot] = self.slow[slot] = 0
+            self.epoch = epoch
+        return self.epoch % self.size
+
+    def add(self, now: float, failed: bool, slow: bool):
+        slot = self._advance(now)
+        self.requests[slot] += 1
+        self.totals[0] += 1
+        if failed:
+            self.failures[slot] += 1
+            self.totals[1] += 1
+        if slow:
+            self.slow[slot] += 1
+            self.totals[2] += 1
+
+    def counts(self, now: float) -> tuple[int, int, int]:
+        """
+        :return: The requests, failures and slow responses in the window
+        """
+        self._advance(now)
+        return self.totals[0], self.totals[1], self.totals[2]
+
+    def reset(self):
+        for counter in (self.requests, self.failures, self.slow):
+            for slot in range(self.size):
+                counter[slot] = 0
+        self.totals = [0, 0, 0]
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker of one backend.
+
+    Closed: requests go through, and the circuit opens once the failure rate or the slow
+    response rate of the rolling window crosses its threshold. Open: the backend receives no
+    requests for `open_duration` seconds, then the circuit is half-open. Half-open: up to
+    `half_open_requests` probe requests go through; the circuit closes when they all succeed
+    and opens again on the first failure.
+
+    The expiry of the open state is driven by the caller (see LoadBalancingStrategyWithHealth),
+    which keeps the circuits of all the backends on one timer list.
+    """
+
+    def __init__(self, config: dict | None = None, clock=time.monotonic):
+        """
+        :param config: The `circuit_breaker` settings
+        :param clock: Monotonic clock, replaced in tests
+        """
+        settings = {**DEFAULT_CIRCUIT_BREAKER_CONFIG, **(config or {})}
+        self.min_requests = settings['min_requests']
+        self.failure_rate_threshold = settings['failure_rate_threshold']
+        self.slow_call_duration = settings['slow_call_duration']
+        self.slow_call_rate_threshold = settings['slow_call_rate_threshold']
+        self.open_duration = settings['open_duration']
+        self.half_open_requests = settings['half_open_requests']
+        self.clock = clock
+        self.window = RollingCounts(settings['window'], settings['buckets'])
+        self.state = CLOSED
+        self.changed_at = clock()
+        self.probes = 0  # Probe requests sent while half-open
+        self.probe_successes = 0
+
+    def allows_requests(self) -> bool:
+        """
+        :return: True if the backend may be selected
+        """
+        return self.state == CLOSED or (self.state == HALF_OPEN and self.probes < self.half_open_requests)
+
+    def record(self, latency: float, success: bool) -> bool:
+        """
+        Records the outcome of a request.
+
+        :param latency: Seconds until the response headers were received, or until the failure
+        :param success: False if the request failed or the backend answered with a 5xx status
+        :return: True if the state changed
+        """
+        failed = not success or latency >= self.slow_call_duration
+        if self.state == HALF_OPEN:
+            if failed:
+                self.transition(OPEN)
+                return True
+            self.probe_successes += 1
+            if self.probe_successes >= self.half_open_requests:
+                self.transition(CLOSED)
+                return True
+            return False
+        if self.state == OPEN:
+            return False  # A request sent before the circuit opened
+
+        now = self.clock()
+        self.window.add(now, not success, latency >= self.slow_call_duration)
+        requests, failures, slow = self.window.counts(now)
+        if requests >= self.min_requests and (
+            failures >= self.failure_rate_threshold * requests or slow >= self.slow_call_rate_threshold * requests
+        ):
+            self.transition(OPEN)
+            return True
+        return False
+
+    def transition(self, state: str):
+        self.state = state
+        self.changed_at = self.clock()
+        self.probes = self.probe_successes = 0
+        if state == CLOSED:
+            self.window.reset()
+
+    def snapshot(self) -> dict:
+        """
+        :return: The state and the counts of the rolling window
+        """
+        requests, failures, slow = self.window.counts(self.clock())
+        return {
+            'state': self.state,
+            'since_seconds': round(self.clock() - self.changed_at, 3),
+            'requests': requests,
+            'failure_rate': round(failures / requests, 4) if requests else 0.0,
+            'slow_call_rate': round(slow / requests, 4) if requests else 0.0,
+        }
@@ -0,0 +1,121 @@
+# app/core/services/edge_auth.py
+from __future__ import annotations
+
+import json
+import re
+from collections.abc import Iterable
+from collections.abc import Mapping
+
+from fastapi import HTTPException
+
+from app.core.services.auth import TokenVerifier
+from app.core.services.prefix_trie import PrefixTrie
+
+DEFAULT_CLAIM_HEADERS = {'sub': 'X-Auth-Subject'}
+
+REPEATED_SLASHES = re.compile(r'/{2,}')
+
+
+def canonical_path(path: str) -> str:
+    """
+    Brings a request path to the form the path rules are matched against: lowercase, with
+    repeated slashes collapsed and a trailing slash, so that "/API//orders" and a bare "/api"
+    fall under the "/api/" prefix.
+
+    :param path: The decoded request path
+    :return: The canonical path
+    :raises HTTPException: 400 if the path has "." or ".." segments, which the upstream client
+        resolves, so the backend would get another path than the one checked
+    """
+    segments = path.split('/')
+    if '.' in segments or '..' in segments:
+        raise HTTPException(status_code=400, detail='Invalid request path.')
+    path = REPEATED_SLASHES.sub('/', path.lower())
+    return path if path.endswith('/') else path + '/'
+
+
+class EdgeAuthenticator:
+    """
+    Validates bearer tokens at the gateway for protected path prefixes, so backends can trust
+    the verified claims forwarded as request headers instead of checking tokens themselves.
+
+    Protected and public prefixes are compiled into one trie and the longest match wins, so
+    a public prefix can open a sub-tree of a protected one. Paths are matched in their
+    canonical form, see canonical_path(). The claim headers are removed
+    from every incoming request, protected or not, so clients cannot spoof them.
+    """
+
+    def __init__(self, edge: dict, verifier: TokenVerifier):
+        """
+        Compiles the path rules.
+
+        :param edge: The `security.authentication.edge` settings
+        :param verifier: Verifies the bearer tokens
+        """
+        self.verifier = verifier
+        self.paths: PrefixTrie[bool] = PrefixTrie()
+        # Public prefixes are inserted first, so they win over an identical protected prefix
+        for prefix in edge.get('public_paths', []):
+            self.paths.insert(prefix.rstrip('*').lower(), False)
+        for prefix in edge.get('protected_paths', []):
+            self.paths.insert(prefix.rstrip('*').lower(), True)
+        # claim -> lowercase header name
+        self.claim_headers = {
+            claim: header.lower() for claim, header in edge.get('claim_headers', DEFAULT_CLAIM_HEADERS).items()
+        }
+        self.forward_token = edge.get('forward_token', True)
+        self.stripped = frozenset(self.claim_headers.values()) | (frozenset() if self.forward_token else {'authorization'})
+
+    def is_protected(self, path: str) -> bool:
+        """
+        :raises HTTPException: 400 if the path has dot segments
+        """
+        match = self.paths.longest_match(canonical_path(path))
+        return match is not None and match[1]
+
+    def authenticate(self, path: str, headers: Mapping[str, str]) -> dict | None:
+        """
+        Verifies the bearer token of a request to a protected path.
+
+        :param path: The request path
+        :param headers: The request headers
+        :return: The verified claims, or None if the path is not protected
+        :raises HTTPException: 400 if the path has dot segments, 401 if the token is missing,
+            invalid or expired
+        """
+        if not self.is_protected(path):
+            return None
+        scheme, _, token = headers.get('authorization', '').partition(' ')
+        if scheme.lower() != 'bearer' or not token.strip():
+            raise HTTPException(status_code=401, detail='Not authenticated', headers={'WWW-Authenticate': 'Bearer'})
+        try:
+            return self.verifier.verify(token.strip())
+        except HTTPException as e:
+            raise HTTPException(
+                status_code=401, detail=e.detail, headers={'WWW-Authenticate': 'Bearer error="invalid_token"'},
+            )
+
+    def upstream_headers(self, headers: Iterable[tuple[str, str]], claims: dict | None) -> list[tuple[str, str]]:
+        """
+        Builds the headers forwarded to the backend: the request headers without the trusted
+        header names, plus the verified claims.
+
+        :param headers: The request headers
+        :param claims: The verified claims, None for requests to unprotected paths
+        :return: The forwarded headers
+        """
+        forwarded = [(name, value) for name, value in headers if name.lower() not in self.stripped]
+        if claims:
+            for claim, header in self.claim_headers.items():
+                if claim in claims:
+                    forwarded.append((header, self.header_value(claims[claim])))
+        return forwarded
+
+    @staticmethod
+    def header_value(value) -> str:
+        if isinstance(value, (list, tuple)):
+            value = ' '.join(str(item) for item in value)
+        elif not isinstance(value, str):
+            value = json.dumps(value, separators=(',', ':'))
+        # Header values are latin-1, keep anything else readable by the backend
+        return value if value.isascii() and value.isprintable() else json.dumps(value)
@@ -1,9 +1,15 @@
 from __future__ import annotations
 
 import logging
+import time
 import urllib.parse
+from collections.abc import Callable
+from collections.abc import Collection
+from collections.abc import Iterable
+from collections.abc import Mapping
 from datetime import timedelta
-from itertools import cycle
+from http.cookies import CookieError
+from http.cookies import SimpleCookie
 
 from fastapi import HTTPException
 
@@ -11,37 +17,130 @@ from .logger import logger
 from app.core.entities.gateway_entity import GatewayEntity
 from app.core.services.auth import ACCESS_TOKEN_EXPIRE_MINUTES
 from app.core.services.auth import create_access_token
-from app.core.services.auth import verify_token
+from app.core.services.auth import KeySet
+from app.core.services.auth import TokenVerifier
+from app.core.services.circuit_breaker import notify_circuit_change
+from app.core.services.edge_auth import EdgeAuthenticator
+from app.core.services.ip_set import IPSet
+from app.core.services.load_balancer_service import LoadBalancerService
 from app.core.services.logger import configure_logging
+from app.core.services.rate_limiter import LocalRateLimitBackend
+from app.core.services.rate_limiter import RateLimitBackend
 from app.core.services.rate_limiter import RateLimiter
+from app.core.services.redirect_table import DEFAULT_CACHE_SIZE
+from app.core.services.redirect_table import RedirectTable
+from app.core.services.retry_policy import RetryPolicy
+from app.core.services.session_manager import LocalSessionBackend
+from app.core.services.session_manager import SessionBackend
 from app.core.services.session_manager import SessionManager
 from app.core.services.waf import WAF
 
+
+def ignore_stage(stage: str, seconds: float):
+    """
+    Stage timing observer of services built without one.
+    """
+
+
 class GatewayService:
     """
     Service layer for managing gateway operations including access control,
     redirection, load balancing, rate limiting, and WAF.
     """
 
-    def __init__(self, gateway: GatewayEntity):
+    def __init__(
+        self, gateway: GatewayEntity, previous: GatewayService | None = None,
+        rate_limit_backends: Callable[[dict], RateLimitBackend | None] | None = None,
+        session_backends: Callable[[dict], SessionBackend | None] | None = None,
+        observe_stage: Callable[[str, float], None] | None = None,
+    ):
         """
         Initializes the service with a specific gateway entity.
 
         :param gateway: The gateway entity containing configuration and state
+        :param previous: The service being replaced on a configuration reload. Its rate limiter,
+            session manager and retry policy are reused when their settings did not change, but
+            its live state is left alone: call carry_over() before publishing the new service
+        :param rate_limit_backends: Builds the shared backend selected by the `rate_limiting`
+            settings, None for the in-process one. Taken from `previous` when not given.
+        :param session_backends: Builds the shared backend selected by the `session_management`
+            settings, None for the in-process one. Taken from `previous` when not given.
+        :param observe_stage: Called with a stage name ("waf", "rate_limit") and the seconds it
+            took, e.g. to feed a latency histogram. Taken from `previous` when not given.
         """
         self.gateway = gateway
-        configure_logging(self.gateway.logging)
-        self.server_iterator = cycle(self.gateway.load_balancing.get('servers', [])) if self.gateway.load_balancing.get('enabled', False) else None
+        # Set up by the interface layer, so the core does not depend on the storage implementations
+        self.rate_limit_backends = rate_limit_backends or (previous.rate_limit_backends if previous else None)
+        self.session_backends = session_backends or (previous.session_backends if previous else None)
+        self.observe_stage = observe_stage or (previous.observe_stage if previous else ignore_stage)
+        if previous is None:
+            configure_logging(self.gateway.logging)
+
+        # Initialize Load Balancer
+        load_balancing = self.gateway.load_balancing
+        health_check = load_balancing.get('health_check', {})
+        circuit_breaker = load_balancing.get('circuit_breaker', {})
+        if load_balancing.get('enabled', False) and load_balancing.get('servers'):
+            self.load_balancer: LoadBalancerService | None = LoadBalancerService(
+                load_balancing.get('strategy', 'round-robin'), load_balancing['servers'],
+                enable_health_checking=health_check.get('enabled', False),
+                # Active probes bring failed servers back, otherwise they are retried after a cooldown
+                cooldown_period=None if health_check.get('active', False) else health_check.get('cooldown_period', 60),
+                circuit_breaker=circuit_breaker if circuit_breaker.get('enabled', False) else None,
+                on_circuit_change=notify_circuit_change,
+            )
+        else:
+            self.load_balancer = None
+
+        # Retries and hedged attempts; the budget and latency samples survive reloads that keep the settings
+        retries = load_balancing.get('retries', {})
+        if not retries.get('enabled', False):
+            self.retry_policy: RetryPolicy | None = None
+        elif previous and previous.retry_policy and previous.gateway.load_balancing.get('retries') == retries:
+            self.retry_policy = previous.retry_policy
+        else:
+            self.retry_policy = RetryPolicy(retries)
+
+        # Request attribute used as routing key by the consistent-hash strategy
+        hash_key = load_balancing.get('hash_key', 'client_ip')
+        kind, _, name = hash_key.partition(':')
+        if kind not in ('client_ip', 'header', 'cookie', 'path_segment'):
+            raise ValueError(f"Unsupported load balancing hash key: {hash_key}")
+        if self.load_balancer and self.load_balancer.strategy_name == 'consistent-hash':
+            self.hash_key: tuple[str, str] | None = (kind, name.lower() if kind == 'header' else name)
+        else:
+            self.hash_key = None
+
+        # Compile the access control lists, including CIDR ranges and feed files
+        self.allowed_ips = IPSet.from_sources(self.gateway.allowed_ips, self.gateway.allowed_ip_feeds)
+        self.blocked_ips = IPSet.from_sources(self.gateway.blocked_ips, self.gateway.blocked_ip_feeds)
+        self.admin_ips = IPSet(self.gateway.admin.get('allowed_ips', ['127.0.0.1', '::1']))
+
+        # Compile the redirection rules
+        if self.gateway.redirection.get('enabled', False):
+            self.redirect_table: RedirectTable | None = RedirectTable(
+                self.gateway.redirection, self.gateway.listen_address,
+                self.gateway.redirection.get('cache_size', DEFAULT_CACHE_SIZE),
+            )
+        else:
+            self.redirect_table = None
 
         # Initialize Rate Limiter
-        if self.gateway.security.get('rate_limiting', {}).get('enabled', False):
-            rate_limit_config = self.gateway.security['rate_limiting']
-            self.rate_limiter: RateLimiter | None = RateLimiter(
+        rate_limit_config = self.gateway.security.get('rate_limiting', {})
+        previous_limiter = previous.rate_limiter if previous else None
+        if not rate_limit_config.get('enabled', False):
+            self.rate_limiter: RateLimiter | None = None
+        elif previous_limiter and previous.gateway.security.get('rate_limiting') == rate_limit_config:
+            # Unchanged settings: keep the counters, bans and backend connections as they are
+            self.rate_limiter = previous_limiter
+        else:
+            self.rate_limiter = RateLimiter(
                 max_requests=rate_limit_config['max_requests_per_minute'],
                 ban_duration=rate_limit_config['ban_duration'],
+                algorithm=rate_limit_config.get('algorithm', 'sliding-window'),
+                max_tracked_clients=rate_limit_config.get('max_tracked_clients', 1_000_000),
+                backend=self.rate_limit_backends(rate_limit_config) if self.rate_limit_backends else None,
             )
-        else:
-            self.rate_limiter = None
 
         # Initialize WAF
         if self.gateway.security.get('waf', {}).get('enabled', False):
@@ -49,20 +148,95 @@ class GatewayService:
         else:
             self.waf = None  # Use None when WAF is disabled
 
+        # Parse the token keys once, verified tokens are cached until they expire
+        authentication = self.gateway.security.get('authentication', {})
+        self.token_verifier = TokenVerifier(
+            KeySet.from_config(authentication),
+            cache_size=authentication.get('verify_cache_size', 10_000),
+            max_cache_ttl=authentication.get('verify_cache_max_ttl', 300),
+        )
+        self.access_token_lifetime = timedelta(
+            minutes=authentication.get('access_token_expire_minutes', ACCESS_TOKEN_EXPIRE_MINUTES),
+        )
+        if authentication.get('edge', {}).get('enabled', False):
+            self.edge_auth: EdgeAuthenticator | None = EdgeAuthenticator(authentication['edge'], self.token_verifier)
+        else:
+            self.edge_auth = None
+
         # Initialize Session Manager
         if self.gateway.security.get('session_management', {}).get('enabled', False):
             session_config = self.gateway.security['session_management']
-            self.session_manager: SessionManager | None = SessionManager(session_config['session_timeout'])
+            previous_config = previous.gateway.security.get('session_management', {}) if previous else {}
+            if previous and previous.session_manager \
+                    and session_config.get('backend', 'local') == previous_config.get('backend', 'local'):
+                # Same storage: keep the sessions, carry_over() applies the new limits to them
+                self.session_manager: SessionManager | None = previous.session_manager
+            else:
+                self.session_manager = SessionManager(
+                    session_config['session_timeout'],
+                    max_sessions=session_config.get('max_sessions', 100_000),
+                    backend=self.session_backends(session_config) if self.session_backends else None,
+                )
         else:
             self.session_manager = None
 
+    def carry_over(self, previous: GatewayService):
+        """
+        Takes over the live state of the service being replaced: logging settings, unhealthy
+        servers and circuits, active bans, and the new limits of the kept sessions. Must run
+        on the event loop, which the previous service keeps using until the new one is published.
+
+        :param previous: The service being replaced, the one given to the constructor
+        """
+        configure_logging(self.gateway.logging)
+        if self.load_balancer and previous.load_balancer:
+            self.load_balancer.carry_over_health(previous.load_balancer)
+
+        # Counters kept under other settings cannot be reused, but active bans still apply
+        if self.rate_limiter and previous.rate_limiter and self.rate_limiter is not previous.rate_limiter \
+                and isinstance(previous.rate_limiter.backend, LocalRateLimitBackend) \
+                and isinstance(self.rate_limiter.backend, LocalRateLimitBackend):
+            self.rate_limiter.backend.banned_ips.update(previous.rate_limiter.backend.banned_ips)
+
+        if self.session_manager and self.session_manager is previous.session_manager:
+            session_config = self.gateway.security['session_management']
+            self.session_manager.session_timeout = session_config['session_timeout']
+            if isinstance(self.session_manager.backend, LocalSessionBackend):
+                self.session_manager.backend.max_sessions = session_config.get('max_sessions', 100_000)
+
+    def backends(self) -> list:
+        """
+        :return: The rate limiting and session backends in use
+        """
+        return [
+            backend for backend in (
+                self.rate_limiter.backend if self.rate_limiter else None,
+                self.session_manager.backend if self.session_manager else None,
+            ) if backend is not None
+        ]
+
+    def close(self, replacement: GatewayService | None = None):
+        """
+        Releases the rate limiting and session backends: shared memory blocks, server connections.
+
+        :param replacement: The service replacing this one on a reload; the backends it carried
+            over are left open
+        """
+        kept = replacement.backends() if replacement else []
+        for backend in self.backends():
+            if any(backend is reused for reused in kept):
+                continue
+            close = getattr(backend, 'close', None)
+            if close is not None:
+                close()
+
     def start(self):
         """
         Starts the gateway, setting up the necessary configurations and listening
         on the specified address and port.
         """
-        logger.info(f"Starting {self.gateway.name} version {self.gateway.version}...")
-        logger.info(f"Listening on {self.gateway.listen_address}:{self.gateway.listen_port}")
+        logger.info('Starting %s version %s...', self.gateway.name, self.gateway.version)
+        logger.info('Listening on %s:%s', self.gateway.listen_address, self.gateway.listen_port)
 
     def check_access(self, client_ip: str):
         """
@@ -71,21 +245,55 @@ class GatewayService:
         :param client_ip: The IP address of the client making the request
         :raises HTTPException: If the IP is blocked or rate limit exceeded
         """
-        logger.info(f"Checking access for IP: {client_ip}")
-        if self.rate_limiter and not self.rate_limiter.is_allowed(client_ip):
-            logger.warning(f"Rate limit exceeded for IP: {client_ip}")
+        logger.info('Checking access for IP: %s', client_ip)
+        self.check_rate_limit(client_ip)
+        self.check_ip_lists(client_ip)
+        logger.info('Access granted for IP: %s', client_ip)
+
+    def check_rate_limit(self, client_ip: str):
+        """
+        Counts a request of the client against the rate limit.
+
+        :param client_ip: The IP address of the client making the request
+        :raises HTTPException: 429 if the client exceeded the limit or is banned
+        """
+        if not self.rate_limiter:
+            return
+        started = time.perf_counter()
+        try:
+            allowed = self.rate_limiter.is_allowed(client_ip)
+        finally:
+            self.observe_stage('rate_limit', time.perf_counter() - started)
+        if not allowed:
+            logger.warning('Rate limit exceeded for IP: %s', client_ip)
             raise HTTPException(status_code=429, detail='Too many requests. You are temporarily banned.')
 
-        if client_ip in self.gateway.blocked_ips:
-            logger.warning(f"Access denied for blocked IP: {client_ip}")
+    def check_admin_access(self, client_ip: str):
+        """
+        Checks that the client may use the admin endpoints.
+
+        :param client_ip: The IP address of the client making the request
+        :raises HTTPException: 403 if the client is not in admin.allowed_ips
+        """
+        if client_ip not in self.admin_ips:
+            logger.warning('Admin access denied for IP: %s', client_ip)
+            raise HTTPException(status_code=403, detail='Access denied.')
+
+    def check_ip_lists(self, client_ip: str):
+        """
+        Checks the client IP against the blocked and allowed lists.
+
+        :param client_ip: The IP address of the client making the request
+        :raises HTTPException: 403 if the IP is blocked or not allowed
+        """
+        if client_ip in self.blocked_ips:
+            logger.warning('Access denied for blocked IP: %s', client_ip)
             raise HTTPException(status_code=403, detail='Access denied: Your IP is blocked.')
 
-        if self.gateway.allowed_ips and client_ip not in self.gateway.allowed_ips:
-            logger.warning(f"Access denied for IP not in allowed list: {client_ip}")
+        if self.allowed_ips and client_ip not in self.allowed_ips:
+            logger.warning('Access denied for IP not in allowed list: %s', client_ip)
             raise HTTPException(status_code=403, detail='Access denied: Your IP is not allowed.')
 
-        logger.info(f"Access granted for IP: {client_ip}")
-
     def handle_redirection(self, request_path: str, request_port: int, query_params: dict = {}) -> str:
         """
         Handles redirection based on the configured rules and includes query parameters.
@@ -95,36 +303,19 @@ class GatewayService:
         :param query_params: The query parameters of the incoming request
         :return: A URL to redirect to or an empty string if no redirection is needed
         """
-        if not self.gateway.redirection.get('enabled', False):
+        if self.redirect_table is None:
             return ''
 
-        for rule in self.gateway.redirection.get('rules', []):
-            if rule['action'] == 'redirect':
-                # Handling redirection based on source port
-                if 'source_port' in rule and request_port == rule['source_port']:
-                    redirect_url = f"https://{self.gateway.listen_address}:{rule['destination_port']}{request_path}"
-
-                    # Append query parameters to the redirect URL
-                    if query_params:
-                        query_string = urllib.parse.urlencode(query_params)
-                        redirect_url = f"{redirect_url}?{query_string}"
-
-                    logger.info(f"Redirecting from port {request_port} to {rule['destination_port']} with URL {redirect_url}")
-                    return redirect_url
-
-                # Handling redirection based on source path
-                if 'source_path' in rule and rule['source_path'].strip('*') in request_path:
-                    redirect_url = request_path.replace(rule['source_path'].strip('*'), rule['destination_path'])
-
-                    # Append query parameters to the redirect URL
-                    if query_params:
-                        query_string = urllib.parse.urlencode(query_params)
-                        redirect_url = f"{redirect_url}?{query_string}"
+        redirect_url = self.redirect_table.resolve(request_port, request_path)
+        if not redirect_url:
+            return ''
 
-                    logger.info(f"Redirecting path {request_path} to {redirect_url}")
-                    return redirect_url
+        # Append query parameters to the redirect URL
+        if query_params:
+            redirect_url = f"{redirect_url}?{urllib.parse.urlencode(query_params)}"
 
-        return ''
+        logger.info('Redirecting %s to %s', request_path, redirect_url)
+        return redirect_url
 
     def inspect_request_with_waf(self, request_content: str):
         """
@@ -136,20 +327,113 @@ class GatewayService:
         if self.waf:
             self.waf.inspect_request(request_content)
 
-    def get_next_server(self) -> dict:
+    def inspect_request_zones(self, path: str, query: str, headers: list[tuple[bytes, bytes]], body: bytes = b''):
+        """
+        Inspects the relevant zones of the request using the WAF before further processing.
+
+        :param path: The decoded request path
+        :param query: The decoded query string
+        :param headers: Raw (name, value) header pairs with lowercase names
+        :param body: The beginning of the request body
+        :raises HTTPException: If the WAF detects malicious content
+        """
+        if self.waf:
+            started = time.perf_counter()
+            try:
+                self.waf.inspect_zones(path, query, headers, body)
+            finally:
+                self.observe_stage('waf', time.perf_counter() - started)
+
+    @property
+    def waf_body_limit(self) -> int:
+        """
+        Number of request body bytes to buffer for WAF inspection.
+        """
+        return self.waf.body_inspection_limit if self.waf else 0
+
+    def routing_key(self, client_ip: str | None, headers: Mapping[str, str], path: str) -> str | None:
         """
-        Retrieves the next server in the load balancing pool based on the selected strategy.
+        Extracts the routing key of a request, as configured by `load_balancing.hash_key`:
+        "client_ip", "header:<name>", "cookie:<name>" or "path_segment:<index>".
 
+        :param client_ip: The IP address of the client
+        :param headers: The request headers, with lowercase names
+        :param path: The request path
+        :return: The key, or None if the strategy does not use one or the request lacks it
+        """
+        if self.hash_key is None:
+            return None
+        kind, name = self.hash_key
+        if kind == 'client_ip':
+            return client_ip
+        if kind == 'header':
+            return headers.get(name)
+        if kind == 'cookie':
+            cookies = SimpleCookie()
+            try:
+                cookies.load(headers.get('cookie', ''))
+            except CookieError:
+                return None
+            morsel = cookies.get(name)
+            return morsel.value if morsel is not None else None
+        segments = path.strip('/').split('/')
+        index = int(name or 0)
+        return segments[index] if index < len(segments) and segments[index] else None
+
+    def get_next_server(self, key: str | None = None, exclude: Collection[str] = ()) -> dict:
+        """
+        Retrieves the next server in the load balancing pool based on the selected strategy,
+        and counts a connection to it. Call release_server() once the request to it is complete.
+
+        :param key: Routing key of the request, see routing_key()
+        :param exclude: Keys ("address:port") of servers to avoid if another one is available
         :return: A dictionary containing the address and port of the next server
         """
-        if not self.server_iterator:
+        if not self.load_balancer:
             logger.error('Load balancing is disabled or misconfigured.')
             raise HTTPException(status_code=503, detail='Load balancing is disabled or misconfigured.')
 
-        next_server = next(self.server_iterator)
-        logger.info(f"Routing to next server: {next_server['address']}:{next_server['port']}")
+        try:
+            next_server = self.load_balancer.get_next_server(key, exclude)
+        except Exception as e:
+            logger.error('No backend available: %s', e)
+            raise HTTPException(status_code=503, detail='No healthy backend available.')
+
+        # Selection and accounting happen without yielding to the event loop, so no lock is needed
+        self.load_balancer.increment_connection(next_server)
+        logger.info('Routing to next server: %s:%s', next_server['address'], next_server['port'])
         return next_server
 
+    def release_server(self, server: dict):
+        """
+        Ends the connection counted by get_next_server().
+
+        :param server: The server the request was sent to
+        """
+        if self.load_balancer:
+            self.load_balancer.decrement_connection(server)
+
+    def record_response(self, server: dict, latency: float, success: bool = True):
+        """
+        Feeds the response time of a server to the load balancing strategy.
+
+        :param server: The server the request was sent to
+        :param latency: Seconds until the response headers were received, or until the failure
+        :param success: False if the request failed or the server answered with a 5xx status
+        """
+        if self.load_balancer:
+            self.load_balancer.record_response(server, latency, success)
+
+    def handle_server_failure(self, server: dict):
+        """
+        Reports a server that failed to handle a request, so health-aware strategies avoid it.
+
+        :param server: The failed server
+        """
+        logger.warning('Backend %s:%s failed', server['address'], server['port'])
+        if self.load_balancer:
+            self.load_balancer.handle_server_failure(server)
+
     def start_session(self, user_id: str) -> str:
         """
         Starts a session for the given user.
@@ -184,8 +468,9 @@ class GatewayService:
         """
         # TODO! validate the user credentials here.
 
-        token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-        token = create_access_token(data={'sub': user_id}, expires_delta=token_expires)
+        token = create_access_token(
+            data={'sub': user_id}, expires_delta=self.access_token_lifetime, key_set=self.token_verifier.key_set,
+        )
         return token
 
     def verify_jwt(self, token: str):
@@ -195,4 +480,19 @@ class GatewayService:
         :param token: The JWT token
         :raises HTTPException: If the token is invalid or expired
         """
-        return verify_token(token)
+        return self.token_verifier.verify(token)
+
+    def authenticate_request(self, path: str, headers: Mapping[str, str]) -> Iterable[tuple[str, str]]:
+        """
+        Verifies the bearer token of a request to a protected path, before any backend is contacted.
+
+        :param path: The request path
+        :param headers: The request headers
+        :return: The headers to forward, with the verified claims as trusted headers
+        :raises HTTPException: 400 if the path has dot segments, 401 if the path is protected
+            and the token is missing or invalid
+        """
+        if self.edge_auth is None:
+            return headers.items()
+        claims = self.edge_auth.authenticate(path, headers)
+        return self.edge_auth.upstream_headers(headers.items(), claims)
@@ -0,0 +1,146 @@
+# app/core/services/ip_set.py
+from __future__ import annotations
+
+import socket
+from bisect import bisect_right
+from collections.abc import Iterable
+
+from .logger import logger
+
+# IPv4-mapped IPv6 addresses (::ffff:a.b.c.d) are matched against the IPv4 ranges
+IPV4_MAPPED_PREFIX = 0xFFFF << 32
+
+
+def parse_ip(client_ip: str) -> tuple[int, int] | None:
+    """
+    Parses an address into its version and integer value.
+
+    :param client_ip: The IP address
+    :return: (4 or 6, integer value), or None if the string is not an IP address
+    """
+    try:
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, client_ip), 'big')
+    except OSError:
+        pass
+    try:
+        value = int.from_bytes(socket.inet_pton(socket.AF_INET6, client_ip.split('%', 1)[0]), 'big')
+    except OSError:
+        return None
+    if value >> 32 == IPV4_MAPPED_PREFIX >> 32:
+        return 4, value & 0xFFFFFFFF
+    return 6, value
+
+
+def parse_network(entry: str) -> tuple[int, int, int] | None:
+    """
+    Parses an address or CIDR range into its version and first and last integer values.
+
+    :param entry: The address ("10.0.0.1") or CIDR range ("10.0.0.0/8")
+    :return: (4 or 6, first value, last value), or None if the entry is invalid
+    """
+    address, _, prefix = entry.strip().partition('/')
+    parsed = parse_ip(address)
+    if parsed is None:
+        return None
+    version, value = parsed
+    bits = 32 if version == 4 and ':' not in address else 128
+    try:
+        prefix_length = int(prefix) if prefix else bits
+    except ValueError:
+        return None
+    if not 0 <= prefix_length <= bits:
+        return None
+    host_bits = bits - prefix_length
+    if version == 4 and bits == 128:
+        # A range of IPv4-mapped IPv6 addresses
+        if prefix_length < 96:
+            return None
+        host_bits = 128 - prefix_length
+    first = value >> host_bits << host_bits
+    return version, first, first | ((1 << host_bits) - 1)
+
+
+def read_feed(path: str) -> list[str]:
+    """
+    Reads a plain-text feed with one address or CIDR range per line.
+    Blank lines and "#" comments are ignored.
+
+    :param path: Path to the feed file
+    :return: The entries of the feed
+    """
+    entries = []
+    with open(path) as feed:
+        for line in feed:
+            entry = line.split('#', 1)[0].strip()
+            if entry:
+                entries.append(entry)
+    return entries
+
+
+class IPSet:
+    """
+    Set of IPv4 and IPv6 addresses and CIDR ranges, compiled once into sorted,
+    non-overlapping intervals per IP version. Lookups are a binary search, so they
+    stay O(log n) with hundreds of thousands of entries.
+    """
+
+    def __init__(self, entries: Iterable[str] = ()):
+        """
+        Compiles the entries. Invalid entries are skipped with a warning.
+
+        :param entries: Addresses ("10.0.0.1") and CIDR ranges ("10.0.0.0/8", "2001:db8::/32")
+        """
+        ranges: dict[int, list[tuple[int, int]]] = {4: [], 6: []}
+        invalid = 0
+        for entry in entries:
+            network = parse_network(entry)
+            if network is None:
+                invalid += 1
+                continue
+            version, first, last = network
+            ranges[version].append((first, last))
+        if invalid:
+            logger.warning('Skipped %d invalid IP set entries', invalid)
+
+        self.starts: dict[int, list[int]] = {}
+        self.ends: dict[int, list[int]] = {}
+        for version, intervals in ranges.items():
+            starts: list[int] = []
+            ends: list[int] = []
+            for start, end in sorted(intervals):
+                if ends and start <= ends[-1] + 1:
+                    ends[-1] = max(ends[-1], end)
+                else:
+                    starts.append(start)
+                    ends.append(end)
+            self.starts[version] = starts
+            self.ends[version] = ends
+
+    @classmethod
+    def from_sources(cls, entries: Iterable[str] = (), feeds: Iterable[str] = ()) -> IPSet:
+        """
+        Builds a set from inline entries plus the entries of feed files.
+
+        :param entries: Addresses and CIDR ranges
+        :param feeds: Paths to plain-text feed files
+        :return: The compiled IPSet
+        """
+        combined = list(entries)
+        for path in feeds:
+            combined.extend(read_feed(path))
+        return cls(combined)
+
+    def __contains__(self, client_ip: str) -> bool:
+        parsed = parse_ip(client_ip)
+        if parsed is None:
+            return False
+        version, value = parsed
+        starts = self.starts[version]
+        index = bisect_right(starts, value) - 1
+        return index >= 0 and value <= self.ends[version][index]
+
+    def __len__(self) -> int:
+        """
+        Number of disjoint ranges in the set.
+        """
+        return len(self.starts[4]) + len(self.starts[6])
@@ -1,21 +1,48 @@
 from __future__ import annotations
 
+from collections.abc import Callable
+from collections.abc import Collection
+
 from .strategies.base_strategy import LoadBalancingStrategy
+from .strategies.base_strategy import server_key
+from .strategies.consistent_hash_strategy import ConsistentHashStrategy
 from .strategies.health_strategy import LoadBalancingStrategyWithHealth
 from .strategies.least_connections_strategy import LeastConnectionsStrategy
+from .strategies.power_of_two_choices_strategy import PeakEWMAStrategy
+from .strategies.power_of_two_choices_strategy import PowerOfTwoChoicesStrategy
 from .strategies.random_strategy import RandomStrategy
 from .strategies.round_robin_strategy import RoundRobinStrategy
+from .strategies.weighted_round_robin_strategy import WeightedRoundRobinStrategy
 
 class LoadBalancerService:
     """
     Service to manage load balancing across multiple strategies.
-    Supports round-robin, random, and least-connections strategies with optional health checking.
+    Supports round-robin, weighted round-robin, random, least-connections, power-of-two-choices,
+    peak-EWMA and consistent-hash strategies with optional health checking.
     """
 
-    def __init__(self, strategy: str, servers: list[dict], enable_health_checking: bool = False):
+    def __init__(
+        self, strategy: str, servers: list[dict], enable_health_checking: bool = False,
+        cooldown_period: float | None = 60, circuit_breaker: dict | None = None,
+        on_circuit_change: Callable[[dict, str], None] | None = None,
+    ):
+        """
+        :param strategy: Name of the load balancing strategy
+        :param servers: Server entries from the load balancing configuration
+        :param enable_health_checking: Skip the servers marked as unhealthy
+        :param cooldown_period: Seconds after which a failed server is restored, None when
+            recovery is left to active health checks
+        :param circuit_breaker: The `circuit_breaker` settings, None for no circuit breakers
+        :param on_circuit_change: Called with the server and its new state when a circuit changes
+        """
+        # Accept both "round-robin" and the "round_robin" spelling used in config.yaml
+        strategy = strategy.replace('_', '-')
         self.strategy_name = strategy
         self.servers = servers
         self.enable_health_checking = enable_health_checking
+        self.cooldown_period = cooldown_period
+        self.circuit_breaker = circuit_breaker
+        self.on_circuit_change = on_circuit_change
         self.strategy: LoadBalancingStrategy = self._select_strategy(strategy)
 
     def _select_strategy(self, strategy: str) -> LoadBalancingStrategy:
@@ -31,38 +58,96 @@ class LoadBalancerService:
             base_strategy = RandomStrategy(self.servers)
         elif strategy == 'least-connections':
             base_strategy = LeastConnectionsStrategy(self.servers)
+        elif strategy == 'weighted-round-robin':
+            base_strategy = WeightedRoundRobinStrategy(self.servers)
+        elif strategy == 'power-of-two-choices':
+            base_strategy = PowerOfTwoChoicesStrategy(self.servers)
+        elif strategy == 'peak-ewma':
+            base_strategy = PeakEWMAStrategy(self.servers)
+        elif strategy == 'consistent-hash':
+            base_strategy = ConsistentHashStrategy(self.servers)
         else:
             raise ValueError(f"Unsupported load balancing strategy: {strategy}")
 
-        # Wrap the strategy with health checking if enabled
-        if self.enable_health_checking:
-            return LoadBalancingStrategyWithHealth(base_strategy)
+        # Wrap the strategy with health checking or circuit breakers if enabled
+        if self.enable_health_checking or self.circuit_breaker is not None:
+            return LoadBalancingStrategyWithHealth(
+                base_strategy, self.cooldown_period, self.circuit_breaker, self.on_circuit_change,
+            )
         return base_strategy
 
-    def get_next_server(self) -> dict:
+    def get_next_server(self, key: str | None = None, exclude: Collection[str] = ()) -> dict:
         """
         Returns the next server based on the selected load balancing strategy.
+
+        :param key: Routing key of the request, for the consistent-hash strategy
+        :param exclude: Keys of servers to avoid, e.g. those a request was already sent to.
+            One of them is returned only if no other server can be selected.
         """
-        return self.strategy.get_next_server()
+        return self.strategy.get_next_server(key, exclude)
 
     def handle_server_failure(self, server: dict):
         """
         Handles server failure by marking the server as unhealthy.
         This is only applicable if health checking is enabled.
         """
+        self.strategy.handle_server_failure(server)
+
+    def set_server_health(self, server: dict, healthy: bool) -> bool:
+        """
+        Marks a server as healthy or unhealthy, e.g. from the result of active health checks.
+        This is only applicable if health checking is enabled.
+
+        :return: True if the health of the server changed
+        """
+        if isinstance(self.strategy, LoadBalancingStrategyWithHealth):
+            return self.strategy.set_server_health(server, healthy)
+        return False
+
+    def is_server_healthy(self, server: dict) -> bool:
+        """
+        :return: False if the server is marked as unhealthy, by health checks or a failed request
+        """
+        if isinstance(self.strategy, LoadBalancingStrategyWithHealth):
+            return self.strategy.server_health.get(server_key(server), True)
+        return True
+
+    def carry_over_health(self, previous: LoadBalancerService):
+        """
+        Keeps the unhealthy marks and the circuits of the servers of a load balancer being replaced.
+        """
+        if not isinstance(previous.strategy, LoadBalancingStrategyWithHealth):
+            return
+        for server in self.servers:
+            if previous.strategy.server_health.get(server_key(server)) is False:
+                self.set_server_health(server, False)
         if isinstance(self.strategy, LoadBalancingStrategyWithHealth):
-            self.strategy.handle_server_failure(server)
+            self.strategy.carry_over_circuits(previous.strategy)
+
+    def circuit_states(self) -> dict:
+        """
+        Reports the circuit of every server and the latest state changes.
+
+        :return: The state and window counts by server key, and the transitions, oldest first
+        """
+        if not isinstance(self.strategy, LoadBalancingStrategyWithHealth):
+            return {'backends': {}, 'transitions': []}
+        return {'backends': self.strategy.circuit_states(), 'transitions': list(self.strategy.circuit_transitions)}
+
+    def record_response(self, server: dict, latency: float, success: bool = True):
+        """
+        Records the response time of the server (used in latency-aware strategies).
+        """
+        self.strategy.record_response(server, latency, success)
 
     def increment_connection(self, server: dict):
         """
         Increments the active connection count for the server (used in least-connections).
         """
-        if isinstance(self.strategy, LeastConnectionsStrategy):
-            self.strategy.increment_connection(server)
+        self.strategy.increment_connection(server)
 
     def decrement_connection(self, server: dict):
         """
         Decrements the active connection count for the server (used in least-connections).
         """
-        if isinstance(self.strategy, LeastConnectionsStrategy):
-            self.strategy.decrement_connection(server)
+        self.strategy.decrement_connection(server)
@@ -1,19 +1,281 @@
 # Configure logging based on the entity configuration
 from __future__ import annotations
 
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import os
+import queue
+import random
+import re
+import threading
 
+# Logger of the per-request access log, written as one JSON object per line
+ACCESS_LOGGER_NAME = 'guardian.access'
 
-def configure_logging(log_config):
-    if log_config.get('enabled', False):
-        logging.basicConfig(
-            level=getattr(logging, log_config.get('log_level', 'INFO').upper(), logging.INFO),
-            format=log_config.get('log_format', '%(levelname)s: %(asctime)s - %(name)s - %(message)s'),
-            handlers=[
-                logging.FileHandler(log_config.get('log_file', 'guardian.log')),
-                logging.StreamHandler(),
-            ],
+DEFAULT_LOG_FORMAT = '%(levelname)s: %(asctime)s - %(name)s - %(message)s'
+
+# Argument types that cannot change between the logging call and the background write
+IMMUTABLE_ARGUMENT_TYPES = (str, int, float, bool, bytes, type(None))
+
+SIZE_UNITS = {'': 1, 'B': 1, 'KB': 1024, 'MB': 1024 ** 2, 'GB': 1024 ** 3}
+
+
+def parse_size(value: int | str) -> int:
+    """
+    Parses a size such as 10MB into bytes.
+
+    :param value: A number of bytes, or a number followed by B, KB, MB or GB
+    :return: The size in bytes
+    :raises ValueError: If the size cannot be parsed
+    """
+    if isinstance(value, int):
+        return value
+    match = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([KMG]?B?)\s*', value.upper())
+    if match is None:
+        raise ValueError(f"Invalid size: {value}")
+    return int(float(match.group(1)) * SIZE_UNITS[match.group(2)])
+
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler that leaves message formatting to the writer thread.
+
+    The standard QueueHandler formats every record in the calling thread. Here a record is
+    only formatted early when one of its arguments could change before it is written, or to
+    capture a traceback, so logging calls on the request path cost little more than a put.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        if record.exc_info:
+            # Tracebacks reference frames that will be gone by the time the writer runs
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        if record.args and not all(isinstance(arg, IMMUTABLE_ARGUMENT_TYPES) for arg in record.args):
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a random share of the records at or below a level; more severe records always pass.
+    """
+
+    def __init__(self, rate: float, max_level: int = logging.INFO):
+        """
+        :param rate: Share of the records kept, between 0 and 1
+        :param max_level: Most severe level that is sampled
+        """
+        super().__init__()
+        self.rate = rate
+        self.max_level = max_level
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno > self.max_level or self.rate >= 1 or random.random() < self.rate
+
+
+class LoggerFilter(logging.Filter):
+    """
+    Passes the records of one logger and its children, or all the others when `exclude` is set.
+    """
+
+    def __init__(self, name: str, exclude: bool = False):
+        super().__init__(name)
+        self.exclude = exclude
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return super().filter(record) != self.exclude
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats a record as a single-line JSON object, including the fields passed with
+    `extra={'fields': {...}}`.
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': self.formatTime(record, self.datefmt),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        entry.update(getattr(record, 'fields', {}))
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str, separators=(',', ':'))
+
+
+class LogWriter:
+    """
+    Background thread writing queued records in batches: every record available is taken
+    from the queue, then written to each handler under one lock acquisition with one flush,
+    so request handlers never wait for the disk or the terminal.
+    """
+
+    def __init__(self, handlers: list[logging.Handler], batch_size: int = 256):
+        """
+        :param handlers: Stream handlers (file, rotating file, terminal) the records are written to
+        :param batch_size: Maximum number of records written per flush
+        """
+        self.queue: queue.SimpleQueue = queue.SimpleQueue()
+        self.handlers = handlers
+        self.batch_size = batch_size
+        self.thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        """
+        Writes the records still queued, then stops the thread and closes the handlers.
+        """
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+        for handler in self.handlers:
+            handler.close()
+
+    def _run(self):
+        while True:
+            record = self.queue.get()
+            batch = [record]
+            while record is not None and len(batch) < self.batch_size:
+                try:
+                    record = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(record)
+            self.write([record for record in batch if record is not None])
+            if batch[-1] is None:
+                return
+
+    def write(self, records: list[logging.LogRecord]):
+        if not records:
+            return
+        for handler in self.handlers:
+            handler.acquire()
+            try:
+                for record in records:
+                    if record.levelno < handler.level or not handler.filter(record):
+                        continue
+                    try:
+                        if isinstance(handler, logging.handlers.RotatingFileHandler) and handler.shouldRollover(record):
+                            handler.doRollover()
+                        handler.stream.write(handler.format(record) + handler.terminator)  # type: ignore[attr-defined]
+                    except Exception:
+                        handler.handleError(record)
+                try:
+                    handler.flush()
+                except Exception:
+                    # A failing stream must not stop the writer thread
+                    handler.handleError(records[-1])
+            finally:
+                handler.release()
+
+
+# Pipeline currently installed, with the settings it was built from
+_installed: tuple[dict, LogWriter, list[logging.Handler]] | None = None
+_install_lock = threading.Lock()
+
+
+def _file_handler(path: str, rotation: dict) -> logging.Handler:
+    if rotation.get('enabled', False):
+        return logging.handlers.RotatingFileHandler(
+            path, maxBytes=parse_size(rotation.get('max_size', '10MB')), backupCount=rotation.get('backup_count', 5),
         )
+    return logging.FileHandler(path)
+
+
+def stop_logging():
+    """
+    Removes the logging pipeline, after writing the records still queued.
+    """
+    global _installed
+    with _install_lock:
+        if _installed is None:
+            return
+        _, writer, queue_handlers = _installed
+        root = logging.getLogger()
+        access_logger = logging.getLogger(ACCESS_LOGGER_NAME)
+        for handler in queue_handlers:
+            root.removeHandler(handler)
+            access_logger.removeHandler(handler)
+        access_logger.disabled = True
+        _installed = None
+    writer.stop()
+
+
+def configure_logging(log_config):
+    """
+    Installs the logging pipeline: logging calls put records on a queue, and a background
+    thread writes them to the log file and the terminal, and JSON access records to their
+    own file. Calling it again with other settings replaces the pipeline, so the logging
+    settings follow configuration reloads.
+
+    :param log_config: The `logging` settings
+    """
+    global _installed
+    if _installed is not None and _installed[0] == log_config:
+        return
+    stop_logging()
+    if not log_config.get('enabled', False):
+        return
+
+    formatter = logging.Formatter(log_config.get('log_format', DEFAULT_LOG_FORMAT))
+    rotation = log_config.get('log_rotation', {})
+    handlers = [_file_handler(log_config.get('log_file', 'guardian.log'), rotation), logging.StreamHandler()]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+        handler.addFilter(LoggerFilter(ACCESS_LOGGER_NAME, exclude=True))
+
+    access_log = log_config.get('access_log', {})
+    if access_log.get('enabled', False):
+        access_handler = _file_handler(access_log.get('log_file', 'access.log'), rotation)
+        access_handler.setFormatter(JsonFormatter())
+        access_handler.addFilter(LoggerFilter(ACCESS_LOGGER_NAME))
+        handlers.append(access_handler)
+
+    writer = LogWriter(handlers, log_config.get('batch_size', 256))
+    root_handler = LazyQueueHandler(writer.queue)
+    root_handler.addFilter(SamplingFilter(log_config.get('sample_rate', 1.0)))
+    access_handler = LazyQueueHandler(writer.queue)
+    access_handler.addFilter(SamplingFilter(access_log.get('sample_rate', 1.0)))
+
+    with _install_lock:
+        root = logging.getLogger()
+        root.setLevel(getattr(logging, log_config.get('log_level', 'INFO').upper(), logging.INFO))
+        root.addHandler(root_handler)
+        access_logger = logging.getLogger(ACCESS_LOGGER_NAME)
+        access_logger.setLevel(logging.INFO)
+        access_logger.propagate = False
+        access_logger.addHandler(access_handler)
+        access_logger.disabled = not access_log.get('enabled', False)
+        writer.start()
+        _installed = (copy.deepcopy(log_config), writer, [root_handler, access_handler])
+
+
+def _restart_after_fork():
+    """
+    Runs in forked worker processes, where the writer thread of the parent does not exist:
+    the pipeline is installed again with a thread of its own. Records the parent had queued
+    are left to the parent.
+    """
+    global _install_lock
+    _install_lock = threading.Lock()
+    if _installed is not None:
+        log_config = _installed[0]
+        stop_logging()
+        configure_logging(log_config)
+
 
+# Write the queued records before the interpreter exits
+atexit.register(stop_logging)
+os.register_at_fork(after_in_child=_restart_after_fork)
 
 logger = logging.getLogger('guardian')
+access_logger = logging.getLogger(ACCESS_LOGGER_NAME)
+access_logger.disabled = True
@@ -0,0 +1,54 @@
+# app/core/services/prefix_trie.py
+from __future__ import annotations
+
+from typing import Generic
+from typing import TypeVar
+
+T = TypeVar('T')
+
+# Key marking the value stored at a node; never a single character, so it cannot clash with a child
+VALUE_KEY = ''
+
+
+class PrefixTrie(Generic[T]):
+    """
+    Character-level prefix trie mapping string prefixes to values.
+    A lookup walks the text once, so its cost depends on the text length, not on the number of prefixes.
+    """
+
+    def __init__(self):
+        self.root: dict = {}
+        self.size = 0
+
+    def insert(self, prefix: str, value: T):
+        """
+        Stores a value for a prefix. When the same prefix is inserted twice, the first value is kept.
+
+        :param prefix: The prefix
+        :param value: The value returned for texts starting with the prefix
+        """
+        node = self.root
+        for char in prefix:
+            node = node.setdefault(char, {})
+        if VALUE_KEY not in node:
+            node[VALUE_KEY] = (len(prefix), value)
+            self.size += 1
+
+    def longest_match(self, text: str) -> tuple[int, T] | None:
+        """
+        Finds the longest stored prefix of the text.
+
+        :param text: The text to look up
+        :return: (length of the matching prefix, its value), or None if no prefix matches
+        """
+        node = self.root
+        match = node.get(VALUE_KEY)
+        for char in text:
+            node = node.get(char)
+            if node is None:
+                break
+            match = node.get(VALUE_KEY, match)
+        return match
+
+    def __len__(self) -> int:
+        return self.size
@@ -1,28 +1,260 @@
 # app/core/services/rate_limiter.py
 from __future__ import annotations
 
-from collections import defaultdict
+from abc import ABC
+from abc import abstractmethod
+from collections import OrderedDict
 from time import time
 
 from fastapi import HTTPException
 
 
+class RateLimitAlgorithm(ABC):
+    """
+    Abstract base class for rate limiting algorithms.
+    Per-client state is a small fixed-size list, so every decision is O(1) in time and memory.
+    """
+
+    def __init__(self, max_requests: int, window: float = 60.0):
+        """
+        :param max_requests: Maximum number of requests allowed per window
+        :param window: Length of the window in seconds
+        """
+        self.max_requests = max_requests
+        self.window = window
+
+    @abstractmethod
+    def new_state(self, now: float) -> list:
+        """
+        Returns the state of a client that has not made any request yet.
+        """
+
+    @abstractmethod
+    def hit(self, state: list, now: float) -> bool:
+        """
+        Records a request in the state if it is within the limit.
+
+        :return: True if the request is allowed, False if it exceeds the limit
+        """
+
+    @abstractmethod
+    def is_idle(self, state: list, now: float) -> bool:
+        """
+        Tells whether the state is back to its initial value, so it can be dropped.
+        """
+
+
+class TokenBucketAlgorithm(RateLimitAlgorithm):
+    """
+    Token bucket holding up to `max_requests` tokens, refilled continuously over the window.
+    State: [tokens, last update time].
+    """
+
+    def __init__(self, max_requests: int, window: float = 60.0):
+        super().__init__(max_requests, window)
+        self.refill_rate = max_requests / window
+
+    def new_state(self, now: float) -> list:
+        return [float(self.max_requests), now]
+
+    def hit(self, state: list, now: float) -> bool:
+        tokens = min(self.max_requests, state[0] + (now - state[1]) * self.refill_rate)
+        state[1] = now
+        if tokens < 1:
+            state[0] = tokens
+            return False
+        state[0] = tokens - 1
+        return True
+
+    def is_idle(self, state: list, now: float) -> bool:
+        return state[0] + (now - state[1]) * self.refill_rate >= self.max_requests
+
+
+class SlidingWindowAlgorithm(RateLimitAlgorithm):
+    """
+    Sliding-window counter made of fixed sub-buckets.
+    State: [index of the newest bucket, total count, count per bucket (ring)...].
+    """
+
+    def __init__(self, max_requests: int, window: float = 60.0, buckets: int = 6):
+        super().__init__(max_requests, window)
+        self.buckets = buckets
+        self.bucket_width = window / buckets
+
+    def new_state(self, now: float) -> list:
+        return [int(now // self.bucket_width), 0] + [0] * self.buckets
+
+    def hit(self, state: list, now: float) -> bool:
+        index = int(now // self.bucket_width)
+        elapsed = index - state[0]
+        if elapsed >= self.buckets:
+            state[1:] = [0] * (self.buckets + 1)
+        else:
+            # Expire the buckets that slid out of the window since the last request
+            for expired in range(state[0] + 1, index + 1):
+                slot = 2 + expired % self.buckets
+                state[1] -= state[slot]
+                state[slot] = 0
+        state[0] = max(state[0], index)
+
+        if state[1] >= self.max_requests:
+            return False
+        state[1] += 1
+        state[2 + index % self.buckets] += 1
+        return True
+
+    def is_idle(self, state: list, now: float) -> bool:
+        return state[1] == 0 or int(now // self.bucket_width) - state[0] >= self.buckets
+
+
+class GCRAAlgorithm(RateLimitAlgorithm):
+    """
+    Generic Cell Rate Algorithm, allowing bursts of up to `max_requests` requests.
+    State: [theoretical arrival time].
+    """
+
+    def __init__(self, max_requests: int, window: float = 60.0):
+        super().__init__(max_requests, window)
+        self.emission_interval = window / max_requests
+
+    def new_state(self, now: float) -> list:
+        return [now]
+
+    def hit(self, state: list, now: float) -> bool:
+        arrival = max(state[0], now) + self.emission_interval
+        if arrival - self.window > now:
+            return False
+        state[0] = arrival
+        return True
+
+    def is_idle(self, state: list, now: float) -> bool:
+        return state[0] <= now
+
+
+ALGORITHMS: dict[str, type[RateLimitAlgorithm]] = {
+    'token-bucket': TokenBucketAlgorithm,
+    'sliding-window': SlidingWindowAlgorithm,
+    'gcra': GCRAAlgorithm,
+}
+
+
+class RateLimitBackend(ABC):
+    """
+    Abstract base class for the storage of rate limiting counters and bans.
+    """
+
+    @abstractmethod
+    def is_banned(self, client_ip: str, now: float) -> bool:
+        """
+        Tells whether the client is currently banned.
+        """
+
+    @abstractmethod
+    def hit(self, client_ip: str, now: float) -> bool:
+        """
+        Records a request from the client if it is within the limit.
+
+        :return: True if the request is allowed, False if it exceeds the limit
+        """
+
+    @abstractmethod
+    def ban(self, client_ip: str, until: float):
+        """
+        Bans the client until the given time.
+        """
+
+
+class LocalRateLimitBackend(RateLimitBackend):
+    """
+    In-process backend keeping one algorithm state per client.
+
+    Client states and bans are kept in least-recently-used order. Every call sweeps a few
+    of the oldest entries, and the number of tracked clients is capped, so memory stays
+    bounded no matter how many distinct IPs are seen.
+    """
+
+    def __init__(self, algorithm: RateLimitAlgorithm, max_tracked_clients: int = 1_000_000, sweep_batch: int = 2):
+        """
+        :param algorithm: The rate limiting algorithm applied to each client
+        :param max_tracked_clients: Maximum number of client states kept in memory
+        :param sweep_batch: Number of stale entries evicted at most per call
+        """
+        self.algorithm = algorithm
+        self.max_tracked_clients = max_tracked_clients
+        self.sweep_batch = sweep_batch
+        self.requests: OrderedDict[str, list] = OrderedDict()  # Client states, least recently used first
+        self.banned_ips: OrderedDict[str, float] = OrderedDict()  # Ban expiry times, earliest first
+
+    def is_banned(self, client_ip: str, now: float) -> bool:
+        self._sweep(now)
+        banned_until = self.banned_ips.get(client_ip)
+        if banned_until is None:
+            return False
+        if now < banned_until:
+            return True
+        del self.banned_ips[client_ip]
+        return False
+
+    def hit(self, client_ip: str, now: float) -> bool:
+        state = self.requests.get(client_ip)
+        if state is None:
+            state = self.requests[client_ip] = self.algorithm.new_state(now)
+            if len(self.requests) > self.max_tracked_clients:
+                self.requests.popitem(last=False)
+        else:
+            self.requests.move_to_end(client_ip)
+        return self.algorithm.hit(state, now)
+
+    def ban(self, client_ip: str, until: float):
+        self.banned_ips.pop(client_ip, None)
+        self.banned_ips[client_ip] = until
+
+    def _sweep(self, now: float):
+        """
+        Evicts a bounded number of expired bans and idle client states, oldest first.
+        """
+        for _ in range(self.sweep_batch):
+            if not self.banned_ips:
+                break
+            client_ip, banned_until = next(iter(self.banned_ips.items()))
+            if banned_until > now:
+                break
+            del self.banned_ips[client_ip]
+
+        for _ in range(self.sweep_batch):
+            if not self.requests:
+                break
+            client_ip, state = next(iter(self.requests.items()))
+            if not self.algorithm.is_idle(state, now):
+                break
+            del self.requests[client_ip]
+
+
 class RateLimiter:
     """
     RateLimiter class to handle request rate limiting per client IP.
+    Counters and bans live in a pluggable backend, in-process unless another one is given.
     """
 
-    def __init__(self, max_requests: int, ban_duration: int):
+    def __init__(
+        self, max_requests: int, ban_duration: int, algorithm: str = 'sliding-window',
+        max_tracked_clients: int = 1_000_000, backend: RateLimitBackend | None = None,
+    ):
         """
         Initialize the RateLimiter.
 
         :param max_requests: Maximum number of requests allowed per minute
         :param ban_duration: Duration (in seconds) to ban IPs that exceed the limit
+        :param algorithm: One of "token-bucket", "sliding-window" or "gcra", for the local backend
+        :param max_tracked_clients: Maximum number of client states kept by the local backend
+        :param backend: Backend storing counters and bans, shared between processes if needed
         """
+        if algorithm not in ALGORITHMS:
+            raise ValueError(f"Unsupported rate limiting algorithm: {algorithm}")
+
         self.max_requests = max_requests
         self.ban_duration = ban_duration
-        self.requests: dict[str, list[float]] = defaultdict(list)  # Add type annotation here
-        self.banned_ips: dict[str, float] = {}  # Add type annotation here
+        self.backend = backend or LocalRateLimitBackend(ALGORITHMS[algorithm](max_requests), max_tracked_clients)
 
     def is_allowed(self, client_ip: str) -> bool:
         """
@@ -34,17 +266,12 @@ class RateLimiter:
         current_time = time()
 
         # Check if IP is banned
-        if client_ip in self.banned_ips and current_time < self.banned_ips[client_ip]:
+        if self.backend.is_banned(client_ip, current_time):
             raise HTTPException(status_code=429, detail='Too many requests. You are temporarily banned.')
 
-        # Clean up old requests
-        self.requests[client_ip] = [t for t in self.requests[client_ip] if current_time - t < 60]
-
         # Check rate limit
-        if len(self.requests[client_ip]) >= self.max_requests:
-            self.banned_ips[client_ip] = current_time + self.ban_duration
+        if not self.backend.hit(client_ip, current_time):
+            self.backend.ban(client_ip, current_time + self.ban_duration)
             raise HTTPException(status_code=429, detail='Too many requests. You are temporarily banned.')
 
-        # Log the request
-        self.requests[client_ip].append(current_time)
         return True
@@ -0,0 +1,62 @@
+# app/core/services/redirect_table.py
+from __future__ import annotations
+
+from functools import lru_cache
+
+from app.core.services.prefix_trie import PrefixTrie
+
+# Number of (port, path) lookups remembered by default
+DEFAULT_CACHE_SIZE = 10_000
+
+
+class RedirectTable:
+    """
+    Redirection rules compiled once into a port-keyed dict and a path-prefix trie.
+
+    Port rules take precedence over path rules. Among path rules, the longest matching
+    `source_path` prefix wins (a trailing "*" is optional), and the matched prefix is
+    replaced by `destination_path`. Resolved (port, path) pairs are kept in a bounded LRU cache.
+    """
+
+    def __init__(self, redirection: dict, listen_address: str, cache_size: int = DEFAULT_CACHE_SIZE):
+        """
+        Compiles the rules.
+
+        :param redirection: Redirection settings with the list of `rules`
+        :param listen_address: Address used in the URL of port redirections
+        :param cache_size: Maximum number of resolved (port, path) pairs kept in the cache
+        """
+        # source port -> URL prefix the request path is appended to
+        self.port_redirects: dict[int, str] = {}
+        # source path prefix -> destination path
+        self.path_redirects: PrefixTrie[str] = PrefixTrie()
+
+        for rule in redirection.get('rules', []):
+            if rule.get('action') != 'redirect':
+                continue
+            if 'source_port' in rule:
+                self.port_redirects.setdefault(
+                    rule['source_port'], f"https://{listen_address}:{rule['destination_port']}",
+                )
+            elif 'source_path' in rule:
+                self.path_redirects.insert(rule['source_path'].rstrip('*'), rule['destination_path'])
+
+        self.resolve = lru_cache(maxsize=cache_size)(self._resolve)
+
+    def _resolve(self, request_port: int | None, request_path: str) -> str:
+        """
+        Computes the redirect URL of a request, without its query string.
+
+        :param request_port: The port of the incoming request
+        :param request_path: The path of the incoming request
+        :return: The URL to redirect to, or an empty string if no rule applies
+        """
+        base_url = self.port_redirects.get(request_port)  # type: ignore[arg-type]
+        if base_url is not None:
+            return base_url + request_path
+
+        match = self.path_redirects.longest_match(request_path)
+        if match is None:
+            return ''
+        prefix_length, destination_path = match
+        return destination_path + request_path[prefix_length:]
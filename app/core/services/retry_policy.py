@@ -0,0 +1,171 @@
+# app/core/services/retry_policy.py
+from __future__ import annotations
+
+import random
+import time
+
+# Methods that can be sent twice without changing the outcome (RFC 9110, section 9.2.2)
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE', 'TRACE')
+
+
+class RetryBudget:
+    """
+    Limits retries and hedged attempts to a share of the requests, so that a struggling
+    backend pool is not sent several times its normal load.
+
+    Every request deposits `ratio` of a token and every extra attempt withdraws one. A floor
+    of `min_per_second` tokens per second keeps retries possible under low traffic. Unused
+    tokens accumulate up to `window` seconds of the floor plus the deposits.
+    """
+
+    def __init__(self, ratio: float = 0.2, min_per_second: float = 10.0, window: float = 10.0, clock=time.monotonic):
+        """
+        :param ratio: Extra attempts allowed per request
+        :param min_per_second: Extra attempts allowed per second whatever the traffic
+        :param window: Seconds of unused allowance kept
+        :param clock: Monotonic clock, replaced in tests
+        """
+        if ratio < 0 or min_per_second < 0:
+            raise ValueError('Retry budget ratio and min_per_second must not be negative')
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = max(1.0, min_per_second * window)
+        self.clock = clock
+        self.tokens = self.capacity
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.min_per_second)
+        self.updated = now
+
+    def deposit(self):
+        """
+        Records a request, adding to the allowance.
+        """
+        self.tokens = min(self.capacity, self.tokens + self.ratio)
+
+    def withdraw(self) -> bool:
+        """
+        Takes one extra attempt from the allowance.
+
+        :return: False if the budget is exhausted
+        """
+        self._refill()
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class LatencyTracker:
+    """
+    Keeps the latest response times to estimate a percentile, e.g. the p95 after which a
+    request is hedged. The percentile is recomputed every `refresh` samples rather than on
+    every read, so the cost per request stays constant.
+    """
+
+    def __init__(self, percentile: float = 95, size: int = 1000, refresh: int = 100, min_samples: int = 20):
+        """
+        :param percentile: Percentile estimated, between 0 and 100
+        :param size: Number of latest samples kept
+        :param refresh: Samples recorded between two computations
+        :param min_samples: Samples needed before there is an estimate
+        """
+        if not 0 < percentile <= 100:
+            raise ValueError(f"Invalid percentile: {percentile}")
+        self.percentile = percentile
+        self.size = size
+        self.refresh = refresh
+        self.min_samples = min_samples
+        self.samples: list[float] = []
+        self.next_index = 0
+        self.pending = 0
+        self.value: float | None = None
+
+    def record(self, latency: float):
+        """
+        :param latency: Seconds until the response headers were received
+        """
+        if len(self.samples) < self.size:
+            self.samples.append(latency)
+        else:
+            self.samples[self.next_index] = latency
+            self.next_index = (self.next_index + 1) % self.size
+        self.pending += 1
+        if len(self.samples) >= self.min_samples and (self.pending >= self.refresh or self.value is None):
+            self.pending = 0
+            ordered = sorted(self.samples)
+            self.value = ordered[min(len(ordered) - 1, int(len(ordered) * self.percentile / 100))]
+
+    def estimate(self) -> float | None:
+        """
+        :return: The percentile of the latest samples, None until enough were recorded
+        """
+        return self.value
+
+
+class RetryPolicy:
+    """
+    Settings and state deciding how a request is sent to the backends: how many attempts,
+    which methods and statuses are retried, when a hedged attempt is started, and the time
+    allowed per attempt and overall.
+
+    Requests with a body are only attempted once, as the body is streamed from the client
+    and cannot be sent again.
+    """
+
+    def __init__(self, retries_config: dict):
+        """
+        :param retries_config: The `load_balancing.retries` settings
+        :raises ValueError: If a setting is out of range
+        """
+        self.max_attempts = retries_config.get('max_attempts', 3)
+        if self.max_attempts < 1:
+            raise ValueError('retries.max_attempts must be at least 1')
+        self.methods = frozenset(method.upper() for method in retries_config.get('methods', IDEMPOTENT_METHODS))
+        self.retry_on_status = frozenset(retries_config.get('retry_on_status', (502, 503, 504)))
+        self.per_try_timeout: float | None = retries_config.get('per_try_timeout')
+        self.timeout: float | None = retries_config.get('timeout')
+        backoff = retries_config.get('backoff', {})
+        self.backoff_base = backoff.get('base', 0.025)
+        self.backoff_max = backoff.get('max', 0.25)
+        budget = retries_config.get('budget', {})
+        self.budget = RetryBudget(budget.get('ratio', 0.2), budget.get('min_per_second', 10.0))
+
+        hedging = retries_config.get('hedging', {})
+        self.hedging = hedging.get('enabled', False)
+        self.hedge_methods = frozenset(method.upper() for method in hedging.get('methods', ('GET', 'HEAD')))
+        self.hedge_min_delay = hedging.get('min_delay', 0.01)
+        self.hedge_max_delay = hedging.get('max_delay', 1.0)
+        self.latency = LatencyTracker(hedging.get('percentile', 95))
+
+    def attempts_for(self, method: str, has_body: bool) -> int:
+        """
+        :return: The number of attempts allowed for a request
+        """
+        return 1 if has_body or method not in self.methods else self.max_attempts
+
+    def hedges(self, method: str, has_body: bool) -> bool:
+        """
+        :return: True if a slow request may get a concurrent attempt
+        """
+        return self.hedging and not has_body and method in self.hedge_methods and method in self.methods
+
+    def hedge_delay(self) -> float:
+        """
+        Time after which a request still without response gets a hedged attempt: the tracked
+        percentile of the response times, within the configured bounds.
+        """
+        estimate = self.latency.estimate()
+        if estimate is None:
+            return self.hedge_max_delay
+        return min(self.hedge_max_delay, max(self.hedge_min_delay, estimate))
+
+    def backoff(self, retry: int) -> float:
+        """
+        Delay before a retry, with full jitter.
+
+        :param retry: Number of the retry, from 1
+        """
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** (retry - 1)))
@@ -1,52 +1,159 @@
 # app/core/services/session_manager.py
 from __future__ import annotations
 
+import heapq
+import secrets
 import time
+from abc import ABC
+from abc import abstractmethod
+
+
+class Session:
+    """
+    A session record, with slots instead of a per-instance dict.
+    """
+
+    __slots__ = ('user_id', 'created_at', 'last_active')
+
+    def __init__(self, user_id: str, now: float):
+        self.user_id = user_id
+        self.created_at = now
+        self.last_active = now
+
+
+class SessionBackend(ABC):
+    """
+    Abstract base class for the storage of sessions.
+    The timeout is passed on every call, so it can change when the configuration is reloaded.
+    """
+
+    @abstractmethod
+    def create(self, session_id: str, user_id: str, now: float, timeout: float):
+        """
+        Stores a new session.
+        """
+
+    @abstractmethod
+    def touch(self, session_id: str, now: float, timeout: float) -> bool:
+        """
+        Marks a session as active if it exists and has not expired. An expired session is removed.
+
+        :return: True if the session is valid
+        """
+
+    @abstractmethod
+    def revoke(self, session_id: str):
+        """
+        Removes a session.
+        """
+
+
+class LocalSessionBackend(SessionBackend):
+    """
+    In-process backend.
+
+    Sessions are indexed in a min-heap by the last activity they had when they were indexed.
+    Activity does not touch the heap: when an entry reaches the top, it is either expired and
+    dropped, or pushed back with its current last activity. Every call sweeps a few expired
+    entries, and the number of sessions is capped by evicting the least recently active ones.
+    """
+
+    def __init__(self, max_sessions: int = 100_000, sweep_batch: int = 2):
+        """
+        :param max_sessions: Maximum number of sessions kept in memory
+        :param sweep_batch: Number of expired sessions removed at most per call
+        """
+        self.max_sessions = max_sessions
+        self.sweep_batch = sweep_batch
+        self.sessions: dict[str, Session] = {}
+        self.expiry: list[tuple[float, str]] = []  # (indexed last activity, session ID), min-heap
+
+    def create(self, session_id: str, user_id: str, now: float, timeout: float):
+        self._sweep(now, timeout)
+        self.sessions[session_id] = Session(user_id, now)
+        heapq.heappush(self.expiry, (now, session_id))
+        while len(self.sessions) > self.max_sessions:
+            self._evict_least_recently_active()
+
+    def touch(self, session_id: str, now: float, timeout: float) -> bool:
+        self._sweep(now, timeout)
+        session = self.sessions.get(session_id)
+        if session is None:
+            return False
+        if now - session.last_active > timeout:
+            del self.sessions[session_id]
+            return False
+        session.last_active = now
+        return True
+
+    def revoke(self, session_id: str):
+        self.sessions.pop(session_id, None)
+        # Entries of revoked sessions stay in the heap until they reach the top; rebuild it if they pile up
+        if len(self.expiry) > 2 * len(self.sessions) + 64:
+            self.expiry = [(session.last_active, session_id) for session_id, session in self.sessions.items()]
+            heapq.heapify(self.expiry)
+
+    def _sweep(self, now: float, timeout: float):
+        """
+        Removes a bounded number of expired sessions, and reindexes the active ones found on the way.
+        """
+        for _ in range(self.sweep_batch):
+            # The indexed activity is never later than the real one, so nothing below the top has expired
+            if not self.expiry or now - self.expiry[0][0] <= timeout:
+                break
+            _, session_id = heapq.heappop(self.expiry)
+            session = self.sessions.get(session_id)
+            if session is None:
+                continue
+            if now - session.last_active > timeout:
+                del self.sessions[session_id]
+            else:
+                heapq.heappush(self.expiry, (session.last_active, session_id))
+
+    def _evict_least_recently_active(self):
+        while self.expiry:
+            indexed, session_id = heapq.heappop(self.expiry)
+            session = self.sessions.get(session_id)
+            if session is None:
+                continue
+            if session.last_active > indexed:
+                heapq.heappush(self.expiry, (session.last_active, session_id))
+                continue
+            del self.sessions[session_id]
+            return
+
 
 class SessionManager:
-    def __init__(self, session_timeout: int):
+    def __init__(self, session_timeout: int, max_sessions: int = 100_000, backend: SessionBackend | None = None):
         """
         Initializes the session manager with a session timeout.
 
         :param session_timeout: Time in seconds before a session expires due to inactivity
+        :param max_sessions: Maximum number of sessions kept by the local backend
+        :param backend: Backend storing the sessions, shared between processes if needed
         """
         self.session_timeout = session_timeout
-        self.sessions: dict[str, dict] = {}  # A dictionary to store sessions, mapping session IDs to session data
+        self.backend = backend or LocalSessionBackend(max_sessions)
 
     def create_session(self, user_id: str) -> str:
         """
         Creates a new session for the given user.
 
         :param user_id: The ID of the user
-        :return: The session ID
-        """
-        session_id = f"session_{user_id}_{int(time.time())}"  # Generate a unique session ID
-        self.sessions[session_id] = {
-            'user_id': user_id,
-            'created_at': time.time(),
-            'last_active': time.time(),
-        }
+        :return: The session ID, 256 random bits
+        """
+        session_id = secrets.token_urlsafe(32)
+        self.backend.create(session_id, user_id, time.time(), self.session_timeout)
         return session_id
 
     def validate_session(self, session_id: str) -> bool:
         """
-        Validates whether the session is still active.
+        Validates whether the session is still active, and marks it as active.
 
         :param session_id: The session ID
         :return: True if the session is valid, False if it is expired or invalid
         """
-        session = self.sessions.get(session_id)
-        if session is None:
-            return False
-
-        # Check if session is expired
-        if time.time() - session['last_active'] > self.session_timeout:
-            self.revoke_session(session_id)
-            return False
-
-        # Update last active timestamp
-        session['last_active'] = time.time()
-        return True
+        return self.backend.touch(session_id, time.time(), self.session_timeout)
 
     def revoke_session(self, session_id: str) -> None:
         """
@@ -54,8 +161,7 @@ class SessionManager:
 
         :param session_id: The session ID
         """
-        if session_id in self.sessions:
-            del self.sessions[session_id]
+        self.backend.revoke(session_id)
 
     def is_session_active(self, session_id: str) -> bool:
         """
@@ -64,4 +170,4 @@ class SessionManager:
         :param session_id: The session ID
         :return: True if the session is active, False otherwise
         """
-        return session_id in self.sessions and self.validate_session(session_id)
+        return self.validate_session(session_id)
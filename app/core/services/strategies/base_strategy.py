@@ -2,20 +2,72 @@ from __future__ import annotations
 
 from abc import ABC
 from abc import abstractmethod
+from collections.abc import Collection
+
+
+def server_key(server: dict) -> str:
+    """
+    Identifies a backend by address and port, so several backends may share a host.
+    """
+    return f"{server['address']}:{server['port']}"
+
 
 class LoadBalancingStrategy(ABC):
     """
     Abstract base class for all load balancing strategies.
+
+    Strategies are used from the event loop only, so their state needs no locking.
     """
     def __init__(self, servers: list[dict]):
         self.servers = servers
 
     @abstractmethod
-    def get_next_server(self) -> dict:
-        pass
+    def get_next_server(self, key: str | None = None, exclude: Collection[str] = ()) -> dict:
+        """
+        Selects a server.
+
+        :param key: Routing key of the request (client IP, header, cookie...), only used by
+            strategies that route the same key to the same server
+        :param exclude: Keys of servers to pick only if no other server is left, e.g. those
+            a retried request was already sent to
+        """
+
+    def remaining(self, exclude: Collection[str]) -> list[dict]:
+        """
+        :return: The servers not excluded, or all of them if every server is excluded
+        """
+        return [server for server in self.servers if server_key(server) not in exclude] or self.servers
+
+    def set_servers(self, servers: list[dict]):
+        """
+        Replaces the servers the strategy selects from, e.g. when their health changes.
+        """
+        self.servers = servers
 
     def handle_server_failure(self, server: dict):
         """
         Handles server failures, allowing strategies to react.
         """
         pass
+
+    def increment_connection(self, server: dict):
+        """
+        Records a request sent to the server, for strategies that track load.
+        """
+        pass
+
+    def decrement_connection(self, server: dict):
+        """
+        Records the end of a request sent to the server, for strategies that track load.
+        """
+        pass
+
+    def record_response(self, server: dict, latency: float, success: bool = True):
+        """
+        Records how long the server took to respond, for strategies that adapt to backend latency.
+
+        :param server: The server the request was sent to
+        :param latency: Seconds until the response headers were received, or until the failure
+        :param success: False if the request failed or the server answered with an error
+        """
+        pass
@@ -0,0 +1,60 @@
+from __future__ import annotations
+
+import hashlib
+from bisect import bisect
+from collections.abc import Collection
+from itertools import count
+
+from .base_strategy import LoadBalancingStrategy
+from .base_strategy import server_key
+
+def ring_hash(value: str) -> int:
+    """
+    Hashes a value to a 64-bit ring position, identical in every process.
+    """
+    return int.from_bytes(hashlib.blake2b(value.encode('utf-8'), digest_size=8).digest(), 'little')
+
+class ConsistentHashStrategy(LoadBalancingStrategy):
+    """
+    Implements consistent-hash load balancing strategy, routing the same key to the same server.
+
+    Each server owns `virtual_nodes` points per unit of `weight` on a hash ring, and a key goes to
+    the first point after its own hash, found by binary search (O(log n)). The ring only depends on
+    which servers are present, so when one is removed (e.g. marked unhealthy) only its keys move,
+    spread over the remaining servers. Requests without a key are distributed in turn.
+    """
+    def __init__(self, servers: list[dict], virtual_nodes: int = 160):
+        """
+        :param servers: Server entries from the load balancing configuration
+        :param virtual_nodes: Number of ring points per unit of server weight
+        """
+        self.virtual_nodes = virtual_nodes
+        self.counter = count()
+        super().__init__(servers)
+        self.set_servers(servers)
+
+    def set_servers(self, servers: list[dict]):
+        # The ring is only rebuilt when membership changes
+        self.servers = servers
+        points = []
+        for server in servers:
+            key = server_key(server)
+            for replica in range(self.virtual_nodes * max(1, int(server.get('weight', 1)))):
+                points.append((ring_hash(f"{key}#{replica}"), server))
+        points.sort(key=lambda point: point[0])
+        self.ring_hashes = [point[0] for point in points]
+        self.ring_servers = [point[1] for point in points]
+
+    def get_next_server(self, key: str | None = None, exclude: Collection[str] = ()) -> dict:
+        if key is None:
+            servers = self.remaining(exclude) if exclude else self.servers
+            return servers[next(self.counter) % len(servers)]
+        index = bisect(self.ring_hashes, ring_hash(key))
+        server = self.ring_servers[index % len(self.ring_servers)]
+        if exclude:
+            # Walk the ring to the next server not excluded, where the key would go without them
+            for offset in range(1, len(self.ring_servers)):
+                if server_key(server) not in exclude:
+                    break
+                server = self.ring_servers[(index + offset) % len(self.ring_servers)]
+        return server
@@ -1,53 +1,208 @@
 from __future__ import annotations
 
 import time
-from typing import Dict
-from typing import List
+from collections import deque
+from collections.abc import Callable
+from collections.abc import Collection
 
 from .base_strategy import LoadBalancingStrategy
+from .base_strategy import server_key
+from app.core.services.circuit_breaker import CircuitBreaker
+from app.core.services.circuit_breaker import CLOSED
+from app.core.services.circuit_breaker import HALF_OPEN
+from app.core.services.circuit_breaker import OPEN
+
+# Circuit state changes kept for the admin endpoint
+CIRCUIT_HISTORY_SIZE = 100
 
 class LoadBalancingStrategyWithHealth(LoadBalancingStrategy):
     """
-    Extends the base strategy class with basic health checking.
-    Acts as a wrapper for any base load balancing strategy.
+    Extends the base strategy class with basic health checking and optional per-backend
+    circuit breakers. Acts as a wrapper for any base load balancing strategy.
+
+    The base strategy is only given a new server list when a server's health or circuit state
+    changes, so selection costs the same as without health checking: unhealthy servers and
+    open circuits are never looked at. Health is set by active probes (see HealthChecker) and
+    by failed requests; without active probes, a failed server is restored after
+    `cooldown_period` seconds. With circuit breakers, failed requests only count towards the
+    failure rate of their server's circuit, which opens when the error or slow response rate
+    gets too high, and the server gets probe requests once the circuit is half-open.
     """
-    def __init__(self, base_strategy: LoadBalancingStrategy):
+    def __init__(
+        self, base_strategy: LoadBalancingStrategy, cooldown_period: float | None = 60,
+        circuit_breaker: dict | None = None, on_circuit_change: Callable[[dict, str], None] | None = None,
+    ):
+        """
+        :param base_strategy: The strategy selecting among the healthy servers
+        :param cooldown_period: Seconds after which a failed server is assumed to have recovered,
+            None to leave recovery to active probes
+        :param circuit_breaker: The `circuit_breaker` settings, None for no circuit breakers
+        :param on_circuit_change: Called with the server and its new state when a circuit changes
+        """
         self.base_strategy = base_strategy
         self.servers = base_strategy.servers
-        self.server_health: dict[str, bool] = {server['address']: True for server in self.servers}
-        self.failed_servers: dict[str, float] = {}  # Track failed servers and their failure times
+        self.cooldown_period = cooldown_period
+        self.servers_by_key = {server_key(server): server for server in self.servers}
+        self.server_health: dict[str, bool] = {key: True for key in self.servers_by_key}
+        self.failed_servers: dict[str, float] = {}  # Track failed servers and their failure times, oldest first
+
+        self.circuit_breaker = circuit_breaker
+        self.breakers: dict[str, CircuitBreaker] = {
+            key: CircuitBreaker(circuit_breaker) for key in self.servers_by_key
+        } if circuit_breaker is not None else {}
+        # Open and half-open circuits with the time their state expires. Every state lasts
+        # open_duration, so insertion order is expiry order.
+        self.circuit_timers: dict[str, float] = {}
+        self.circuit_transitions: deque[dict] = deque(maxlen=CIRCUIT_HISTORY_SIZE)
+        self.on_circuit_change = on_circuit_change
 
     def handle_server_failure(self, server: dict):
         """
         Mark the server as unhealthy and exclude it temporarily.
+        With circuit breakers, nothing changes: the failure was recorded by record_response(),
+        and the circuit decides from its failure rate whether the server is excluded.
+        """
+        if self.breakers:
+            return
+        key = server_key(server)
+        if self.cooldown_period is not None:
+            self.failed_servers.pop(key, None)
+            self.failed_servers[key] = time.time()
+        self.set_server_health(server, False)
+
+    def set_server_health(self, server: dict, healthy: bool) -> bool:
+        """
+        Sets the health of a server, and updates the servers selected from if it changed.
+
+        :return: True if the health of the server changed
+        """
+        key = server_key(server)
+        if key not in self.server_health or self.server_health[key] == healthy:
+            return False
+        self.server_health[key] = healthy
+        if healthy:
+            self.failed_servers.pop(key, None)
+        self.update_selectable()
+        return True
+
+    def update_selectable(self):
+        """
+        Gives the base strategy the healthy servers whose circuit lets requests through.
         """
-        self.server_health[server['address']] = False
-        self.failed_servers[server['address']] = time.time()
+        breakers = self.breakers
+        self.base_strategy.set_servers([
+            server for server in self.servers
+            if self.server_health[key := server_key(server)] and (key not in breakers or breakers[key].allows_requests())
+        ])
 
     def get_healthy_servers(self) -> list[dict]:
         """
         Return only servers marked as healthy.
         """
-        # Re-check the failed servers after a cooldown (e.g., 60 seconds)
-        cooldown_period = 60
-        current_time = time.time()
-
-        for address, failure_time in list(self.failed_servers.items()):
-            if current_time - failure_time > cooldown_period:
+        # Re-check the failed servers after the cooldown period
+        if self.failed_servers:
+            current_time = time.time()
+            for key, failure_time in list(self.failed_servers.items()):
+                if current_time - failure_time <= self.cooldown_period:  # type: ignore[operator]
+                    break
                 # Assume the server might have recovered, mark as healthy
-                self.server_health[address] = True
-                del self.failed_servers[address]
+                self.set_server_health(self.servers_by_key[key], True)
+        if self.circuit_timers:
+            self.expire_circuits()
+
+        return self.base_strategy.servers
 
-        return [server for server in self.servers if self.server_health[server['address']]]
+    def expire_circuits(self):
+        """
+        Lets probe requests through the circuits open for open_duration. Half-open circuits
+        whose probes got no answer (e.g. cancelled requests) get new probes.
+        """
+        now = time.monotonic()
+        changed = False
+        while self.circuit_timers:
+            key, expiry = next(iter(self.circuit_timers.items()))
+            if expiry > now:
+                break
+            breaker = self.breakers[key]
+            if breaker.state == OPEN:
+                self.change_circuit(key, HALF_OPEN)
+            else:
+                del self.circuit_timers[key]
+                breaker.probes = 0
+                self.circuit_timers[key] = now + breaker.open_duration
+            changed = True
+        if changed:
+            self.update_selectable()
 
-    def get_next_server(self) -> dict:
+    def change_circuit(self, key: str, state: str):
+        """
+        Moves a circuit to a new state, without updating the servers selected from.
+        """
+        breaker = self.breakers[key]
+        previous = breaker.state
+        breaker.transition(state)
+        self.circuit_changed(key, previous)
+
+    def circuit_changed(self, key: str, previous: str):
+        """
+        Sets the expiry timer of a circuit that changed state, and reports the change.
+        """
+        breaker = self.breakers[key]
+        self.circuit_timers.pop(key, None)
+        if breaker.state != CLOSED:
+            self.circuit_timers[key] = time.monotonic() + breaker.open_duration
+        self.circuit_transitions.append({'backend': key, 'from': previous, 'to': breaker.state, 'time': time.time()})
+        if self.on_circuit_change is not None:
+            self.on_circuit_change(self.servers_by_key[key], breaker.state)
+
+    def circuit_states(self) -> dict[str, dict]:
+        """
+        :return: The state and window counts of every circuit, by server key
+        """
+        return {key: breaker.snapshot() for key, breaker in self.breakers.items()}
+
+    def carry_over_circuits(self, previous: LoadBalancingStrategyWithHealth):
+        """
+        Keeps the circuits of the servers of a strategy being replaced, if their settings did not change.
+        """
+        if not self.breakers or previous.circuit_breaker != self.circuit_breaker:
+            return
+        for key in self.breakers.keys() & previous.breakers.keys():
+            self.breakers[key] = previous.breakers[key]
+        self.circuit_timers = {key: expiry for key, expiry in previous.circuit_timers.items() if key in self.breakers}
+        self.circuit_transitions.extend(previous.circuit_transitions)
+        self.update_selectable()
+
+    def get_next_server(self, key: str | None = None, exclude: Collection[str] = ()) -> dict:
         """
         Delegate to the base strategy but only return healthy servers.
         """
-        healthy_servers = self.get_healthy_servers()
-        if not healthy_servers:
+        if not self.get_healthy_servers():
             raise Exception('No healthy servers available')
 
-        # Set the base strategy's server list to the healthy servers only
-        self.base_strategy.servers = healthy_servers
-        return self.base_strategy.get_next_server()  # Use the base strategy to select a healthy server
+        server = self.base_strategy.get_next_server(key, exclude)  # Use the base strategy to select a healthy server
+        if self.breakers:
+            breaker = self.breakers[server_key(server)]
+            if breaker.state == HALF_OPEN:
+                # A probe: stop selecting the server once enough of them are in flight
+                breaker.probes += 1
+                if not breaker.allows_requests():
+                    self.update_selectable()
+        return server
+
+    def increment_connection(self, server: dict):
+        self.base_strategy.increment_connection(server)
+
+    def decrement_connection(self, server: dict):
+        self.base_strategy.decrement_connection(server)
+
+    def record_response(self, server: dict, latency: float, success: bool = True):
+        self.base_strategy.record_response(server, latency, success)
+        key = server_key(server)
+        breaker = self.breakers.get(key)
+        if breaker is None:
+            return
+        previous = breaker.state
+        if breaker.record(latency, success):
+            self.circuit_changed(key, previous)
+            self.update_selectable()
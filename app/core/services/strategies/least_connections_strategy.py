@@ -1,22 +1,71 @@
 from __future__ import annotations
 
+from collections.abc import Collection
+
 from .base_strategy import LoadBalancingStrategy
+from .base_strategy import server_key
 
 class LeastConnectionsStrategy(LoadBalancingStrategy):
     """
     Implements least-connections load balancing strategy.
     Tracks the number of active connections to each server.
+
+    Connection counts only change by one, so servers are kept in buckets indexed by their
+    count, with a pointer to the lowest non-empty bucket. Selection, increment and decrement
+    are all O(1), whatever the number of servers. Servers with the same count are used in turn.
     """
     def __init__(self, servers: list[dict]):
         super().__init__(servers)
-        self.server_connections = {server['address']: 0 for server in servers}
+        self.server_connections: dict[str, int] = {}
+        self.set_servers(servers)
+
+    def set_servers(self, servers: list[dict]):
+        self.servers = servers
+        self.selectable = {server_key(server): server for server in servers}
+        for key in self.selectable:
+            self.server_connections.setdefault(key, 0)
+        # connection count -> servers with that count, as an insertion-ordered set
+        self.buckets: dict[int, dict[str, dict]] = {}
+        for key, server in self.selectable.items():
+            self.buckets.setdefault(self.server_connections[key], {})[key] = server
+        self.min_connections = min(self.buckets, default=0)
 
-    def get_next_server(self) -> dict:
+    def get_next_server(self, key: str | None = None, exclude: Collection[str] = ()) -> dict:
         # Return the server with the fewest active connections
-        return min(self.servers, key=lambda server: self.server_connections[server['address']])
+        server = next(iter(self.buckets[self.min_connections].values()))
+        if exclude and server_key(server) in exclude:
+            # Scan the buckets upwards for the least loaded server left
+            for connections in sorted(self.buckets):
+                for candidate_key, candidate in self.buckets[connections].items():
+                    if candidate_key not in exclude:
+                        return candidate
+        return server
+
+    def _move(self, key: str, connections: int):
+        old = self.server_connections.get(key, 0)
+        self.server_connections[key] = connections
+        server = self.selectable.get(key)
+        if server is None:
+            # Excluded from selection (e.g. unhealthy), only the count is tracked
+            return
+
+        bucket = self.buckets[old]
+        del bucket[key]
+        if not bucket:
+            del self.buckets[old]
+        self.buckets.setdefault(connections, {})[key] = server
+
+        if connections < self.min_connections:
+            self.min_connections = connections
+        elif old == self.min_connections and old not in self.buckets:
+            self.min_connections = connections
 
     def increment_connection(self, server: dict):
-        self.server_connections[server['address']] += 1
+        key = server_key(server)
+        self._move(key, self.server_connections.get(key, 0) + 1)
 
     def decrement_connection(self, server: dict):
-        self.server_connections[server['address']] = max(0, self.server_connections[server['address']])
+        key = server_key(server)
+        connections = self.server_connections.get(key, 0)
+        if connections > 0:
+            self._move(key, connections - 1)
@@ -0,0 +1,113 @@
+from __future__ import annotations
+
+import math
+import random
+import time
+from collections.abc import Collection
+
+from .base_strategy import LoadBalancingStrategy
+from .base_strategy import server_key
+
+class PeakEWMA:
+    """
+    Peak-sensitive exponentially weighted moving average of a backend's latency.
+    A latency above the average replaces it at once, so a backend slowing down is noticed
+    immediately, while improvements are only trusted over time. The average also decays
+    while no response is recorded, so an avoided backend is eventually retried.
+    """
+    __slots__ = ('value', 'stamp', 'decay')
+
+    def __init__(self, decay: float, now: float, initial: float = 0.0):
+        """
+        :param decay: Time constant of the average, in seconds
+        :param now: Current time
+        :param initial: Initial latency estimate
+        """
+        self.decay = decay
+        self.value = initial
+        self.stamp = now
+
+    def observe(self, latency: float, now: float):
+        if latency > self.value:
+            self.value = latency
+        else:
+            weight = math.exp(-max(now - self.stamp, 0.0) / self.decay)
+            self.value = self.value * weight + latency * (1 - weight)
+        self.stamp = now
+
+    def get(self, now: float) -> float:
+        return self.value * math.exp(-max(now - self.stamp, 0.0) / self.decay)
+
+
+class PowerOfTwoChoicesStrategy(LoadBalancingStrategy):
+    """
+    Implements power-of-two-random-choices load balancing strategy.
+    Two distinct servers are picked at random and the one with fewer requests in flight wins,
+    the lower latency average breaking ties. Selection is O(1), and load spreads almost as well
+    as comparing every server, without all gateways herding onto the same one.
+    """
+    def __init__(self, servers: list[dict], decay: float = 10.0, failure_penalty: float = 1.0, clock=time.monotonic):
+        """
+        :param servers: Server entries from the load balancing configuration
+        :param decay: Time constant of the latency averages, in seconds
+        :param failure_penalty: Latency recorded for a failed request, in seconds
+        :param clock: Monotonic time source
+        """
+        super().__init__(servers)
+        self.decay = decay
+        self.failure_penalty = failure_penalty
+        self.clock = clock
+        self.inflight: dict[str, int] = {}
+        self.latency: dict[str, PeakEWMA] = {}
+        self.set_servers(servers)
+
+    def set_servers(self, servers: list[dict]):
+        self.servers = servers
+        now = self.clock()
+        for server in servers:
+            key = server_key(server)
+            self.inflight.setdefault(key, 0)
+            if key not in self.latency:
+                self.latency[key] = PeakEWMA(self.decay, now)
+
+    def cost(self, key: str, now: float) -> tuple[float, float]:
+        """
+        Cost of sending a request to a server, the server with the lowest cost is selected.
+        """
+        return self.inflight[key], self.latency[key].get(now)
+
+    def get_next_server(self, key: str | None = None, exclude: Collection[str] = ()) -> dict:
+        servers = self.remaining(exclude) if exclude else self.servers
+        count = len(servers)
+        if count == 1:
+            return servers[0]
+        first = random.randrange(count)
+        second = random.randrange(count - 1)
+        if second >= first:
+            second += 1
+        now = self.clock()
+        a, b = servers[first], servers[second]
+        return a if self.cost(server_key(a), now) <= self.cost(server_key(b), now) else b
+
+    def increment_connection(self, server: dict):
+        key = server_key(server)
+        self.inflight[key] = self.inflight.get(key, 0) + 1
+
+    def decrement_connection(self, server: dict):
+        key = server_key(server)
+        self.inflight[key] = max(0, self.inflight.get(key, 0) - 1)
+
+    def record_response(self, server: dict, latency: float, success: bool = True):
+        ewma = self.latency.get(server_key(server))
+        if ewma is not None:
+            ewma.observe(latency if success else max(latency, self.failure_penalty), self.clock())
+
+
+class PeakEWMAStrategy(PowerOfTwoChoicesStrategy):
+    """
+    Implements peak-EWMA load balancing strategy.
+    Like power-of-two-choices, but the cost of a server is its peak-EWMA latency scaled by
+    the requests already in flight, so slow backends receive proportionally less traffic.
+    """
+    def cost(self, key: str, now: float) -> tuple[float, float]:
+        return self.latency[key].get(now) * (self.inflight[key] + 1), self.inflight[key]
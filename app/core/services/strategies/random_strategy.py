@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import random
+from collections.abc import Collection
 
 from .base_strategy import LoadBalancingStrategy
 
@@ -8,5 +9,5 @@ class RandomStrategy(LoadBalancingStrategy):
     """
     Implements random load balancing strategy.
     """
-    def get_next_server(self) -> dict:
-        return random.choice(self.servers)
+    def get_next_server(self, key: str | None = None, exclude: Collection[str] = ()) -> dict:
+        return random.choice(self.remaining(exclude) if exclude else self.servers)
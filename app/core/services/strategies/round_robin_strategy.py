@@ -1,17 +1,21 @@
 # round_robin_strategy.py
 from __future__ import annotations
 
-from itertools import cycle
+from collections.abc import Collection
+from itertools import count
 
 from .base_strategy import LoadBalancingStrategy
 
 class RoundRobinStrategy(LoadBalancingStrategy):
     """
     Implements round-robin load balancing strategy.
+    A shared counter indexes the current server list, so the rotation keeps working when
+    the list is replaced by the healthy servers only.
     """
     def __init__(self, servers: list[dict]):
         super().__init__(servers)
-        self.server_iterator = cycle(servers)
+        self.counter = count()
 
-    def get_next_server(self) -> dict:
-        return next(self.server_iterator)
+    def get_next_server(self, key: str | None = None, exclude: Collection[str] = ()) -> dict:
+        servers = self.remaining(exclude) if exclude else self.servers
+        return servers[next(self.counter) % len(servers)]
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import heapq
+import time
+from collections.abc import Collection
+from itertools import count
+from math import gcd
+
+from .base_strategy import LoadBalancingStrategy
+from .base_strategy import server_key
+
+class WeightedRoundRobinStrategy(LoadBalancingStrategy):
+    """
+    Implements weighted round-robin load balancing strategy, honouring the `weight` of
+    each server entry (1 by default).
+
+    A smooth weighted order is precomputed into a schedule by stride scheduling, so
+    selection is O(1) and heavy servers are interleaved with light ones instead of receiving
+    bursts. A failed response halves the effective weight of its server and each successful
+    one restores a unit of it, so a struggling backend is drained without being removed.
+    Weight changes are applied by the next selection, rebuilding the schedule at most once
+    per `rebuild_interval` however many responses change a weight meanwhile.
+    """
+    def __init__(self, servers: list[dict], rebuild_interval: float = 1.0, clock=time.monotonic):
+        """
+        :param servers: Server entries from the load balancing configuration
+        :param rebuild_interval: Minimum seconds between two rebuilds caused by weight changes
+        :param clock: Monotonic time source
+        """
+        super().__init__(servers)
+        self.rebuild_interval = rebuild_interval
+        self.clock = clock
+        self.effective_weights: dict[str, int] = {}
+        self.counter = count()
+        self.set_servers(servers)
+
+    @staticmethod
+    def weight(server: dict) -> int:
+        return max(1, int(server.get('weight', 1)))
+
+    def set_servers(self, servers: list[dict]):
+        self.servers = servers
+        for server in servers:
+            self.effective_weights.setdefault(server_key(server), self.weight(server))
+        self._build_schedule()
+
+    def _build_schedule(self):
+        weights = [self.effective_weights[server_key(server)] for server in self.servers]
+        divisor = 0
+        for weight in weights:
+            divisor = gcd(divisor, weight)
+        weights = [weight // divisor for weight in weights] if divisor else weights
+
+        # Stride scheduling: the k-th turn of a server is due at (k + 0.5) / weight
+        turns = [(0.5 / weight, index) for index, weight in enumerate(weights)]
+        heapq.heapify(turns)
+        schedule = []
+        for _ in range(sum(weights)):
+            due, index = turns[0]
+            schedule.append(self.servers[index])
+            heapq.heapreplace(turns, (due + 1 / weights[index], index))
+        self.schedule = schedule
+        self.stale = False
+        self.built_at = self.clock()
+
+    def get_next_server(self, key: str | None = None, exclude: Collection[str] = ()) -> dict:
+        if self.stale and self.clock() - self.built_at >= self.rebuild_interval:
+            self._build_schedule()
+        server = self.schedule[next(self.counter) % len(self.schedule)]
+        if exclude:
+            # The next turns of the schedule, so the remaining servers keep their weights
+            for _ in range(len(self.schedule) - 1):
+                if server_key(server) not in exclude:
+                    break
+                server = self.schedule[next(self.counter) % len(self.schedule)]
+        return server
+
+    def record_response(self, server: dict, latency: float, success: bool = True):
+        key = server_key(server)
+        effective = self.effective_weights.get(key)
+        if effective is None:
+            return
+        updated = max(1, effective // 2) if not success else min(self.weight(server), effective + 1)
+        if updated != effective:
+            self.effective_weights[key] = updated
+            self.stale = True
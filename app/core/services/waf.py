@@ -5,10 +5,216 @@ import re
 
 from fastapi import HTTPException
 
+try:
+    from re import _parser as sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover
+    import sre_parse  # type: ignore[no-redef]
+
+# Characters that give a WAF pattern regex semantics; patterns without them are keyword lists
+REGEX_METACHARACTERS = frozenset('.^$*+?{}[]\\()')
+
+# Constructs that depend on group numbering and cannot be merged into a combined alternation
+GROUP_REFERENCE = re.compile(r'\\[1-9]|\(\?P=|\(\?\(')
+
+# Inline flags applying to the whole pattern, only allowed at the start of an expression
+GLOBAL_FLAGS = re.compile(r'\(\?[aiLmsux]+\)')
+
+# Request zones a rule inspects when it does not declare any
+DEFAULT_ZONES = ('path', 'query', 'headers', 'body')
+HEADER_ZONE_PREFIX = 'header:'
+
+# Number of request body bytes inspected by default
+DEFAULT_MAX_BODY_SIZE = 64 * 1024
+
+# Shortest literal worth using as a prefilter for a regex rule
+MIN_PREFILTER_LITERAL = 3
+
+
+def literal_alternatives(pattern: str) -> list[str] | None:
+    """
+    Splits a pattern such as "SELECT|UPDATE|DELETE" into its keywords.
+
+    :param pattern: The WAF rule pattern
+    :return: The keywords, or None if the pattern uses regex syntax
+    """
+    keywords = pattern.split('|')
+    if any(not keyword or REGEX_METACHARACTERS.intersection(keyword) for keyword in keywords):
+        return None
+    return keywords
+
+
+def required_literal(pattern: str) -> str | None:
+    """
+    Finds the longest run of literal characters that every match of the pattern must contain.
+
+    :param pattern: The WAF rule pattern
+    :return: The lowercase literal, or None if the pattern has no usable required literal
+    """
+    best = ''
+
+    def walk(items) -> None:
+        nonlocal best
+        run = ''
+        for op, value in items:
+            if op is sre_parse.LITERAL:
+                run += chr(value)
+                continue
+            best = max(best, run, key=len)
+            run = ''
+            if op is sre_parse.SUBPATTERN:
+                walk(value[-1])
+        best = max(best, run, key=len)
+
+    try:
+        walk(sre_parse.parse(pattern))
+    except re.error:
+        return None
+    return best.lower() if len(best) >= MIN_PREFILTER_LITERAL else None
+
+
+def trie_pattern(keywords: list[str]) -> str:
+    """
+    Builds a regex equivalent to the alternation of the keywords, shaped as a prefix trie.
+    The regex engine then tries each keyword prefix once per position instead of once per keyword,
+    which keeps large keyword lists close to a single Aho-Corasick style pass.
+
+    :param keywords: Keywords to match
+    :return: Regex source matching any of the keywords
+    """
+    trie: dict = {}
+    for keyword in keywords:
+        node = trie
+        for char in keyword:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    def build(node: dict) -> str:
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ''
+        if len(branches) == 1 and '' not in node:
+            return branches[0]
+        group = f"(?:{'|'.join(branches)})"
+        return f"{group}?" if '' in node else group
+
+    return build(trie)
+
+
+class CompiledRuleSet:
+    """
+    WAF rules precompiled at construction so that clean content is scanned once.
+
+    Content is lowercased once and searched with a trie-shaped keyword prefilter. Keyword-list
+    rules fire directly on a prefilter hit; regex rules with a required literal are only evaluated
+    when their literal was seen. Regex rules without one are merged into a single named-group
+    alternation, and rules using back-references, named groups or global inline flags are kept
+    as standalone patterns.
+    """
+
+    def __init__(self, rules: list[dict], binary: bool = False):
+        """
+        Compiles the rules.
+
+        :param rules: WAF rules, each with a `name` and a `pattern`
+        :param binary: Compile the rules to scan bytes instead of text
+        """
+        self.rules = rules
+        self.binary = binary
+        # keyword -> rules to confirm when the keyword is seen, as (rule index, compiled pattern or None, rule)
+        self.keyword_rules: dict[str, list[tuple[int, re.Pattern | None, dict]]] = {}
+        self.group_rules: dict[str, tuple[re.Pattern, dict]] = {}
+        self.standalone_rules: list[tuple[re.Pattern, dict]] = []
+
+        branches = []
+        for index, rule in enumerate(rules):
+            pattern = rule.get('pattern', '')
+            keywords = literal_alternatives(pattern)
+            if keywords is not None:
+                for keyword in keywords:
+                    self.keyword_rules.setdefault(keyword.lower(), []).append((index, None, rule))
+                continue
+
+            compiled = self._compile(pattern, re.IGNORECASE)
+            literal = required_literal(pattern)
+            if literal is not None:
+                self.keyword_rules.setdefault(literal, []).append((index, compiled, rule))
+            elif compiled.groupindex or GROUP_REFERENCE.search(pattern) or GLOBAL_FLAGS.search(pattern):
+                # Group names would clash and global flags are rejected inside the alternation
+                self.standalone_rules.append((compiled, rule))
+            else:
+                group = f"waf_rule_{index}"
+                self.group_rules[group] = (compiled, rule)
+                branches.append(f"(?P<{group}>{pattern})")
+
+        # A hit on a keyword also implies a hit on every keyword that is a prefix of it
+        self.keyword_candidates = {
+            self._encode(keyword): sorted(
+                (candidate for prefix, candidates in self.keyword_rules.items()
+                 if keyword.startswith(prefix) for candidate in candidates),
+                key=lambda candidate: candidate[0],
+            )
+            for keyword in self.keyword_rules
+        }
+        self.prefilter = self._compile(f"(?=({trie_pattern(list(self.keyword_rules))}))") if self.keyword_rules else None
+        self.matcher = None
+        if branches:
+            try:
+                self.matcher = self._compile('|'.join(branches), re.IGNORECASE)
+            except re.error:
+                # Patterns that only compile on their own are matched one by one
+                self.standalone_rules[:0] = self.group_rules.values()
+                self.group_rules = {}
+
+    def _encode(self, text: str):
+        return text.encode('utf-8') if self.binary else text
+
+    def _compile(self, pattern: str, flags: int = 0) -> re.Pattern:
+        return re.compile(self._encode(pattern), flags)
+
+    def match(self, content: str | bytes) -> dict | None:
+        """
+        Scans the content and returns the rule that fired.
+
+        :param content: The content to inspect, bytes if the rule set is binary
+        :return: The matching rule, or None if the content is clean
+        """
+        content = content.lower()
+
+        if self.prefilter is not None:
+            # Content repeating a keyword must not run its rules once per occurrence
+            seen = set()
+            checked: set[int] = set()
+            for found in self.prefilter.finditer(content):
+                keyword = found.group(1)
+                if keyword in seen:
+                    continue
+                seen.add(keyword)
+                for index, pattern, rule in self.keyword_candidates[keyword]:
+                    if index in checked:
+                        continue
+                    checked.add(index)
+                    if pattern is None or pattern.search(content):
+                        return rule
+
+        if self.matcher is not None:
+            found = self.matcher.search(content)
+            if found is not None:
+                return self.group_rules[found.lastgroup][1]
+
+        for pattern, rule in self.standalone_rules:
+            if pattern.search(content):
+                return rule
+        return None
+
+
 class WAF:
     """
     Web Application Firewall (WAF) class that checks incoming requests
     against predefined patterns and blocks malicious traffic.
+
+    Each rule may restrict the request zones it inspects with `zones`: "path", "query",
+    "headers" (every header), "header:<name>" (a single header) and "body". Rules without
+    `zones` inspect every zone. Only the first `max_body_size` bytes of a body are inspected.
     """
 
     def __init__(self, waf_config):
@@ -19,6 +225,32 @@ class WAF:
         """
         self.enabled = waf_config.get('enabled', False)
         self.rules = waf_config.get('rules', [])
+        self.max_body_size = waf_config.get('max_body_size', DEFAULT_MAX_BODY_SIZE)
+        self.rule_set = CompiledRuleSet(self.rules)
+
+        zone_rules: dict[str, list[dict]] = {}
+        for rule in self.rules:
+            for zone in rule.get('zones', DEFAULT_ZONES):
+                zone = zone.lower()
+                if zone not in DEFAULT_ZONES and not zone.startswith(HEADER_ZONE_PREFIX):
+                    raise ValueError(f"Unsupported WAF zone '{zone}' in rule: {rule['name']}")
+                zone_rules.setdefault(zone, []).append(rule)
+
+        self.path_rules = CompiledRuleSet(zone_rules['path']) if 'path' in zone_rules else None
+        self.query_rules = CompiledRuleSet(zone_rules['query']) if 'query' in zone_rules else None
+        self.headers_rules = CompiledRuleSet(zone_rules['headers'], binary=True) if 'headers' in zone_rules else None
+        self.body_rules = CompiledRuleSet(zone_rules['body'], binary=True) if 'body' in zone_rules else None
+        self.header_rules = {
+            zone[len(HEADER_ZONE_PREFIX):].encode('latin-1'): CompiledRuleSet(rules, binary=True)
+            for zone, rules in zone_rules.items() if zone.startswith(HEADER_ZONE_PREFIX)
+        }
+
+    @property
+    def body_inspection_limit(self) -> int:
+        """
+        Number of body bytes the WAF needs to see, 0 if no enabled rule inspects the body.
+        """
+        return self.max_body_size if self.enabled and self.body_rules is not None else 0
 
     def inspect_request(self, request_content: str):
         """
@@ -30,7 +262,35 @@ class WAF:
         if not self.enabled:
             return
 
-        for rule in self.rules:
-            pattern = rule.get('pattern', '')
-            if re.search(pattern, request_content, re.IGNORECASE):
-                raise HTTPException(status_code=403, detail=f"Blocked by WAF rule: {rule['name']}")
+        self._block(self.rule_set.match(request_content))
+
+    def inspect_zones(self, path: str = '', query: str = '', headers: list[tuple[bytes, bytes]] = [], body: bytes = b''):
+        """
+        Inspects each zone of a request against the rules that apply to it.
+
+        :param path: The decoded request path
+        :param query: The decoded query string
+        :param headers: Raw (name, value) header pairs with lowercase names
+        :param body: The beginning of the request body, truncated to `max_body_size`
+        :raises HTTPException: If malicious content is detected
+        """
+        if not self.enabled:
+            return
+
+        if self.path_rules is not None and path:
+            self._block(self.path_rules.match(path))
+        if self.query_rules is not None and query:
+            self._block(self.query_rules.match(query))
+        if self.headers_rules is not None and headers:
+            self._block(self.headers_rules.match(b'\n'.join(name + b': ' + value for name, value in headers)))
+        if self.header_rules:
+            for name, value in headers:
+                header_rules = self.header_rules.get(name)
+                if header_rules is not None:
+                    self._block(header_rules.match(value))
+        if self.body_rules is not None and body:
+            self._block(self.body_rules.match(body[:self.max_body_size]))
+
+    def _block(self, rule: dict | None):
+        if rule is not None:
+            raise HTTPException(status_code=403, detail=f"Blocked by WAF rule: {rule['name']}")
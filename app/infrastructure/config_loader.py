@@ -21,6 +21,11 @@ def load_config(config_path: str) -> GatewayEntity:
     load_balancing = config.get('load_balancing', {})
     logging = config.get('logging', {})
     security = config.get('security', {})
+    config_reload = config.get('config_reload', {})
+    caching = config.get('caching', {})
+    coalescing = config.get('coalescing', {})
+    metrics = config.get('metrics', {})
+    admin = config.get('admin', {})
 
     return GatewayEntity(
         name=general.get('gateway_name', 'Unnamed Gateway'),
@@ -33,4 +38,11 @@ def load_config(config_path: str) -> GatewayEntity:
         load_balancing=load_balancing,
         logging=logging,
         security=security,
+        allowed_ip_feeds=access_control.get('allowed_ips_files', []),
+        blocked_ip_feeds=access_control.get('blocked_ips_files', []),
+        config_reload=config_reload,
+        caching=caching,
+        coalescing=coalescing,
+        metrics=metrics,
+        admin=admin,
     )
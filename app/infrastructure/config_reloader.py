@@ -0,0 +1,173 @@
+# app/infrastructure/config_reloader.py
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import signal
+import time
+from collections.abc import Callable
+
+from prometheus_client import Counter
+from prometheus_client import Histogram
+
+from app.core.services.gateway_service import GatewayService
+from app.infrastructure.config_loader import load_config
+
+logger = logging.getLogger('guardian')
+
+CONFIG_RELOADS = Counter(
+    'guardian_config_reloads_total', 'Configuration reloads', ['result'],
+)
+
+CONFIG_RELOAD_LATENCY = Histogram(
+    'guardian_config_reload_latency_seconds', 'Time spent loading and compiling a new configuration',
+)
+
+# Seconds between two checks of the watched files
+DEFAULT_POLL_INTERVAL = 2.0
+
+
+class ConfigReloader:
+    """
+    Rebuilds the gateway service when its configuration changes, without restarting the process.
+
+    The configuration file and the IP feed and JWKS files it references are polled for changes, and
+    SIGHUP forces a reload. The new service (WAF, IP sets...) is compiled in a worker thread,
+    then takes over the rate limiting, session and backend health state of the current one on
+    the event loop, and is published with a single reference assignment: requests in flight
+    finish on the snapshot they started with. The backends of the replaced service that were
+    not carried over are then closed. An invalid configuration is logged and counted, and the
+    current service stays in place.
+    """
+
+    def __init__(
+        self, config_path: str, get_service: Callable[[], GatewayService],
+        set_service: Callable[[GatewayService], None], poll_interval: float = DEFAULT_POLL_INTERVAL,
+    ):
+        """
+        :param config_path: Path to the configuration YAML file
+        :param get_service: Returns the service currently in use
+        :param set_service: Publishes a new service
+        :param poll_interval: Seconds between two checks of the watched files
+        """
+        self.config_path = config_path
+        self.get_service = get_service
+        self.set_service = set_service
+        self.poll_interval = poll_interval
+        self.mtimes = self._read_mtimes()
+        self.requested = asyncio.Event()
+        self.task: asyncio.Task | None = None
+
+    def _watched_files(self) -> list[str]:
+        gateway = self.get_service().gateway
+        jwks_file = gateway.security.get('authentication', {}).get('jwks_file')
+        return [self.config_path, *gateway.allowed_ip_feeds, *gateway.blocked_ip_feeds, *([jwks_file] if jwks_file else [])]
+
+    def _read_mtimes(self) -> dict[str, int]:
+        mtimes = {}
+        for path in self._watched_files():
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                mtimes[path] = 0
+        return mtimes
+
+    def changed(self) -> bool:
+        """
+        Tells whether a watched file changed since the last reload attempt.
+        """
+        return self._read_mtimes() != self.mtimes
+
+    def build(self, previous: GatewayService) -> GatewayService:
+        """
+        Loads the configuration and compiles a new service, reusing the unchanged parts of the
+        current one. Runs in a worker thread, so the live state of the current service is not
+        touched: see GatewayService.carry_over().
+
+        :param previous: The service currently in use
+        :return: The new service, not published yet
+        """
+        self.mtimes = self._read_mtimes()
+        return GatewayService(load_config(self.config_path), previous=previous)
+
+    async def reload(self) -> bool:
+        """
+        Builds a new service off the event loop and publishes it.
+
+        :return: True if the new configuration is in use, False if it was rejected
+        """
+        start = time.perf_counter()
+        previous = self.get_service()
+        service = None
+        try:
+            service = await asyncio.to_thread(self.build, previous)
+            # Back on the event loop, where the current service handles requests
+            service.carry_over(previous)
+        except Exception as e:
+            if service is not None:
+                service.close(replacement=previous)
+            CONFIG_RELOADS.labels(result='failure').inc()
+            logger.error('Configuration reload failed, keeping the current configuration: %s', e)
+            return False
+
+        self.set_service(service)
+        # Release the flusher threads, connections and shared memory the new service did not take over
+        previous.close(replacement=service)
+        # Watch the feed files of the new configuration
+        self.mtimes = self._read_mtimes()
+        CONFIG_RELOAD_LATENCY.observe(time.perf_counter() - start)
+        CONFIG_RELOADS.labels(result='success').inc()
+        logger.info('Configuration reloaded from %s', self.config_path)
+        return True
+
+    def request_reload(self):
+        """
+        Forces a reload on the next iteration, even if no watched file changed.
+        """
+        self.requested.set()
+
+    async def run(self):
+        """
+        Watches the configuration until cancelled.
+        """
+        while True:
+            try:
+                await asyncio.wait_for(self.requested.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            if self.requested.is_set() or self.changed():
+                self.requested.clear()
+                await self.reload()
+
+    def start(self):
+        """
+        Starts watching the configuration, and reloading on SIGHUP where signals are available.
+        Must be called from the running event loop.
+        """
+        loop = asyncio.get_running_loop()
+        # The event must belong to the running loop on Python versions that bind it at creation
+        self.requested = asyncio.Event()
+        try:
+            loop.add_signal_handler(signal.SIGHUP, self.request_reload)
+        except (AttributeError, NotImplementedError, RuntimeError, ValueError):
+            # Not available on Windows, nor outside the main thread
+            logger.info('SIGHUP configuration reload is unavailable, watching %s only', self.config_path)
+        self.task = loop.create_task(self.run())
+
+    async def stop(self):
+        """
+        Stops watching the configuration.
+        """
+        if self.task is None:
+            return
+        try:
+            asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+        except (AttributeError, NotImplementedError, RuntimeError, ValueError):
+            pass
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
@@ -0,0 +1,218 @@
+# app/infrastructure/health_checker.py
+from __future__ import annotations
+
+import asyncio
+import logging
+import random
+import time
+from collections.abc import Callable
+
+from prometheus_client import Counter
+from prometheus_client import Gauge
+from prometheus_client import Histogram
+
+from app.core.services.circuit_breaker import CLOSED
+from app.core.services.circuit_breaker import HALF_OPEN
+from app.core.services.circuit_breaker import OPEN
+from app.core.services.load_balancer_service import LoadBalancerService
+from app.infrastructure.upstream_pool import backend_key
+from app.infrastructure.upstream_pool import UpstreamPool
+
+logger = logging.getLogger('guardian')
+
+HEALTH_CHECK_LATENCY = Histogram(
+    'guardian_health_check_latency_seconds', 'Latency of backend health probes', ['backend'],
+)
+
+HEALTH_CHECK_TRANSITIONS = Counter(
+    'guardian_health_check_transitions_total', 'Backend health state changes', ['backend', 'state'],
+)
+
+BACKEND_UP = Gauge(
+    'guardian_backend_up', 'Whether the backend is considered healthy (1) or not (0)', ['backend'],
+    multiprocess_mode='livemin',  # With several workers, healthy only if every worker agrees
+)
+
+CIRCUIT_TRANSITIONS = Counter(
+    'guardian_circuit_breaker_transitions_total', 'Backend circuit breaker state changes', ['backend', 'state'],
+)
+
+CIRCUIT_STATE = Gauge(
+    'guardian_circuit_breaker_state', 'Circuit of the backend: closed (0), half-open (1) or open (2)', ['backend'],
+    multiprocess_mode='livemax',  # With several workers, the most restrictive state of any worker
+)
+
+CIRCUIT_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+DEFAULT_HEALTH_CHECK_CONFIG = {
+    'path': '/health',
+    'interval': 5.0,  # seconds between two probes of a backend
+    'timeout': 2.0,
+    'rise': 2,  # consecutive successful probes before an unhealthy backend is used again
+    'fall': 3,  # consecutive failed probes before a healthy backend is taken out
+    'jitter': 0.1,  # fraction of the interval probes are randomly shifted by
+}
+
+
+def publish_circuit_change(server: dict, state: str):
+    """
+    Reports a circuit state change in the metrics and the log.
+
+    :param server: The backend whose circuit changed
+    :param state: Its new state
+    """
+    key = backend_key(server)
+    CIRCUIT_TRANSITIONS.labels(backend=key, state=state).inc()
+    CIRCUIT_STATE.labels(backend=key).set(CIRCUIT_STATE_VALUES[state])
+    logger.warning('Circuit of backend %s is %s', key, state)
+
+
+class BackendProbe:
+    """
+    Probe results of one backend, with the consecutive success and failure streaks.
+    """
+
+    def __init__(self, server: dict):
+        self.server = server
+        self.healthy = True
+        self.successes = 0
+        self.failures = 0
+        self.task: asyncio.Task | None = None
+
+
+class HealthChecker:
+    """
+    Actively probes every backend of the current load balancer, concurrently and in the background.
+
+    Each backend has its own probe loop, started at a random offset and rescheduled with jitter so
+    probes of many gateways and backends do not synchronize. A backend is marked down after `fall`
+    consecutive failed probes and up again after `rise` consecutive successful ones; only these
+    transitions update the load balancer, which precomputes its healthy servers. The backends are
+    resynchronized on every interval, so configuration reloads are picked up.
+    """
+
+    def __init__(self, get_load_balancer: Callable[[], LoadBalancerService | None], upstream_pool: UpstreamPool, config: dict):
+        """
+        :param get_load_balancer: Returns the load balancer currently in use
+        :param upstream_pool: Pool whose keep-alive clients send the probes
+        :param config: The `load_balancing.health_check` settings
+        """
+        self.get_load_balancer = get_load_balancer
+        self.upstream_pool = upstream_pool
+        self.config = {**DEFAULT_HEALTH_CHECK_CONFIG, **config}
+        self.probes: dict[str, BackendProbe] = {}
+        self.load_balancer: LoadBalancerService | None = None
+        self.task: asyncio.Task | None = None
+
+    async def probe(self, server: dict) -> bool:
+        """
+        Sends one health probe to the backend.
+
+        :return: True if the backend answered with a 2xx or 3xx status in time
+        """
+        start = time.perf_counter()
+        try:
+            response = await self.upstream_pool.client_for(server).get(self.config['path'], timeout=self.config['timeout'])
+            healthy = 200 <= response.status_code < 400
+        except Exception:
+            healthy = False
+        HEALTH_CHECK_LATENCY.labels(backend=backend_key(server)).observe(time.perf_counter() - start)
+        return healthy
+
+    def record(self, probe: BackendProbe, success: bool):
+        """
+        Updates the streaks of a backend, and its health when a threshold is crossed.
+        """
+        if probe.healthy and self.load_balancer is not None and not self.load_balancer.is_server_healthy(probe.server):
+            # Taken out by a failed request: it comes back after `rise` successful probes
+            probe.healthy = False
+            probe.successes = 0
+            BACKEND_UP.labels(backend=backend_key(probe.server)).set(0)
+        if success:
+            probe.successes += 1
+            probe.failures = 0
+            changed = not probe.healthy and probe.successes >= self.config['rise']
+        else:
+            probe.failures += 1
+            probe.successes = 0
+            changed = probe.healthy and probe.failures >= self.config['fall']
+        if changed:
+            probe.healthy = success
+            self._apply(probe)
+
+    def _apply(self, probe: BackendProbe):
+        key = backend_key(probe.server)
+        state = 'up' if probe.healthy else 'down'
+        HEALTH_CHECK_TRANSITIONS.labels(backend=key, state=state).inc()
+        BACKEND_UP.labels(backend=key).set(1 if probe.healthy else 0)
+        logger.warning('Backend %s is %s', key, state)
+        if self.load_balancer is not None:
+            self.load_balancer.set_server_health(probe.server, probe.healthy)
+
+    async def _run_probe(self, probe: BackendProbe):
+        interval = self.config['interval']
+        jitter = self.config['jitter']
+        await asyncio.sleep(random.uniform(0, interval))
+        while True:
+            self.record(probe, await self.probe(probe.server))
+            await asyncio.sleep(interval * random.uniform(1 - jitter, 1 + jitter))
+
+    def sync(self):
+        """
+        Starts probing new backends, stops probing removed ones, and applies the known health
+        to a load balancer replaced by a configuration reload.
+        """
+        load_balancer = self.get_load_balancer()
+        servers = {backend_key(server): server for server in load_balancer.servers} if load_balancer else {}
+
+        for key in list(self.probes):
+            if key not in servers:
+                task = self.probes.pop(key).task
+                if task is not None:
+                    task.cancel()
+                BACKEND_UP.remove(key)
+
+        replaced = load_balancer is not self.load_balancer
+        self.load_balancer = load_balancer
+        for key, server in servers.items():
+            probe = self.probes.get(key)
+            if probe is None:
+                probe = self.probes[key] = BackendProbe(server)
+                BACKEND_UP.labels(backend=key).set(1)
+                probe.task = asyncio.get_running_loop().create_task(self._run_probe(probe))
+            elif replaced and load_balancer is not None:
+                probe.server = server
+                load_balancer.set_server_health(server, probe.healthy)
+
+    async def run(self):
+        """
+        Keeps the probed backends in sync with the load balancer until cancelled.
+        """
+        try:
+            while True:
+                self.sync()
+                await asyncio.sleep(self.config['interval'])
+        finally:
+            for probe in self.probes.values():
+                if probe.task is not None:
+                    probe.task.cancel()
+            self.probes = {}
+
+    def start(self):
+        """
+        Starts the health checks. Must be called from the running event loop.
+        """
+        self.task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        """
+        Stops the health checks.
+        """
+        if self.task is None:
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except asyncio.CancelledError:
+            pass
+        self.task = None
@@ -0,0 +1,277 @@
+# app/infrastructure/rate_limit_backends.py
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+import weakref
+
+from app.core.services.rate_limiter import RateLimitBackend
+from app.infrastructure.resp_client import RespClient
+from app.infrastructure.shared_table import key_hash
+from app.infrastructure.shared_table import resolve_backend
+from app.infrastructure.shared_table import SharedSlotTable
+
+logger = logging.getLogger('guardian')
+
+
+def sliding_window_estimate(previous: int, current: int, now: float, window: float) -> float:
+    """
+    Estimates the number of requests in the last window from two fixed-window counters,
+    weighting the previous window by the part of it that still overlaps the sliding window.
+    """
+    elapsed = (now % window) / window
+    return previous * (1 - elapsed) + current
+
+
+class SharedMemoryRateLimitBackend(RateLimitBackend):
+    """
+    Backend shared by every worker process on the host, stored in a shared memory table.
+    Each client uses a 32-byte record: key hash, window index, current and previous
+    window counts and ban expiry.
+    """
+
+    RECORD_FORMAT = 'QqIId'
+
+    def __init__(self, max_requests: int, window: float = 60.0, name: str = 'guardian_rate_limit', slots: int = 65536):
+        """
+        :param max_requests: Maximum number of requests allowed per window
+        :param window: Length of the window in seconds
+        :param name: Name of the shared memory block, identical in every worker
+        :param slots: Number of client records; the least recently active are evicted when full
+        """
+        self.max_requests = max_requests
+        self.window = window
+        self.table = SharedSlotTable(name, slots, self.RECORD_FORMAT)
+
+    def _victim_score(self, record: tuple, now: float) -> float:
+        # Evict the record active the longest ago: the end of its last window, or of its ban while it lasts
+        banned_until = record[4] if record[4] > now else 0.0
+        return max((record[1] + 1) * self.window, banned_until)
+
+    def is_banned(self, client_ip: str, now: float) -> bool:
+        with self.table.locked():
+            slot = self.table.find(key_hash(client_ip))
+            return slot is not None and self.table.read(slot)[4] > now
+
+    def hit(self, client_ip: str, now: float) -> bool:
+        hashed = key_hash(client_ip)
+        index = int(now // self.window)
+        with self.table.locked():
+            slot = self.table.find(hashed, victim_score=lambda record: self._victim_score(record, now))
+            _, window_index, current, previous, banned_until = self.table.read(slot)
+            if window_index != index:
+                previous = current if window_index == index - 1 else 0
+                current = 0
+            allowed = sliding_window_estimate(previous, current, now, self.window) < self.max_requests
+            if allowed:
+                current += 1
+            self.table.write(slot, (hashed, index, current, previous, banned_until))
+        return allowed
+
+    def ban(self, client_ip: str, until: float):
+        hashed = key_hash(client_ip)
+        now = time.time()
+        with self.table.locked():
+            slot = self.table.find(hashed, victim_score=lambda record: self._victim_score(record, now))
+            record = self.table.read(slot)
+            self.table.write(slot, (hashed, record[1], record[2], record[3], until))
+
+    def close(self):
+        self.table.close()
+
+
+class RedisRateLimitBackend(RateLimitBackend):
+    """
+    Backend shared by every gateway replica through a Redis-protocol server.
+
+    Requests are counted locally and a background thread flushes the counts every
+    `flush_interval` seconds as one pipeline of atomic INCRBY commands, reading back the
+    global counters at the same time. Decisions therefore never wait for the network:
+    they use the last known global counts plus the local counts not flushed yet. When
+    the server is slow or unreachable, the local counts are kept, so limiting degrades
+    to local approximate counting instead of failing.
+    """
+
+    def __init__(
+        self, max_requests: int, window: float = 60.0, host: str = '127.0.0.1', port: int = 6379,
+        prefix: str = 'guardian:rate_limit', flush_interval: float = 0.05, timeout: float = 0.1,
+    ):
+        """
+        :param max_requests: Maximum number of requests allowed per window
+        :param window: Length of the window in seconds
+        :param host: Server host
+        :param port: Server port
+        :param prefix: Prefix of the keys stored on the server
+        :param flush_interval: Seconds between two flushes of the local counts
+        :param timeout: Seconds after which the server is considered slow
+        """
+        self.max_requests = max_requests
+        self.window = window
+        self.prefix = prefix
+        self.flush_interval = flush_interval
+        self.client = RespClient(host, port, timeout)
+        self.lock = threading.Lock()
+        self.pending: dict[str, list[int]] = {}  # client -> [window index, count not flushed yet]
+        self.inflight: dict[str, list[int]] = {}  # counts being flushed, still unknown to the server replies
+        self.counts: dict[str, list[int]] = {}  # client -> [window index, previous, current] from the server
+        self.bans: dict[str, float] = {}
+        self.pending_bans: dict[str, float] = {}
+        self.stopped = threading.Event()
+        self.start_flusher()
+        _flushing_backends.add(self)
+
+    def start_flusher(self):
+        self.flusher = threading.Thread(target=self._run, name='rate-limit-flusher', daemon=True)
+        self.flusher.start()
+
+    def is_banned(self, client_ip: str, now: float) -> bool:
+        banned_until = self.bans.get(client_ip)
+        return banned_until is not None and banned_until > now
+
+    def hit(self, client_ip: str, now: float) -> bool:
+        index = int(now // self.window)
+        with self.lock:
+            previous = current = 0
+            counts = self.counts.get(client_ip)
+            if counts is not None:
+                if counts[0] == index:
+                    previous, current = counts[1], counts[2]
+                elif counts[0] == index - 1:
+                    previous = counts[2]
+
+            inflight = self.inflight.get(client_ip)
+            if inflight is not None and inflight[0] == index:
+                current += inflight[1]
+
+            pending = self.pending.get(client_ip)
+            if pending is None or pending[0] != index:
+                pending = self.pending[client_ip] = [index, 0]
+
+            if sliding_window_estimate(previous, current + pending[1], now, self.window) >= self.max_requests:
+                return False
+            pending[1] += 1
+            return True
+
+    def ban(self, client_ip: str, until: float):
+        with self.lock:
+            self.bans[client_ip] = until
+            self.pending_bans[client_ip] = until
+
+    def _key(self, client_ip: str, index: int) -> str:
+        return f"{self.prefix}:{client_ip}:{index}"
+
+    def flush(self, now: float | None = None):
+        """
+        Sends the local counts and bans to the server and refreshes the global counts.
+
+        :param now: Current time, defaults to the wall clock
+        """
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            pending_bans, self.pending_bans = self.pending_bans, {}
+            self.inflight = pending
+        if not pending and not pending_bans:
+            return
+
+        now = time.time() if now is None else now
+        expiry = int(self.window * 2)
+        commands: list[list] = []
+        for client_ip, (index, count) in pending.items():
+            key = self._key(client_ip, index)
+            commands += [['INCRBY', key, count], ['EXPIRE', key, expiry], ['GET', self._key(client_ip, index - 1)]]
+        for client_ip, until in pending_bans.items():
+            commands.append(['SET', f"{self.prefix}:ban:{client_ip}", 1, 'PX', max(1, int((until - now) * 1000))])
+        for client_ip in pending:
+            commands.append(['PTTL', f"{self.prefix}:ban:{client_ip}"])
+
+        try:
+            replies = self.client.pipeline(commands)
+        except OSError as e:
+            logger.warning('Rate limit backend unavailable, counting locally: %s', e)
+            self._restore(pending, pending_bans, now)
+            return
+
+        with self.lock:
+            self.inflight = {}
+            for position, (client_ip, (index, _)) in enumerate(pending.items()):
+                current, previous = replies[position * 3], replies[position * 3 + 2]
+                if isinstance(current, int):
+                    self.counts[client_ip] = [index, int(previous or 0), current]
+            ban_ttls = replies[len(pending) * 3 + len(pending_bans):]
+            for client_ip, ttl in zip(pending, ban_ttls):
+                if isinstance(ttl, int) and ttl > 0:
+                    self.bans[client_ip] = max(self.bans.get(client_ip, 0), now + ttl / 1000)
+
+            # Forget counters and bans that can no longer affect a decision
+            current_index = int(now // self.window)
+            self.counts = {client_ip: counts for client_ip, counts in self.counts.items() if counts[0] >= current_index - 1}
+            self.bans = {client_ip: until for client_ip, until in self.bans.items() if until > now}
+
+    def _restore(self, pending: dict[str, list[int]], pending_bans: dict[str, float], now: float):
+        """
+        Merges counts that could not be flushed back into the local counts of the same window.
+        Counts of windows that no longer weigh on a decision and bans already over are dropped,
+        so a long outage does not keep an entry for every client seen since it began.
+        """
+        current_index = int(now // self.window)
+        with self.lock:
+            self.inflight = {}
+            for client_ip, (index, count) in pending.items():
+                if index < current_index - 1:
+                    continue
+                local = self.pending.setdefault(client_ip, [index, 0])
+                if local[0] == index:
+                    local[1] += count
+            for client_ip, until in pending_bans.items():
+                if until > now:
+                    self.pending_bans.setdefault(client_ip, until)
+
+    def _run(self):
+        while not self.stopped.wait(self.flush_interval):
+            self.flush()
+
+    def close(self):
+        self.stopped.set()
+        self.flusher.join()
+        self.flush()
+        self.client.close()
+
+
+# Backends whose flusher thread is restarted in forked worker processes
+_flushing_backends: weakref.WeakSet[RedisRateLimitBackend] = weakref.WeakSet()
+
+
+def _restart_flushers():
+    """
+    Runs in forked processes, where the threads of the parent do not exist. Counts of the
+    parent are left to the parent, the child starts with its own.
+    """
+    for backend in list(_flushing_backends):
+        if backend.stopped.is_set():
+            continue
+        backend.lock = threading.Lock()
+        backend.pending, backend.inflight, backend.pending_bans = {}, {}, {}
+        backend.start_flusher()
+
+
+os.register_at_fork(after_in_child=_restart_flushers)
+
+
+def create_rate_limit_backend(rate_limit_config: dict) -> RateLimitBackend | None:
+    """
+    Builds the shared backend selected by `rate_limiting.backend`.
+
+    :param rate_limit_config: The rate limiting configuration
+    :return: The backend, or None for the default in-process backend
+    """
+    backend = resolve_backend(rate_limit_config.get('backend', 'local'))
+    max_requests = rate_limit_config['max_requests_per_minute']
+    if backend == 'local':
+        return None
+    if backend == 'shared-memory':
+        return SharedMemoryRateLimitBackend(max_requests, **rate_limit_config.get('shared_memory', {}))
+    if backend == 'redis':
+        return RedisRateLimitBackend(max_requests, **rate_limit_config.get('redis', {}))
+    raise ValueError(f"Unsupported rate limiting backend: {backend}")
@@ -0,0 +1,105 @@
+# app/infrastructure/resp_client.py
+from __future__ import annotations
+
+import os
+import socket
+
+
+class RespError(Exception):
+    """
+    Error reply returned by the server for a single command.
+    """
+
+
+class RespClient:
+    """
+    Minimal blocking client for the Redis serialization protocol (RESP2).
+    Commands are sent in pipelines: one write and one read pass per batch.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 6379, timeout: float = 0.1):
+        """
+        :param host: Server host
+        :param port: Server port
+        :param timeout: Connect and read timeout in seconds
+        """
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self.sock: socket.socket | None = None
+        self.reader = None
+        self.pid = 0  # Process that opened the connection
+
+    def connect(self):
+        self.pid = os.getpid()
+        self.sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.reader = self.sock.makefile('rb')
+
+    def close(self):
+        if self.sock is not None:
+            self.reader.close()
+            self.sock.close()
+        self.sock = self.reader = None
+
+    @staticmethod
+    def encode(command: list) -> bytes:
+        parts = [b'*%d\r\n' % len(command)]
+        for arg in command:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode('utf-8')
+            parts.append(b'$%d\r\n%s\r\n' % (len(arg), arg))
+        return b''.join(parts)
+
+    def read_reply(self):
+        line = self.reader.readline()
+        if not line:
+            raise ConnectionError('Connection closed by server')
+        kind, payload = line[:1], line[1:-2]
+        if kind == b'+':
+            return payload.decode('utf-8')
+        if kind == b'-':
+            return RespError(payload.decode('utf-8'))
+        if kind == b':':
+            return int(payload)
+        if kind == b'$':
+            length = int(payload)
+            if length < 0:
+                return None
+            data = self.reader.read(length + 2)
+            return data[:-2]
+        if kind == b'*':
+            length = int(payload)
+            return None if length < 0 else [self.read_reply() for _ in range(length)]
+        raise ConnectionError(f"Unexpected reply: {line!r}")
+
+    def pipeline(self, commands: list[list]) -> list:
+        """
+        Sends every command at once and reads all the replies.
+        Error replies are returned as RespError instances instead of being raised.
+
+        :param commands: Commands, each a list of arguments
+        :return: One reply per command
+        :raises OSError: If the server cannot be reached or does not answer in time
+        """
+        # A forked process must not share the connection of its parent
+        if self.sock is None or self.pid != os.getpid():
+            self.connect()
+        try:
+            self.sock.sendall(b''.join(self.encode(command) for command in commands))
+            return [self.read_reply() for _ in commands]
+        except OSError:
+            # The stream is out of sync after a failure, start over on the next call
+            self.close()
+            raise
+
+    def execute(self, *command):
+        """
+        Runs a single command.
+
+        :raises RespError: If the server returns an error reply
+        """
+        reply = self.pipeline([list(command)])[0]
+        if isinstance(reply, RespError):
+            raise reply
+        return reply
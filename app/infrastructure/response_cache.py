@@ -0,0 +1,499 @@
+# app/infrastructure/response_cache.py
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Iterable
+from collections.abc import Mapping
+
+import httpx
+from prometheus_client import Counter
+
+from app.core.services.prefix_trie import PrefixTrie
+from app.infrastructure.single_flight import SingleFlight
+from app.infrastructure.upstream_pool import filter_headers
+
+logger = logging.getLogger('guardian')
+
+CACHE_HITS = Counter(
+    'guardian_cache_hits_total', 'Responses served from the response cache', ['tier'],
+)
+
+CACHE_MISSES = Counter(
+    'guardian_cache_misses_total', 'Cacheable requests forwarded to a backend',
+)
+
+CACHE_BYTES_SAVED = Counter(
+    'guardian_cache_bytes_saved_total', 'Response body bytes served from the cache instead of a backend',
+)
+
+DEFAULT_CACHE_CONFIG = {
+    'max_memory_size': 64 * 1024 * 1024,
+    'max_object_size': 1024 * 1024,
+    'default_ttl': 0,  # seconds, for responses without max-age on routes without a ttl
+    'stale_while_revalidate': 0,
+    'max_vary_keys': 100_000,  # URLs whose Vary headers are remembered, least recently used forgotten first
+    'routes': [],
+    'disk': {},
+}
+
+DEFAULT_DISK_CONFIG = {
+    'enabled': False,
+    'path': '/tmp/guardian-cache',
+    'max_size': 1024 * 1024 * 1024,
+}
+
+# Statuses cacheable by default (RFC 9110, section 15.1), except those the gateway never stores
+CACHEABLE_STATUSES = frozenset({200, 203, 300, 301, 404, 410})
+
+# Request headers answered by the cache itself, never forwarded on a cacheable request
+CONDITIONAL_HEADERS = frozenset({'if-none-match', 'if-modified-since'})
+
+# Rough per-entry bookkeeping cost, so small responses are not counted as free
+ENTRY_OVERHEAD = 256
+
+
+def parse_cache_control(value: str) -> dict[str, str | None]:
+    """
+    Parses a Cache-Control header into its directives.
+
+    :param value: The header value, e.g. 'public, max-age=60'
+    :return: Lowercase directive names mapped to their value, None for directives without one
+    """
+    directives: dict[str, str | None] = {}
+    for directive in value.split(','):
+        name, _, argument = directive.strip().partition('=')
+        if name:
+            directives[name.lower()] = argument.strip('"') if argument else None
+    return directives
+
+
+def seconds(directives: dict[str, str | None], name: str) -> int | None:
+    try:
+        return max(0, int(directives[name] or ''))
+    except (KeyError, ValueError):
+        return None
+
+
+class CachedResponse:
+    """
+    A stored response with its freshness lifetime.
+    """
+
+    __slots__ = ('status_code', 'headers', 'body', 'etag', 'stored_at', 'fresh_until', 'stale_until')
+
+    def __init__(
+        self, status_code: int, headers: list[tuple[str, str]], body: bytes, stored_at: float,
+        fresh_until: float, stale_until: float,
+    ):
+        """
+        :param status_code: The response status
+        :param headers: End-to-end response headers
+        :param body: The raw response body, still content-encoded
+        :param stored_at: Time the response was received
+        :param fresh_until: Time until which the response is served without asking the backend
+        :param stale_until: Time until which the response may be served while it is revalidated
+        """
+        self.status_code = status_code
+        self.headers = headers
+        self.body = body
+        self.etag = next((value for name, value in headers if name.lower() == 'etag'), None)
+        self.stored_at = stored_at
+        self.fresh_until = fresh_until
+        self.stale_until = stale_until
+
+    @property
+    def size(self) -> int:
+        return len(self.body) + sum(len(name) + len(value) for name, value in self.headers) + ENTRY_OVERHEAD
+
+    def to_bytes(self) -> bytes:
+        meta = json.dumps([self.status_code, self.headers, self.stored_at, self.fresh_until, self.stale_until]).encode()
+        return len(meta).to_bytes(4, 'big') + meta + self.body
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> CachedResponse:
+        length = int.from_bytes(data[:4], 'big')
+        status_code, headers, stored_at, fresh_until, stale_until = json.loads(data[4:4 + length])
+        return cls(status_code, [tuple(header) for header in headers], data[4 + length:], stored_at, fresh_until, stale_until)
+
+
+class FrequencySketch:
+    """
+    Count-min sketch estimating how often keys were requested recently, in a fixed amount of memory.
+    Counters are halved every `sample_size` increments, so old popularity fades (TinyLFU aging).
+    """
+
+    DEPTH = 4
+    MAX_COUNT = 15
+
+    def __init__(self, width: int = 4096):
+        self.width = max(64, width)
+        self.rows = [[0] * self.width for _ in range(self.DEPTH)]
+        self.sample_size = self.width * 10
+        self.additions = 0
+
+    def _indexes(self, key: str) -> list[int]:
+        digest = hashlib.blake2b(key.encode('utf-8'), digest_size=4 * self.DEPTH).digest()
+        return [int.from_bytes(digest[4 * row:4 * row + 4], 'little') % self.width for row in range(self.DEPTH)]
+
+    def increment(self, key: str):
+        for row, index in zip(self.rows, self._indexes(key)):
+            if row[index] < self.MAX_COUNT:
+                row[index] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self.rows = [[count >> 1 for count in row] for row in self.rows]
+            self.additions //= 2
+
+    def estimate(self, key: str) -> int:
+        return min(row[index] for row, index in zip(self.rows, self._indexes(key)))
+
+
+class MemoryTier:
+    """
+    In-memory responses bounded by their total size. Entries are kept in LRU order, and TinyLFU
+    admission only lets a new response evict the least recently used one if it is requested
+    at least as often, so one-off requests cannot flush popular responses.
+    """
+
+    def __init__(self, max_size: int):
+        """
+        :param max_size: Maximum total size of the stored responses, in bytes
+        """
+        self.max_size = max_size
+        self.entries: OrderedDict[str, CachedResponse] = OrderedDict()
+        self.size = 0
+        self.sketch = FrequencySketch(max(64, max_size // (16 * 1024)))
+
+    def get(self, key: str) -> CachedResponse | None:
+        self.sketch.increment(key)
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, entry: CachedResponse) -> bool:
+        """
+        Stores a response, unless the admission policy rejects it.
+
+        :return: True if the response was stored
+        """
+        self.remove(key)
+        if entry.size > self.max_size:
+            return False
+        frequency = self.sketch.estimate(key)
+        victims = []
+        freed = 0
+        for victim_key, victim in self.entries.items():
+            if self.size - freed + entry.size <= self.max_size:
+                break
+            if self.sketch.estimate(victim_key) > frequency:
+                return False
+            victims.append(victim_key)
+            freed += victim.size
+        for victim_key in victims:
+            self.remove(victim_key)
+        self.entries[key] = entry
+        self.size += entry.size
+        return True
+
+    def remove(self, key: str):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+
+    def resize(self, max_size: int):
+        self.max_size = max_size
+        while self.size > self.max_size:
+            self.remove(next(iter(self.entries)))
+
+
+class DiskTier:
+    """
+    On-disk responses, one file per key, bounded by their total size in LRU order.
+    Methods block on file I/O and are meant to run in a worker thread.
+    """
+
+    def __init__(self, directory: str, max_size: int):
+        """
+        :param directory: Directory holding the cache files, created if missing
+        :param max_size: Maximum total size of the cache files, in bytes
+        """
+        self.directory = directory
+        self.max_size = max_size
+        self.lock = threading.Lock()
+        self.index: OrderedDict[str, int] = OrderedDict()  # file name -> size, least recently used first
+        self.size = 0
+        os.makedirs(directory, exist_ok=True)
+        # Files left by a previous run are reused, oldest first
+        files = []
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith('.tmp'):
+                os.unlink(path)
+            elif os.path.isfile(path):
+                stat = os.stat(path)
+                files.append((stat.st_mtime, name, stat.st_size))
+        for _, name, size in sorted(files):
+            self.index[name] = size
+            self.size += size
+        self._evict()
+
+    @staticmethod
+    def filename(key: str) -> str:
+        return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> CachedResponse | None:
+        name = self.filename(key)
+        with self.lock:
+            if name not in self.index:
+                return None
+            self.index.move_to_end(name)
+        try:
+            with open(os.path.join(self.directory, name), 'rb') as file:
+                return CachedResponse.from_bytes(file.read())
+        except (OSError, ValueError) as e:
+            logger.warning('Dropping unreadable cache file %s: %s', name, e)
+            self.remove(key)
+            return None
+
+    def put(self, key: str, entry: CachedResponse):
+        name = self.filename(key)
+        data = entry.to_bytes()
+        if len(data) > self.max_size:
+            return
+        path = os.path.join(self.directory, name)
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        with open(temporary, 'wb') as file:
+            file.write(data)
+        os.replace(temporary, path)
+        with self.lock:
+            self.size += len(data) - self.index.pop(name, 0)
+            self.index[name] = len(data)
+            self._evict()
+
+    def remove(self, key: str):
+        name = self.filename(key)
+        with self.lock:
+            size = self.index.pop(name, None)
+            if size is None:
+                return
+            self.size -= size
+        try:
+            os.unlink(os.path.join(self.directory, name))
+        except OSError:
+            pass
+
+    def _evict(self):
+        while self.size > self.max_size and self.index:
+            name, size = self.index.popitem(last=False)
+            self.size -= size
+            try:
+                os.unlink(os.path.join(self.directory, name))
+            except OSError:
+                pass
+
+
+class ResponseCache:
+    """
+    Gateway-wide HTTP cache for idempotent GET responses, shared by every configuration snapshot.
+
+    Freshness follows the backend's Cache-Control (s-maxage, max-age, no-store, private, no-cache,
+    stale-while-revalidate), falling back to the TTL of the longest matching route in
+    `caching.routes`. Responses are stored per Vary variant, revalidated with their ETag once
+    stale, and served while stale for the stale-while-revalidate window. Concurrent misses for
+    the same key are coalesced into one backend request (see `flights`).
+    """
+
+    def __init__(self, caching: dict | None = None):
+        """
+        :param caching: The `caching` settings
+        """
+        self.memory: MemoryTier | None = None
+        self.disk: DiskTier | None = None
+        # primary key -> request headers the response varies on, in least recently used order
+        self.vary: OrderedDict[str, tuple[str, ...]] = OrderedDict()
+        self.flights: SingleFlight = SingleFlight()  # backend fetches in flight, by key
+        self.revalidating: set[asyncio.Task] = set()
+        self.configure(caching or {})
+
+    def configure(self, caching: dict):
+        """
+        Applies cache settings. Stored responses are kept, trimmed to the new size limits.
+
+        :param caching: The `caching` settings
+        """
+        self.enabled = caching.get('enabled', False)
+        self.config = {**DEFAULT_CACHE_CONFIG, **caching}
+        self.routes: PrefixTrie[dict] = PrefixTrie()
+        for route in self.config['routes']:
+            self.routes.insert(route['path'].rstrip('*'), route)
+
+        if self.memory is None:
+            self.memory = MemoryTier(self.config['max_memory_size'])
+        else:
+            self.memory.resize(self.config['max_memory_size'])
+
+        disk = {**DEFAULT_DISK_CONFIG, **self.config['disk']}
+        if not disk['enabled']:
+            self.disk = None
+        elif self.disk is None or self.disk.directory != disk['path']:
+            self.disk = DiskTier(disk['path'], disk['max_size'])
+        else:
+            self.disk.max_size = disk['max_size']
+        self._trim_vary()
+
+    def _trim_vary(self):
+        # A forgotten Vary list only costs a miss: the next response for the URL records it again
+        while len(self.vary) > self.config['max_vary_keys']:
+            self.vary.popitem(last=False)
+
+    def key_for(self, path: str, query: str, headers: Mapping[str, str]) -> str | None:
+        """
+        Builds the cache key of a GET request.
+
+        :param path: The request path
+        :param query: The raw query string
+        :param headers: The request headers, with lowercase names
+        :return: The key, or None if the request must bypass the cache
+        """
+        if 'authorization' in headers or 'no-store' in headers.get('cache-control', ''):
+            return None
+        primary = f"{path}?{query}"
+        vary = self.vary.get(primary)
+        if not vary:
+            return primary
+        self.vary.move_to_end(primary)
+        return primary + '\n' + '\n'.join(headers.get(name, '') for name in vary)
+
+    async def get(self, key: str) -> CachedResponse | None:
+        """
+        Looks a response up in memory, then on disk.
+        """
+        entry = self.memory.get(key)  # type: ignore[union-attr]
+        if entry is not None:
+            CACHE_HITS.labels(tier='memory').inc()
+            return entry
+        if self.disk is not None:
+            entry = await asyncio.to_thread(self.disk.get, key)
+            if entry is not None:
+                CACHE_HITS.labels(tier='disk').inc()
+                self.memory.put(key, entry)  # type: ignore[union-attr]
+        return entry
+
+    async def put(self, key: str, entry: CachedResponse):
+        """
+        Stores a response in memory, and on disk when enabled.
+        """
+        self.memory.put(key, entry)  # type: ignore[union-attr]
+        if self.disk is not None:
+            try:
+                await asyncio.to_thread(self.disk.put, key, entry)
+            except OSError as e:
+                logger.warning('Could not write the response cache to disk: %s', e)
+
+    def lifetime(self, path: str, headers: httpx.Headers, now: float) -> tuple[float, float] | None:
+        """
+        Computes until when a response is fresh and until when it may be served stale.
+
+        :param path: The request path
+        :param headers: The response headers
+        :param now: Time the response was received
+        :return: (fresh until, stale until), or None if the response must not be stored
+        """
+        directives = parse_cache_control(headers.get('cache-control', ''))
+        if 'no-store' in directives or 'private' in directives:
+            return None
+        match = self.routes.longest_match(path)
+        route = match[1] if match is not None else {}
+
+        ttl = seconds(directives, 's-maxage')
+        if ttl is None:
+            ttl = seconds(directives, 'max-age')
+        if ttl is None:
+            ttl = route.get('ttl', self.config['default_ttl'])
+        if 'no-cache' in directives:
+            ttl = 0
+        stale = seconds(directives, 'stale-while-revalidate')
+        if stale is None:
+            stale = route.get('stale_while_revalidate', self.config['stale_while_revalidate'])
+
+        age = seconds({'age': headers.get('age')}, 'age') or 0
+        fresh_until = now + max(0, ttl - age)
+        # Responses that are never fresh are only worth keeping if they can be revalidated
+        if fresh_until <= now and not stale and 'etag' not in headers:
+            return None
+        return fresh_until, fresh_until + stale
+
+    async def store(
+        self, key: str, path: str, request_headers: Mapping[str, str], response: httpx.Response,
+        stale: CachedResponse | None = None,
+    ) -> CachedResponse | None:
+        """
+        Stores a backend response if it is cacheable, reading its body.
+        The response is left unread when it is not cacheable, so it can still be streamed.
+
+        :param key: The key the request was looked up with
+        :param path: The request path
+        :param request_headers: The request headers, with lowercase names
+        :param response: The backend response, body unread
+        :param stale: The stored response the request revalidated, if any
+        :return: The stored response, or None if the response is not cacheable
+        """
+        now = time.time()
+        if response.status_code == 304 and stale is not None:
+            lifetime = self.lifetime(path, response.headers, now)
+            if lifetime is None:
+                return None
+            # Not modified: the stored body is fresh again, with the updated headers
+            updated = {name.lower() for name, _ in response.headers.multi_items()}
+            headers = [header for header in stale.headers if header[0].lower() not in updated]
+            headers += filter_headers(response.headers.multi_items())
+            entry = CachedResponse(stale.status_code, headers, stale.body, now, *lifetime)
+            await self.put(key, entry)
+            return entry
+
+        if response.status_code not in CACHEABLE_STATUSES or 'set-cookie' in response.headers:
+            return None
+        content_length = response.headers.get('content-length')
+        if content_length is None or not content_length.isdigit() or int(content_length) > self.config['max_object_size']:
+            return None
+        vary = tuple(sorted({name.strip().lower() for name in response.headers.get('vary', '').split(',') if name.strip()}))
+        if '*' in vary:
+            return None
+        lifetime = self.lifetime(path, response.headers, now)
+        if lifetime is None:
+            return None
+
+        body = b''.join([chunk async for chunk in response.aiter_raw()])
+        entry = CachedResponse(response.status_code, filter_headers(response.headers.multi_items()), body, now, *lifetime)
+        primary = key.split('\n', 1)[0]
+        if vary:
+            self.vary[primary] = vary
+            self.vary.move_to_end(primary)
+            self._trim_vary()
+            key = primary + '\n' + '\n'.join(request_headers.get(name, '') for name in vary)
+        else:
+            self.vary.pop(primary, None)
+        await self.put(key, entry)
+        return entry
+
+    def track(self, task: asyncio.Task):
+        """
+        Keeps a background revalidation alive until it completes.
+        """
+        self.revalidating.add(task)
+        task.add_done_callback(self.revalidating.discard)
+
+
+def forwardable_headers(headers: Iterable[tuple[str, str]]) -> list[tuple[str, str]]:
+    """
+    Drops the conditional headers of a client, which the cache answers itself.
+    """
+    return [(name, value) for name, value in headers if name.lower() not in CONDITIONAL_HEADERS]
@@ -0,0 +1,153 @@
+# app/infrastructure/session_backends.py
+from __future__ import annotations
+
+import hashlib
+import logging
+import threading
+
+from app.core.services.session_manager import SessionBackend
+from app.infrastructure.resp_client import RespClient
+from app.infrastructure.shared_table import key_hash
+from app.infrastructure.shared_table import resolve_backend
+from app.infrastructure.shared_table import SharedSlotTable
+
+logger = logging.getLogger('guardian')
+
+# Longest user ID stored by the shared memory backend, in UTF-8 bytes
+MAX_USER_ID_SIZE = 64
+
+
+def session_check(session_id: str) -> int:
+    """
+    Second 64-bit digest of a session ID, stored next to the key hash so a slot is only
+    matched by the session ID itself, not by another ID with the same key hash.
+    """
+    return int.from_bytes(hashlib.blake2b(session_id.encode('utf-8'), digest_size=8, person=b'session').digest(), 'little')
+
+
+class SharedMemorySessionBackend(SessionBackend):
+    """
+    Backend shared by every worker process on the host, stored in a shared memory table.
+    Each session uses a 96-byte record: key hash, check digest, creation and last activity
+    times and user ID. When the table is full, the least recently active session of the
+    probed slots is evicted, and every call clears a few expired records.
+    """
+
+    RECORD_FORMAT = f"QQdd{MAX_USER_ID_SIZE}s"
+
+    def __init__(self, name: str = 'guardian_sessions', slots: int = 65536, sweep_batch: int = 2):
+        """
+        :param name: Name of the shared memory block, identical in every worker
+        :param slots: Number of session records, the maximum number of sessions
+        :param sweep_batch: Number of records checked for expiry per call
+        """
+        self.table = SharedSlotTable(name, slots, self.RECORD_FORMAT)
+        self.sweep_batch = sweep_batch
+        self.cursor = 0
+
+    def create(self, session_id: str, user_id: str, now: float, timeout: float):
+        encoded_user_id = user_id.encode('utf-8')
+        if len(encoded_user_id) > MAX_USER_ID_SIZE:
+            raise ValueError(f"User IDs are limited to {MAX_USER_ID_SIZE} bytes with shared memory sessions")
+        hashed = key_hash(session_id)
+        with self.table.locked():
+            self._sweep(now, timeout)
+            slot = self.table.find(hashed, victim_score=lambda record: record[3])
+            self.table.write(slot, (hashed, session_check(session_id), now, now, encoded_user_id))
+
+    def touch(self, session_id: str, now: float, timeout: float) -> bool:
+        with self.table.locked():
+            self._sweep(now, timeout)
+            slot = self.table.find(key_hash(session_id))
+            if slot is None:
+                return False
+            record = self.table.read(slot)
+            if record[1] != session_check(session_id):
+                return False
+            if now - record[3] > timeout:
+                self.table.clear(slot)
+                return False
+            self.table.write(slot, (record[0], record[1], record[2], now, record[4]))
+        return True
+
+    def revoke(self, session_id: str):
+        with self.table.locked():
+            slot = self.table.find(key_hash(session_id))
+            if slot is not None and self.table.read(slot)[1] == session_check(session_id):
+                self.table.clear(slot)
+
+    def _sweep(self, now: float, timeout: float):
+        """
+        Clears the expired records among the next few slots. Must be called with the lock held.
+        """
+        for _ in range(self.sweep_batch):
+            record = self.table.read(self.cursor)
+            if record[0] and now - record[3] > timeout:
+                self.table.clear(self.cursor)
+            self.cursor = (self.cursor + 1) % self.table.slots
+
+    def close(self):
+        self.table.close()
+
+
+class RedisSessionBackend(SessionBackend):
+    """
+    Backend shared by every gateway replica through a Redis-protocol server.
+    Each session is one key holding the user ID, whose TTL is the session timeout and is
+    extended on activity, so the server expires abandoned sessions by itself. When the server
+    is unreachable, sessions cannot be validated and requests are treated as logged out.
+    """
+
+    def __init__(
+        self, host: str = '127.0.0.1', port: int = 6379, prefix: str = 'guardian:session', timeout: float = 0.1,
+    ):
+        """
+        :param host: Server host
+        :param port: Server port
+        :param prefix: Prefix of the keys stored on the server
+        :param timeout: Seconds after which the server is considered unreachable
+        """
+        self.prefix = prefix
+        self.client = RespClient(host, port, timeout)
+        self.lock = threading.Lock()  # The client is used by one caller at a time
+
+    def _key(self, session_id: str) -> str:
+        return f"{self.prefix}:{session_id}"
+
+    def create(self, session_id: str, user_id: str, now: float, timeout: float):
+        with self.lock:
+            self.client.execute('SET', self._key(session_id), user_id, 'PX', max(1, int(timeout * 1000)))
+
+    def touch(self, session_id: str, now: float, timeout: float) -> bool:
+        key = self._key(session_id)
+        try:
+            with self.lock:
+                user_id, _ = self.client.pipeline([['GET', key], ['PEXPIRE', key, max(1, int(timeout * 1000))]])
+        except OSError as e:
+            logger.warning('Session backend unavailable: %s', e)
+            return False
+        return isinstance(user_id, bytes)
+
+    def revoke(self, session_id: str):
+        with self.lock:
+            self.client.execute('DEL', self._key(session_id))
+
+    def close(self):
+        self.client.close()
+
+
+def create_session_backend(session_config: dict) -> SessionBackend | None:
+    """
+    Builds the shared backend selected by `session_management.backend`.
+
+    :param session_config: The session management configuration
+    :return: The backend, or None for the default in-process backend
+    """
+    backend = resolve_backend(session_config.get('backend', 'local'))
+    if backend == 'local':
+        return None
+    if backend == 'shared-memory':
+        return SharedMemorySessionBackend(**session_config.get('shared_memory', {}))
+    if backend == 'redis':
+        return RedisSessionBackend(**session_config.get('redis', {}))
+    raise ValueError(f"Unsupported session backend: {backend}")
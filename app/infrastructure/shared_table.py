@@ -0,0 +1,155 @@
+# app/infrastructure/shared_table.py
+from __future__ import annotations
+
+import fcntl
+import hashlib
+import os
+import struct
+import tempfile
+from collections.abc import Callable
+from collections.abc import Iterator
+from contextlib import contextmanager
+from multiprocessing import resource_tracker
+from multiprocessing import shared_memory
+
+# Number of consecutive slots probed before a record is evicted
+MAX_PROBES = 8
+
+# Set by app.serve before the application is loaded, when requests are served by several worker processes
+multiple_workers = False
+
+
+def resolve_backend(backend: str) -> str:
+    """
+    Resolves the "auto" state backend: per-process state with a single worker, shared memory
+    with several, so limits and sessions stay global to the host as workers are added.
+
+    :param backend: The configured backend name
+    :return: The backend to use
+    """
+    if backend == 'auto':
+        return 'shared-memory' if multiple_workers else 'local'
+    return backend
+
+
+def key_hash(key: str) -> int:
+    """
+    Hashes a key to a non-zero 64-bit integer that is stable across processes
+    (unlike the built-in hash, which is salted per process).
+
+    :param key: The key to hash
+    :return: The key hash, 0 is reserved for empty slots
+    """
+    return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'little') or 1
+
+
+class SharedSlotTable:
+    """
+    Fixed-size hash table of fixed-size records stored in shared memory, so every process
+    on the host sees the same data. Records are addressed by key hash with linear probing,
+    and an fcntl lock file serializes updates between processes.
+
+    The first field of every record must be the 64-bit key hash ("Q").
+    """
+
+    def __init__(self, name: str, slots: int, record_format: str):
+        """
+        Creates the shared memory block, or attaches to it if another process already created it.
+
+        :param name: Name of the shared memory block, identical in every process
+        :param slots: Number of records in the table
+        :param record_format: struct format of a record, starting with "Q"
+        """
+        self.name = name
+        self.slots = slots
+        self.record = struct.Struct(f"<{record_format}")
+        size = self.slots * self.record.size
+        try:
+            self.memory = shared_memory.SharedMemory(name=name, create=True, size=size)
+            # Forked workers inherit the table, only the creating process removes the block
+            self.owner_pid: int | None = os.getpid()
+        except FileExistsError:
+            self.memory = shared_memory.SharedMemory(name=name)
+            self.owner_pid = None
+            # Attached processes must not unlink the block when they exit
+            resource_tracker.unregister(self.memory._name, 'shared_memory')  # type: ignore[attr-defined]
+            if self.memory.size < size:
+                raise ValueError(f"Shared memory block {name} is smaller than the configured table")
+        self.lock_path = os.path.join(tempfile.gettempdir(), f"{name}.lock")
+        self._lock_file: int | None = None
+        self._lock_pid = 0
+
+    @contextmanager
+    def locked(self) -> Iterator[None]:
+        """
+        Holds the inter-process lock of the table.
+        """
+        # flock is tied to the open file, so each forked process needs its own descriptor
+        if self._lock_pid != os.getpid():
+            self._lock_file = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o600)
+            self._lock_pid = os.getpid()
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def read(self, slot: int) -> tuple:
+        return self.record.unpack_from(self.memory.buf, slot * self.record.size)
+
+    def write(self, slot: int, values: tuple):
+        self.record.pack_into(self.memory.buf, slot * self.record.size, *values)
+
+    def clear(self, slot: int):
+        offset = slot * self.record.size
+        self.memory.buf[offset:offset + self.record.size] = bytes(self.record.size)
+
+    def find(self, hashed_key: int, victim_score: Callable[[tuple], float] | None = None) -> int | None:
+        """
+        Finds the slot of a key. Must be called with the lock held.
+
+        :param hashed_key: Hash of the key, see key_hash()
+        :param victim_score: If given, a slot is claimed for a missing key; when all probed slots
+            are taken, the record with the lowest score is evicted
+        :return: The slot index, or None if the key is missing and no slot was claimed
+        """
+        start = hashed_key % self.slots
+        free = None
+        for probe in range(MAX_PROBES):
+            slot = (start + probe) % self.slots
+            stored = self.record.unpack_from(self.memory.buf, slot * self.record.size)[0]
+            if stored == hashed_key:
+                return slot
+            if stored == 0 and free is None:
+                free = slot
+        if victim_score is None:
+            return None
+
+        if free is None:
+            free = min(
+                ((start + probe) % self.slots for probe in range(MAX_PROBES)),
+                key=lambda slot: victim_score(self.read(slot)),
+            )
+        self.clear(free)
+        return free
+
+    def delete(self, hashed_key: int):
+        """
+        Removes a key. Must be called with the lock held.
+        Lookups probe every slot of their window instead of stopping at an empty one,
+        so clearing a slot never hides other keys.
+        """
+        slot = self.find(hashed_key)
+        if slot is not None:
+            self.clear(slot)
+
+    def close(self):
+        """
+        Detaches from the shared memory, and removes it if this process created it. A worker
+        forked from the creator only detaches, so the other workers keep sharing the block.
+        """
+        self.memory.close()
+        if self.owner_pid == os.getpid():
+            # Another attachment in a process sharing our resource tracker may have unregistered the name
+            resource_tracker.register(self.memory._name, 'shared_memory')  # type: ignore[attr-defined]
+            self.memory.unlink()
@@ -0,0 +1,133 @@
+# app/infrastructure/single_flight.py
+from __future__ import annotations
+
+import asyncio
+import urllib.parse
+from collections.abc import Awaitable
+from collections.abc import Callable
+from collections.abc import Hashable
+from collections.abc import Mapping
+from typing import Generic
+from typing import TypeVar
+
+from prometheus_client import Counter
+
+from app.core.services.prefix_trie import PrefixTrie
+
+T = TypeVar('T')
+
+COALESCED_REQUESTS = Counter(
+    'guardian_coalesced_requests_total', 'Requests answered with the response of an identical request in flight',
+)
+
+DEFAULT_COALESCING_CONFIG = {
+    'enabled': False,
+    'routes': ['/'],  # path prefixes opted in
+    'headers': ['accept', 'accept-encoding', 'accept-language'],  # request headers the response may depend on
+    'max_response_size': 1024 * 1024,  # bytes buffered to share a response
+}
+
+# Requests carrying credentials are only coalesced if these headers are part of the key
+CREDENTIAL_HEADERS = ('authorization', 'cookie')
+
+
+class FlightCancelled(Exception):
+    """
+    Raised to the waiters of a call whose caller was cancelled before it completed.
+    """
+
+
+class SingleFlight(Generic[T]):
+    """
+    Runs at most one call per key at a time: callers arriving while a call is in flight await
+    its result (or exception) instead of starting their own.
+    """
+
+    def __init__(self):
+        self.calls: dict[Hashable, asyncio.Future] = {}
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self.calls
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[T]]) -> tuple[T, bool]:
+        """
+        Runs `func`, or waits for the call already in flight for the key.
+
+        :param key: Identifies identical calls
+        :param func: Starts the call
+        :return: The result, and whether it was shared from another caller's call
+        """
+        while True:
+            future = self.calls.get(key)
+            if future is None:
+                break
+            try:
+                return await asyncio.shield(future), True
+            except FlightCancelled:
+                # The caller that started the call went away, start a new one
+                continue
+
+        future = asyncio.get_running_loop().create_future()
+        self.calls[key] = future
+        try:
+            result = await func()
+        except asyncio.CancelledError:
+            future.set_exception(FlightCancelled())
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            del self.calls[key]
+            if future.done() and not future.cancelled():
+                # Waiters receive the exception, do not report it as never retrieved
+                future.exception()
+
+
+class RequestCoalescer:
+    """
+    Shares one backend request among identical GET requests in flight, on opted-in routes.
+    Requests are identical when their path, query parameters (in any order) and the configured
+    request headers match. Unlike the response cache, this also helps for uncacheable responses.
+    """
+
+    def __init__(self, coalescing: dict | None = None):
+        """
+        :param coalescing: The `coalescing` settings
+        """
+        self.flights: SingleFlight = SingleFlight()
+        self.configure(coalescing or {})
+
+    def configure(self, coalescing: dict):
+        """
+        Applies coalescing settings. Requests in flight are not affected.
+
+        :param coalescing: The `coalescing` settings
+        """
+        self.config = {**DEFAULT_COALESCING_CONFIG, **coalescing}
+        self.enabled = self.config['enabled']
+        self.headers = tuple(name.lower() for name in self.config['headers'])
+        self.max_response_size = self.config['max_response_size']
+        self.routes: PrefixTrie[bool] = PrefixTrie()
+        for route in self.config['routes']:
+            self.routes.insert(route.rstrip('*'), True)
+
+    def key_for(self, method: str, path: str, query: str, headers: Mapping[str, str]) -> tuple | None:
+        """
+        Builds the coalescing key of a request.
+
+        :param method: The request method
+        :param path: The request path
+        :param query: The raw query string
+        :param headers: The request headers, with lowercase names
+        :return: The key, or None if the request must not be coalesced
+        """
+        if method != 'GET' or self.routes.longest_match(path) is None:
+            return None
+        if any(name in headers and name not in self.headers for name in CREDENTIAL_HEADERS):
+            return None
+        normalized_query = tuple(sorted(urllib.parse.parse_qsl(query, keep_blank_values=True)))
+        return (path, normalized_query) + tuple(headers.get(name) for name in self.headers)
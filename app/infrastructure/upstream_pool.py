@@ -0,0 +1,205 @@
+# app/infrastructure/upstream_pool.py
+from __future__ import annotations
+
+import time
+from collections.abc import AsyncIterator
+from collections.abc import Iterable
+
+import httpx
+from prometheus_client import Gauge
+
+from app.middlewares.metrics_middleware import UPSTREAM_CONNECT_LATENCY
+from app.middlewares.metrics_middleware import UPSTREAM_TTFB_LATENCY
+
+# Prometheus gauges describing the state of each backend connection pool, summed over the workers
+UPSTREAM_POOL_CONNECTIONS = Gauge(
+    'guardian_upstream_pool_connections', 'Upstream pool connections and queued requests per backend',
+    ['backend', 'state'], multiprocess_mode='livesum',
+)
+
+DEFAULT_POOL_CONFIG = {
+    'max_connections': 100,
+    'max_keepalive_connections': 20,
+    'keepalive_expiry': 30.0,
+    'connect_timeout': 5.0,
+    'read_timeout': 30.0,
+    'write_timeout': 30.0,
+    'pool_timeout': 5.0,
+    'http2': False,
+}
+
+# Connection-scoped headers that must not be forwarded by a proxy (RFC 9110, section 7.6.1)
+HOP_BY_HOP_HEADERS = frozenset({
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailer', 'transfer-encoding', 'upgrade', 'host',
+})
+
+
+def filter_headers(headers: Iterable[tuple[str, str]]) -> list[tuple[str, str]]:
+    """
+    Drops hop-by-hop headers so the remaining ones can be forwarded as-is.
+
+    :param headers: (name, value) pairs from the incoming message
+    :return: The end-to-end headers, in their original order
+    """
+    return [(name, value) for name, value in headers if name.lower() not in HOP_BY_HOP_HEADERS]
+
+
+def connect_timer():
+    """
+    Builds an httpcore trace callback timing the TCP connections opened for a request.
+    Requests sent on a kept-alive connection record nothing.
+    """
+    started = 0.0
+
+    async def trace(event: str, info: dict):
+        nonlocal started
+        if event == 'connection.connect_tcp.started':
+            started = time.perf_counter()
+        elif event == 'connection.connect_tcp.complete':
+            UPSTREAM_CONNECT_LATENCY.observe(time.perf_counter() - started)
+
+    return trace
+
+
+def backend_key(server: dict) -> str:
+    """
+    Builds the identifier used for a backend in the pool and in metrics labels.
+
+    :param server: Server entry from the load balancing configuration
+    :return: The "address:port" identifier of the server
+    """
+    return f"{server['address']}:{server['port']}"
+
+
+class UpstreamPool:
+    """
+    Gateway-wide pool of keep-alive HTTP clients, one per backend server.
+    Clients are created lazily on first use and live until the application shuts down.
+    """
+
+    def __init__(self, load_balancing: dict | None = None, transport: httpx.AsyncBaseTransport | None = None):
+        """
+        Initializes the pool from the load balancing configuration.
+
+        :param load_balancing: Load balancing settings, including the optional `connection_pool` section
+        :param transport: Optional transport shared by every client (used in tests)
+        """
+        self.transport = transport
+        self.clients: dict[str, httpx.AsyncClient] = {}
+        self.configure(load_balancing or {})
+
+    def configure(self, load_balancing: dict):
+        """
+        Applies pool settings. Only clients created afterwards pick up the new limits.
+
+        :param load_balancing: Load balancing settings, including the optional `connection_pool` section
+        """
+        self.pool_config = {**DEFAULT_POOL_CONFIG, **load_balancing.get('connection_pool', {})}
+
+    def _settings_for(self, server: dict) -> dict:
+        """
+        Merges the gateway-wide pool settings with the per-backend overrides.
+        """
+        return {**self.pool_config, **server.get('connection_pool', {})}
+
+    def _create_client(self, server: dict) -> httpx.AsyncClient:
+        settings = self._settings_for(server)
+        limits = httpx.Limits(
+            max_connections=settings['max_connections'],
+            max_keepalive_connections=settings['max_keepalive_connections'],
+            keepalive_expiry=settings['keepalive_expiry'],
+        )
+        timeout = httpx.Timeout(
+            connect=settings['connect_timeout'],
+            read=settings['read_timeout'],
+            write=settings['write_timeout'],
+            pool=settings['pool_timeout'],
+        )
+        transport = self.transport or httpx.AsyncHTTPTransport(limits=limits, http2=settings['http2'])
+        return httpx.AsyncClient(
+            base_url=f"http://{backend_key(server)}",
+            transport=transport,
+            timeout=timeout,
+        )
+
+    def client_for(self, server: dict) -> httpx.AsyncClient:
+        """
+        Returns the pooled client for the given backend, creating it on first use.
+
+        :param server: Server entry from the load balancing configuration
+        :return: An httpx.AsyncClient bound to the server's base URL
+        """
+        key = backend_key(server)
+        client = self.clients.get(key)
+        if client is None:
+            client = self.clients[key] = self._create_client(server)
+        return client
+
+    async def stream(
+        self, server: dict, method: str, path: str, query_string: str = '',
+        headers: Iterable[tuple[str, str]] = (), content: AsyncIterator[bytes] | None = None,
+    ) -> httpx.Response:
+        """
+        Sends a request to the backend without buffering either body.
+        The caller must close the returned response once its body has been consumed.
+
+        :param server: Server entry from the load balancing configuration
+        :param method: HTTP method of the request
+        :param path: Path to request on the backend
+        :param query_string: Raw query string, forwarded unchanged
+        :param headers: Request headers, hop-by-hop headers are dropped
+        :param content: Optional async iterator producing the request body
+        :return: The backend response with its body still unread
+        """
+        client = self.client_for(server)
+        url = f"{path}?{query_string}" if query_string else path
+        request = client.build_request(
+            method, url, headers=filter_headers(headers), content=content, extensions={'trace': connect_timer()},
+        )
+        started = time.perf_counter()
+        response = await client.send(request, stream=True)
+        # Until the response headers are received, including the wait for a connection
+        UPSTREAM_TTFB_LATENCY.observe(time.perf_counter() - started)
+        return response
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        """
+        Reports active, idle and waiting counts for every backend pool.
+
+        httpx does not expose the connection pool of its transport, nor httpcore its queue of
+        waiting requests: both are read from private attributes, checked against the versions
+        pinned in requirements.txt. A transport without them, such as a test transport or a
+        newer release, reports zero counts rather than failing the metrics update.
+
+        :return: A mapping of backend identifier to its pool statistics
+        """
+        stats = {}
+        for key, client in self.clients.items():
+            try:
+                pool = client._transport._pool
+                # `connections` is public httpcore API, the queue of waiting requests is not
+                connections = pool.connections
+                idle = sum(1 for connection in connections if connection.is_idle())
+                waiting = sum(1 for request in pool._requests if request.is_queued())
+            except AttributeError:
+                stats[key] = {'active': 0, 'idle': 0, 'waiting': 0}
+                continue
+            stats[key] = {'active': len(connections) - idle, 'idle': idle, 'waiting': waiting}
+        return stats
+
+    def update_metrics(self):
+        """
+        Publishes the current pool statistics to the Prometheus gauges.
+        """
+        for key, backend_stats in self.stats().items():
+            for state, value in backend_stats.items():
+                UPSTREAM_POOL_CONNECTIONS.labels(backend=key, state=state).set(value)
+
+    async def aclose(self):
+        """
+        Closes every pooled client and its open connections.
+        """
+        clients, self.clients = self.clients, {}
+        for client in clients.values():
+            await client.aclose()
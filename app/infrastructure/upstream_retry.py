@@ -0,0 +1,206 @@
+# app/infrastructure/upstream_retry.py
+from __future__ import annotations
+
+import asyncio
+import time
+from collections.abc import AsyncIterator
+from collections.abc import Iterable
+
+import httpx
+from fastapi import HTTPException
+from prometheus_client import Counter
+
+from app.core.services.gateway_service import GatewayService
+from app.core.services.logger import logger
+from app.core.services.retry_policy import RetryPolicy
+from app.core.services.strategies.base_strategy import server_key
+from app.infrastructure.upstream_pool import UpstreamPool
+
+UPSTREAM_EXTRA_ATTEMPTS = Counter(
+    'guardian_upstream_extra_attempts_total', 'Upstream attempts beyond the first one of a request', ['kind'],
+)
+RETRY_BUDGET_EXHAUSTED = Counter(
+    'guardian_upstream_retry_budget_exhausted_total', 'Retries and hedged attempts skipped for lack of budget',
+)
+
+
+def upstream_error(error: BaseException) -> HTTPException:
+    """
+    Maps the failure of the last attempt to the status returned to the client.
+    """
+    if isinstance(error, (asyncio.TimeoutError, httpx.TimeoutException)):
+        return HTTPException(status_code=504, detail='Upstream request timed out.')
+    return HTTPException(status_code=502, detail=f"Upstream request failed: {error}")
+
+
+async def attempt(
+    svc: GatewayService, pool: UpstreamPool, server: dict, method: str, path: str, query: str,
+    headers: list[tuple[str, str]], body: AsyncIterator[bytes] | None, timeout: float | None,
+    policy: RetryPolicy | None,
+) -> httpx.Response:
+    """
+    Sends the request to one server, accounting for its response time. A failed or timed out
+    server is released and reported through handle_server_failure(); a cancelled attempt
+    (a hedge that lost, or a client that went away) is only released.
+    """
+    started = time.perf_counter()
+    try:
+        response = await asyncio.wait_for(pool.stream(server, method, path, query, headers, body), timeout)
+    except asyncio.CancelledError:
+        svc.release_server(server)
+        raise
+    except Exception:
+        svc.record_response(server, time.perf_counter() - started, success=False)
+        svc.release_server(server)
+        svc.handle_server_failure(server)
+        raise
+    latency = time.perf_counter() - started
+    svc.record_response(server, latency, success=response.status_code < 500)
+    if policy is not None and response.status_code < 500:
+        policy.latency.record(latency)
+    return response
+
+
+async def discard(svc: GatewayService, server: dict, response: httpx.Response):
+    svc.release_server(server)
+    await response.aclose()
+
+
+async def send_with_retries(
+    svc: GatewayService, pool: UpstreamPool, method: str, path: str, query: str,
+    headers: Iterable[tuple[str, str]], body: AsyncIterator[bytes] | None = None, key: str | None = None,
+) -> tuple[dict, httpx.Response]:
+    """
+    Sends a request to the backends following the retry policy of the service.
+
+    Idempotent requests without a body are retried on another backend when an attempt fails,
+    times out or answers with a retryable status, and may be hedged: when the first attempt
+    has no response after the tracked p95 response time, a second one is sent to another
+    backend and the first response wins. Extra attempts are limited by the retry budget, and
+    every attempt by the per-try timeout, all of them by the overall timeout.
+
+    :param svc: The service snapshot handling the request
+    :param pool: The pool of backend connections
+    :param method: HTTP method of the request
+    :param path: Path of the request
+    :param query: Raw query string
+    :param headers: Request headers to forward
+    :param body: Optional async iterator producing the request body
+    :param key: Routing key of the request, see GatewayService.routing_key()
+    :return: The server and its response with the body still unread; the caller must release
+        the server and close the response
+    :raises HTTPException: 503 if no backend can be selected, 504 if the request timed out,
+        502 if every attempt failed
+    """
+    headers = list(headers)
+    policy = svc.retry_policy
+    if policy is None:
+        server = svc.get_next_server(key)
+        try:
+            return server, await attempt(svc, pool, server, method, path, query, headers, body, None, None)
+        except httpx.TransportError as e:
+            raise upstream_error(e) from e
+
+    has_body = body is not None
+    max_attempts = policy.attempts_for(method, has_body)
+    hedging = max_attempts > 1 and policy.hedges(method, has_body)
+    policy.budget.deposit()
+    loop = asyncio.get_running_loop()
+    deadline = None if policy.timeout is None else loop.time() + policy.timeout
+
+    tried: list[str] = []
+    pending: dict[asyncio.Future, dict] = {}
+    failure: BaseException | None = None
+    # Last response with a retryable status, returned if no other attempt does better
+    fallback: tuple[dict, httpx.Response] | None = None
+
+    def launch() -> bool:
+        try:
+            server = svc.get_next_server(key, tried)
+        except HTTPException:
+            if not tried:
+                raise
+            return False  # Every backend failed meanwhile
+        tried.append(server_key(server))
+        pending[asyncio.ensure_future(
+            attempt(svc, pool, server, method, path, query, headers, body, policy.per_try_timeout, policy),
+        )] = server
+        return True
+
+    def remaining() -> float | None:
+        return None if deadline is None else max(0.0, deadline - loop.time())
+
+    def extra_attempt(kind: str) -> bool:
+        if not policy.budget.withdraw():
+            RETRY_BUDGET_EXHAUSTED.inc()
+            return False
+        if not launch():
+            return False
+        UPSTREAM_EXTRA_ATTEMPTS.labels(kind=kind).inc()
+        return True
+
+    launch()
+    try:
+        while pending:
+            timeout = remaining()
+            hedge = hedging and len(tried) < max_attempts
+            if hedge:
+                delay = policy.hedge_delay()
+                timeout = delay if timeout is None else min(timeout, delay)
+            done, _ = await asyncio.wait(pending, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+            if not done:
+                if deadline is not None and loop.time() >= deadline:
+                    break
+                # Still no response after the hedge delay: race another backend
+                if not extra_attempt('hedge'):
+                    hedging = False
+                continue
+
+            for task in done:
+                server = pending.pop(task)
+                try:
+                    response = task.result()
+                except Exception as e:
+                    logger.warning('Attempt to %s:%s failed: %r', server['address'], server['port'], e)
+                    failure = e
+                    continue
+                if response.status_code not in policy.retry_on_status:
+                    return server, response
+                if fallback is not None:
+                    await discard(svc, *fallback)
+                fallback = server, response
+
+            if pending or len(tried) >= max_attempts:
+                continue
+            delay = policy.backoff(len(tried))
+            timeout = remaining()
+            if timeout is not None and timeout <= delay:
+                break
+            await asyncio.sleep(delay)
+            extra_attempt('retry')
+
+        if fallback is not None:
+            server, response = fallback
+            fallback = None
+            return server, response
+        if pending:
+            # Overall deadline: the servers still working on the request are reported as failed
+            for server in pending.values():
+                svc.record_response(server, policy.timeout, success=False)
+                svc.handle_server_failure(server)
+            raise upstream_error(asyncio.TimeoutError())
+        if isinstance(failure, (asyncio.TimeoutError, httpx.TransportError)):
+            raise upstream_error(failure) from failure
+        raise failure  # type: ignore[misc]
+    finally:
+        if pending:
+            for task in pending:
+                task.cancel()
+            await asyncio.wait(pending)
+            for task, server in pending.items():
+                # An attempt may have completed between the wait and its cancellation
+                if not task.cancelled() and task.exception() is None:
+                    await discard(svc, server, task.result())
+        if fallback is not None:
+            await discard(svc, *fallback)
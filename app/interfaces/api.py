@@ -1,22 +1,415 @@
 # app/interfaces/api.py
 from __future__ import annotations
 
+import asyncio
+import time
+import urllib.parse
+from collections.abc import AsyncIterator
+from collections.abc import Iterable
+
 import httpx
 from fastapi import APIRouter
+from fastapi import HTTPException
 from fastapi import Request
 from fastapi.responses import JSONResponse
 from fastapi.responses import RedirectResponse
+from fastapi.responses import Response
+from fastapi.responses import StreamingResponse
+from starlette.background import BackgroundTask
 
+from app.core.entities.gateway_entity import GatewayEntity
+from app.core.services.circuit_breaker import add_circuit_listener
 from app.core.services.gateway_service import GatewayService
+from app.core.services.logger import logger
 from app.infrastructure.config_loader import load_config
+from app.infrastructure.config_reloader import ConfigReloader
+from app.infrastructure.health_checker import HealthChecker
+from app.infrastructure.health_checker import publish_circuit_change
+from app.infrastructure.rate_limit_backends import create_rate_limit_backend
+from app.infrastructure.response_cache import CACHE_BYTES_SAVED
+from app.infrastructure.response_cache import CACHE_HITS
+from app.infrastructure.response_cache import CACHE_MISSES
+from app.infrastructure.response_cache import CachedResponse
+from app.infrastructure.response_cache import forwardable_headers
+from app.infrastructure.response_cache import ResponseCache
+from app.infrastructure.single_flight import COALESCED_REQUESTS
+from app.infrastructure.session_backends import create_session_backend
+from app.infrastructure.single_flight import RequestCoalescer
+from app.infrastructure.upstream_pool import filter_headers
+from app.infrastructure.upstream_pool import UpstreamPool
+from app.infrastructure.upstream_retry import send_with_retries
+from app.middlewares.metrics_middleware import endpoint_labeler
+from app.middlewares.metrics_middleware import observe_stage
 
 router = APIRouter()
 
+CONFIG_PATH = 'config.yaml'
+
+# Circuit state changes of every service, including reloaded ones, go to the metrics and the log
+add_circuit_listener(publish_circuit_change)
+
+def create_service(gateway: GatewayEntity) -> GatewayService:
+    """
+    Builds a service with the shared rate limiting and session backends available and its
+    stages timed in the metrics; services built on reloads inherit them.
+
+    :param gateway: The loaded configuration
+    """
+    return GatewayService(
+        gateway, rate_limit_backends=create_rate_limit_backend, session_backends=create_session_backend,
+        observe_stage=observe_stage,
+    )
+
 # Load the configuration and initialize the service
-config = load_config('config.yaml')
-service = GatewayService(config)
+config = load_config(CONFIG_PATH)
+service = create_service(config)
 service.start()
 
+# Shared keep-alive connections to the backends, closed on application shutdown
+upstream_pool = UpstreamPool(config.load_balancing)
+
+# Cache of GET responses, kept across configuration reloads
+response_cache = ResponseCache(config.caching)
+
+# Shares backend requests among identical GET requests in flight
+request_coalescer = RequestCoalescer(config.coalescing)
+
+# Labels of the request metrics, bounded whatever paths clients send
+endpoint_labeler.configure(config.metrics)
+
+def get_service() -> GatewayService:
+    return service
+
+def set_service(new_service: GatewayService):
+    """
+    Publishes a reloaded service. Handlers read the module-level reference once per request,
+    so requests in flight keep using the service they started with.
+
+    :param new_service: The service built from the new configuration
+    """
+    global service
+    upstream_pool.configure(new_service.gateway.load_balancing)
+    response_cache.configure(new_service.gateway.caching)
+    request_coalescer.configure(new_service.gateway.coalescing)
+    endpoint_labeler.configure(new_service.gateway.metrics)
+    service = new_service
+
+# Rebuilds the service when config.yaml changes, started with the application
+config_reloader = ConfigReloader(
+    CONFIG_PATH, get_service, set_service, config.config_reload.get('poll_interval', 2.0),
+)
+
+# Probes the backends of the current service in the background, started with the application
+health_checker = HealthChecker(
+    lambda: service.load_balancer, upstream_pool, config.load_balancing.get('health_check', {}),
+)
+
+async def peek_body(request: Request, limit: int) -> tuple[bytes, AsyncIterator[bytes] | None]:
+    """
+    Reads the first `limit` bytes of the request body without consuming the rest of the stream.
+
+    :param request: The incoming request object
+    :param limit: Number of bytes to buffer
+    :return: The buffered prefix and an iterator replaying the whole body, or None if the request has no body
+    """
+    if 'content-length' not in request.headers and 'transfer-encoding' not in request.headers:
+        return b'', None
+
+    stream = request.stream()
+    chunks: list[bytes] = []
+    size = 0
+    if limit > 0:
+        async for chunk in stream:
+            chunks.append(chunk)
+            size += len(chunk)
+            if size >= limit:
+                break
+
+    async def body() -> AsyncIterator[bytes]:
+        for chunk in chunks:
+            yield chunk
+        async for chunk in stream:
+            yield chunk
+
+    return b''.join(chunks)[:limit], body()
+
+async def proxy_request(path: str, request: Request):
+    """
+    Applies WAF checks, redirection rules and edge authentication, then streams the request to the next backend
+    and the backend response back to the client.
+
+    :param path: The path of the incoming request
+    :param request: The incoming request object
+    :return: A redirection response, the streamed backend response, or an error response
+    """
+    # Use the same configuration snapshot for the whole request, even if it is reloaded meanwhile
+    svc = service
+    query_params = dict(request.query_params)
+    body_prefix, body = await peek_body(request, svc.waf_body_limit)
+
+    # Inspect the request using the WAF
+    svc.inspect_request_zones(
+        request.url.path, urllib.parse.unquote_plus(request.url.query), request.headers.raw, body_prefix,
+    )
+
+    redirect_url = svc.handle_redirection(request_path=f"/{path}", request_port=request.url.port, query_params=query_params)
+    if redirect_url:
+        return RedirectResponse(url=redirect_url)
+
+    # Reject unauthenticated requests to protected paths before opening any upstream connection
+    headers = svc.authenticate_request(f"/{path}", request.headers)
+
+    if request.method == 'GET' and response_cache.enabled:
+        key = response_cache.key_for(f"/{path}", request.url.query, request.headers)
+        if key is not None:
+            return await proxy_cached(svc, path, request, key, headers)
+    if request.method == 'GET':
+        return await proxy_coalesced_or_forward(svc, path, request, headers)
+
+    return await forward(svc, path, request, headers, body)
+
+async def send_upstream(
+    svc: GatewayService, path: str, request: Request, headers: Iterable[tuple[str, str]],
+    body: AsyncIterator[bytes] | None = None,
+) -> tuple[dict, httpx.Response]:
+    """
+    Sends the request to the backends following the retry policy, see send_with_retries().
+    The caller must release the server and close the response once its body has been consumed.
+
+    :param svc: The service snapshot handling the request
+    :param path: The path of the incoming request
+    :param request: The incoming request object
+    :param headers: Request headers to forward
+    :param body: Optional async iterator producing the request body
+    :return: The selected server and the backend response with its body still unread
+    :raises HTTPException: If no backend can be selected, or none answered in time
+    """
+    return await send_with_retries(
+        svc, upstream_pool, request.method, f"/{path}", request.url.query, headers, body,
+        svc.routing_key(request.client.host if request.client else None, request.headers, f"/{path}"),
+    )
+
+def stream_response(svc: GatewayService, server: dict, response: httpx.Response) -> StreamingResponse:
+    """
+    Streams a backend response to the client, releasing the server once it is complete.
+    """
+    released = False
+
+    async def release():
+        # Runs when the response is complete, or when the client goes away mid-stream
+        nonlocal released
+        if not released:
+            released = True
+            svc.release_server(server)
+            await response.aclose()
+
+    async def relay() -> AsyncIterator[bytes]:
+        try:
+            async for chunk in response.aiter_raw():
+                yield chunk
+        finally:
+            await release()
+
+    streaming_response = StreamingResponse(
+        relay(), status_code=response.status_code, background=BackgroundTask(release),
+    )
+    streaming_response.raw_headers = [
+        (name.encode('latin-1'), value.encode('latin-1')) for name, value in filter_headers(response.headers.multi_items())
+    ]
+    return streaming_response
+
+async def forward(
+    svc: GatewayService, path: str, request: Request, headers: Iterable[tuple[str, str]],
+    body: AsyncIterator[bytes] | None = None,
+):
+    """
+    Forwards the request to the next backend and streams its response back.
+    """
+    try:
+        # Forward the request to the next server
+        next_server, response = await send_upstream(svc, path, request, headers, body)
+    except HTTPException:
+        raise
+    except Exception as e:
+        return JSONResponse(status_code=500, content={'detail': 'Error handling request', 'error': str(e)})
+    return stream_response(svc, next_server, response)
+
+def cached_response(entry: CachedResponse, request: Request, cache_status: str | None = None) -> Response:
+    """
+    Answers a request from a stored or shared response, with a 304 if the client already has it.
+
+    :param entry: The buffered response
+    :param request: The incoming request object
+    :param cache_status: Value of the X-Cache header, None for responses shared by coalescing
+    """
+    if entry.etag is not None:
+        if_none_match = request.headers.get('if-none-match', '')
+        if if_none_match.strip() == '*' or entry.etag in (tag.strip() for tag in if_none_match.split(',')):
+            response = Response(status_code=304)
+            response.raw_headers = [
+                (name.encode('latin-1'), value.encode('latin-1')) for name, value in entry.headers
+                if name.lower() in ('etag', 'cache-control', 'vary', 'expires', 'date')
+            ]
+            return response
+
+    response = Response(content=entry.body, status_code=entry.status_code)
+    response.raw_headers = [(name.encode('latin-1'), value.encode('latin-1')) for name, value in entry.headers]
+    if cache_status is not None:
+        CACHE_BYTES_SAVED.inc(len(entry.body))
+        response.raw_headers = [header for header in response.raw_headers if header[0].lower() != b'age'] + [
+            (b'age', str(int(max(0.0, time.time() - entry.stored_at))).encode()),
+            (b'x-cache', cache_status.encode()),
+        ]
+    return response
+
+async def fetch_into_cache(
+    svc: GatewayService, path: str, request: Request, key: str, headers: Iterable[tuple[str, str]],
+    stale: CachedResponse | None,
+) -> tuple[CachedResponse | None, dict, httpx.Response]:
+    """
+    Fetches a cacheable request from the backend and stores the response if it is cacheable.
+    A stale response is revalidated with its ETag.
+
+    :return: The stored response (None if not cacheable), the server and the backend response;
+        the backend response is only unread and unreleased when nothing was stored
+    """
+    CACHE_MISSES.inc()
+    headers = forwardable_headers(headers)
+    if stale is not None and stale.etag is not None:
+        headers.append(('if-none-match', stale.etag))
+    next_server, response = await send_upstream(svc, path, request, headers)
+    try:
+        stored = await response_cache.store(key, f"/{path}", request.headers, response, stale)
+    except BaseException:
+        svc.release_server(next_server)
+        await response.aclose()
+        raise
+
+    if stored is not None:
+        svc.release_server(next_server)
+        await response.aclose()
+    return stored, next_server, response
+
+async def revalidate(
+    svc: GatewayService, path: str, request: Request, key: str, headers: Iterable[tuple[str, str]], stale: CachedResponse,
+):
+    """
+    Refreshes a stale response in the background.
+    """
+    try:
+        (stored, next_server, response), shared = await response_cache.flights.do(
+            key, lambda: fetch_into_cache(svc, path, request, key, headers, stale),
+        )
+    except Exception as e:
+        logger.warning('Background revalidation of %s failed: %s', key, e)
+        return
+    if stored is None and not shared:
+        svc.release_server(next_server)
+        await response.aclose()
+
+async def proxy_cached(svc: GatewayService, path: str, request: Request, key: str, headers: Iterable[tuple[str, str]]):
+    """
+    Answers a GET request from the response cache when possible, otherwise fetches it from the
+    backend with concurrent misses for the same key sharing one backend request.
+
+    :param svc: The service snapshot handling the request
+    :param path: The path of the incoming request
+    :param request: The incoming request object
+    :param key: The cache key of the request
+    :param headers: Request headers to forward
+    :return: The cached, shared or streamed backend response, or an error response
+    """
+    entry = await response_cache.get(key)
+    now = time.time()
+    if entry is not None and now < entry.fresh_until:
+        return cached_response(entry, request, 'HIT')
+    if entry is not None and now < entry.stale_until:
+        # Serve the stale response right away and refresh it in the background
+        if not response_cache.flights.in_flight(key):
+            response_cache.track(asyncio.create_task(revalidate(svc, path, request, key, headers, entry)))
+        return cached_response(entry, request, 'STALE')
+
+    try:
+        (stored, next_server, response), shared = await response_cache.flights.do(
+            key, lambda: fetch_into_cache(svc, path, request, key, headers, entry),
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        return JSONResponse(status_code=500, content={'detail': 'Error handling request', 'error': str(e)})
+
+    if shared:
+        if stored is None:
+            # The response was not cacheable, fetch our own
+            return await proxy_coalesced_or_forward(svc, path, request, headers)
+        own_key = response_cache.key_for(f"/{path}", request.url.query, request.headers)
+        if own_key is not None and own_key != key:
+            # The shared response varies on request headers, which may differ from ours
+            return await proxy_cached(svc, path, request, own_key, headers)
+        CACHE_HITS.labels(tier='coalesced').inc()
+        return cached_response(stored, request, 'HIT')
+    if stored is None:
+        return stream_response(svc, next_server, response)
+    return cached_response(stored, request, 'MISS')
+
+async def fetch_shared(
+    svc: GatewayService, path: str, request: Request, headers: Iterable[tuple[str, str]],
+) -> tuple[CachedResponse | None, dict, httpx.Response]:
+    """
+    Fetches a request from the backend and buffers the response so identical requests can share it.
+
+    :return: The buffered response (None if it cannot be shared), the server and the backend response;
+        the backend response is only unread and unreleased when it cannot be shared
+    """
+    next_server, response = await send_upstream(svc, path, request, headers)
+    content_length = response.headers.get('content-length', '')
+    # Cookies are set for one client only; large or unsized bodies are streamed instead
+    if 'set-cookie' in response.headers or not content_length.isdigit() \
+            or int(content_length) > request_coalescer.max_response_size:
+        return None, next_server, response
+
+    try:
+        body = b''.join([chunk async for chunk in response.aiter_raw()])
+    finally:
+        svc.release_server(next_server)
+        await response.aclose()
+    now = time.time()
+    shared = CachedResponse(response.status_code, filter_headers(response.headers.multi_items()), body, now, now, now)
+    return shared, next_server, response
+
+async def proxy_coalesced_or_forward(svc: GatewayService, path: str, request: Request, headers: Iterable[tuple[str, str]]):
+    """
+    Forwards a GET request, sharing the backend request with identical requests in flight
+    on the routes opted in to coalescing.
+
+    :param svc: The service snapshot handling the request
+    :param path: The path of the incoming request
+    :param request: The incoming request object
+    :param headers: Request headers to forward
+    :return: The shared or streamed backend response, or an error response
+    """
+    key = request_coalescer.key_for(request.method, f"/{path}", request.url.query, request.headers) \
+        if request_coalescer.enabled else None
+    if key is None:
+        return await forward(svc, path, request, headers)
+
+    try:
+        (shared_response, next_server, response), shared = await request_coalescer.flights.do(
+            key, lambda: fetch_shared(svc, path, request, headers),
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        return JSONResponse(status_code=500, content={'detail': 'Error handling request', 'error': str(e)})
+
+    if shared_response is None:
+        if shared:
+            return await forward(svc, path, request, headers)
+        return stream_response(svc, next_server, response)
+    if shared:
+        COALESCED_REQUESTS.inc()
+    return cached_response(shared_response, request)
+
 @router.get('/check-access')
 def check_access(request: Request):
     """
@@ -36,6 +429,21 @@ def health_check():
     """
     return {'status': 'healthy'}
 
+@router.get('/admin/circuits')
+def circuit_states(request: Request):
+    """
+    Admin endpoint reporting the circuit breaker of every backend and the latest state changes,
+    as seen by the worker process answering.
+
+    :param request: The incoming request object containing the client's IP
+    :return: The circuits by backend, and the transitions, oldest first
+    """
+    svc = service
+    svc.check_admin_access(request.client.host if request.client else '')
+    if not svc.load_balancer:
+        return {'backends': {}, 'transitions': []}
+    return svc.load_balancer.circuit_states()
+
 @router.get('/{path:path}')
 async def handle_get_request(path: str, request: Request):
     """
@@ -46,24 +454,7 @@ async def handle_get_request(path: str, request: Request):
     :param request: The incoming request object
     :return: A redirection response, load balanced response, or the requested content
     """
-    query_params = dict(request.query_params)
-    request_content = f"{request.url.path} {request.headers} {await request.body()} {query_params}"
-
-    # Inspect the request using the WAF
-    service.inspect_request_with_waf(request_content)
-
-    redirect_url = service.handle_redirection(request_path=f"/{path}", request_port=request.url.port, query_params=query_params)
-    if redirect_url:
-        return RedirectResponse(url=redirect_url)
-
-    try:
-        next_server = service.get_next_server()
-        # Forward the request to the next server
-        async with httpx.AsyncClient() as client:
-            response = await client.get(f"http://{next_server['address']}:{next_server['port']}/{path}", params=query_params)
-            return JSONResponse(status_code=response.status_code, content=response.json())
-    except Exception as e:
-        return JSONResponse(status_code=500, content={'detail': 'Error handling request', 'error': str(e)})
+    return await proxy_request(path, request)
 
 @router.post('/{path:path}')
 async def handle_post_equest(path: str, request: Request):
@@ -75,24 +466,7 @@ async def handle_post_equest(path: str, request: Request):
     :param request: The incoming request object
     :return: A redirection response, load balanced response, or the requested content
     """
-    query_params = dict(request.query_params)
-    request_content = f"{request.url.path} {request.headers} {await request.body()}"
-
-    # Inspect the request using the WAF
-    service.inspect_request_with_waf(request_content)
-
-    redirect_url = service.handle_redirection(request_path=f"/{path}", request_port=request.url.port, query_params=query_params)
-    if redirect_url:
-        return RedirectResponse(url=redirect_url)
-
-    try:
-        next_server = service.get_next_server()
-        # Forward the request to the next server
-        async with httpx.AsyncClient() as client:
-            response = await client.post(f"http://{next_server['address']}:{next_server['port']}/{path}", data=await request.body(), params=request.query_params)
-            return JSONResponse(status_code=response.status_code, content=response.json())
-    except Exception as e:
-        return JSONResponse(status_code=500, content={'detail': 'Error handling request', 'error': str(e)})
+    return await proxy_request(path, request)
 
 @router.patch('/{path:path}')
 async def handle_patch_request(path: str, request: Request):
@@ -104,24 +478,7 @@ async def handle_patch_request(path: str, request: Request):
     :param request: The incoming request object
     :return: A redirection response, load balanced response, or the requested content
     """
-    query_params = dict(request.query_params)
-    request_content = f"{request.url.path} {request.headers} {await request.body()}"
-
-    # Inspect the request using the WAF
-    service.inspect_request_with_waf(request_content)
-
-    redirect_url = service.handle_redirection(request_path=f"/{path}", request_port=request.url.port, query_params=query_params)
-    if redirect_url:
-        return RedirectResponse(url=redirect_url)
-
-    try:
-        next_server = service.get_next_server()
-        # Forward the request to the next server
-        async with httpx.AsyncClient() as client:
-            response = await client.post(f"http://{next_server['address']}:{next_server['port']}/{path}", data=await request.body(), params=request.query_params)
-            return JSONResponse(status_code=response.status_code, content=response.json())
-    except Exception as e:
-        return JSONResponse(status_code=500, content={'detail': 'Error handling request', 'error': str(e)})
+    return await proxy_request(path, request)
 
 @router.put('/{path:path}')
 async def handle_put_request(path: str, request: Request):
@@ -133,21 +490,4 @@ async def handle_put_request(path: str, request: Request):
     :param request: The incoming request object
     :return: A redirection response, load balanced response, or the requested content
     """
-    query_params = dict(request.query_params)
-    request_content = f"{request.url.path} {request.headers} {await request.body()}"
-
-    # Inspect the request using the WAF
-    service.inspect_request_with_waf(request_content)
-
-    redirect_url = service.handle_redirection(request_path=f"/{path}", request_port=request.url.port, query_params=query_params)
-    if redirect_url:
-        return RedirectResponse(url=redirect_url)
-
-    try:
-        next_server = service.get_next_server()
-        # Forward the request to the next server
-        async with httpx.AsyncClient() as client:
-            response = await client.put(f"http://{next_server['address']}:{next_server['port']}/{path}", data=await request.body(), params=request.query_params)
-            return JSONResponse(status_code=response.status_code, content=response.json())
-    except Exception as e:
-        return JSONResponse(status_code=500, content={'detail': 'Error handling request', 'error': str(e)})
+    return await proxy_request(path, request)
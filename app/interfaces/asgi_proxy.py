@@ -0,0 +1,278 @@
+# app/interfaces/asgi_proxy.py
+from __future__ import annotations
+
+import json
+import urllib.parse
+from collections.abc import AsyncIterator
+from collections.abc import Callable
+from functools import partial
+
+from fastapi import FastAPI
+from fastapi import HTTPException
+
+from app.core.services.gateway_service import GatewayService
+from app.infrastructure.upstream_pool import HOP_BY_HOP_HEADERS
+from app.infrastructure.upstream_retry import send_with_retries
+from app.interfaces import api
+from app.middlewares.metrics_middleware import MetricsMiddleware
+
+# A response produced by a stage: status, raw headers and body
+StageResponse = tuple[int, list[tuple[bytes, bytes]], bytes]
+
+HOP_BY_HOP_RAW_HEADERS = frozenset(name.encode() for name in HOP_BY_HOP_HEADERS)
+
+
+class ProxyRequest:
+    """
+    State of one proxied request, read straight from the ASGI scope.
+    """
+
+    __slots__ = ('scope', 'method', 'path', 'query', 'raw_headers', 'headers', 'client_ip', 'forward_headers', 'body_prefix')
+
+    def __init__(self, scope: dict):
+        self.scope = scope
+        self.method: str = scope['method']
+        self.path: str = scope['path']
+        self.query: str = scope['query_string'].decode('latin-1')
+        self.raw_headers: list[tuple[bytes, bytes]] = scope['headers']
+        # Lowercase names to the first value, like starlette's Headers.get
+        self.headers: dict[str, str] = {}
+        for name, value in self.raw_headers:
+            self.headers.setdefault(name.decode('latin-1'), value.decode('latin-1'))
+        client = scope.get('client')
+        self.client_ip: str = client[0] if client else ''
+        self.forward_headers: list[tuple[str, str]] | None = None
+        self.body_prefix = b''
+
+    @property
+    def port(self) -> int | None:
+        """
+        Port of the request URL, from the Host header like starlette's request.url.port.
+        """
+        host = self.headers.get('host')
+        if host is None:
+            server = self.scope.get('server')
+            return server[1] if server else None
+        _, colon, port = host.rpartition(':')
+        return int(port) if colon and port.isdigit() else None
+
+
+Stage = Callable[[ProxyRequest], 'StageResponse | None']
+
+
+class Pipeline:
+    """
+    The stages a service applies to a request, compiled once per service snapshot so that
+    disabled features cost nothing per request. Each stage either returns None to let the
+    request through, returns a response, or raises HTTPException.
+    """
+
+    def __init__(self, svc: GatewayService):
+        self.service = svc
+        # Stages run before the request body is read
+        self.checks: list[Stage] = []
+        if svc.blocked_ips or svc.allowed_ips:
+            self.checks.append(lambda request: svc.check_ip_lists(request.client_ip))
+        if svc.rate_limiter:
+            self.checks.append(lambda request: svc.check_rate_limit(request.client_ip))
+
+        self.body_limit = svc.waf_body_limit
+        # Stages run once the beginning of the body is known
+        self.stages: list[Stage] = []
+        if svc.waf:
+            self.stages.append(self.inspect)
+        if svc.redirect_table:
+            self.stages.append(self.redirect)
+        if svc.edge_auth:
+            self.stages.append(self.authenticate)
+
+    def inspect(self, request: ProxyRequest) -> None:
+        self.service.inspect_request_zones(
+            request.path, urllib.parse.unquote_plus(request.query), request.raw_headers, request.body_prefix,
+        )
+
+    def redirect(self, request: ProxyRequest) -> StageResponse | None:
+        redirect_url = self.service.handle_redirection(request.path, request.port)  # type: ignore[arg-type]
+        if not redirect_url:
+            return None
+        if request.query:
+            redirect_url = f"{redirect_url}?{urllib.parse.urlencode(dict(urllib.parse.parse_qsl(request.query)))}"
+        return 307, [(b'location', urllib.parse.quote(redirect_url, safe=":/%#?=@[]!$&'()*+,;").encode('latin-1'))], b''
+
+    def authenticate(self, request: ProxyRequest) -> None:
+        edge_auth = self.service.edge_auth
+        claims = edge_auth.authenticate(request.path, request.headers)  # type: ignore[union-attr]
+        request.forward_headers = edge_auth.upstream_headers(  # type: ignore[union-attr]
+            [(name.decode('latin-1'), value.decode('latin-1')) for name, value in request.raw_headers], claims,
+        )
+
+
+class ProxyApp:
+    """
+    Raw ASGI application proxying requests without Starlette routing or per-request framework
+    objects: the gateway stages (access check, rate limit, WAF, redirection, edge authentication)
+    run as a precompiled pipeline of plain callables over the ASGI scope, then the request is
+    load balanced and streamed to a backend.
+
+    Lifespan events, the FastAPI routes (metrics, health, docs...) and GET requests that may be
+    answered by the response cache or coalesced are handed to the FastAPI application.
+    """
+
+    def __init__(self, fallback: FastAPI):
+        """
+        :param fallback: The FastAPI application serving everything but the fast path
+        """
+        self.fallback = fallback
+        self.fallback_paths = frozenset(static_paths(fallback.routes))
+        self.pipeline: Pipeline | None = None
+        self.handle = MetricsMiddleware(self.proxy)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or scope['path'] in self.fallback_paths:
+            await self.fallback(scope, receive, send)
+            return
+        if scope['method'] == 'GET' and (api.response_cache.enabled or api.request_coalescer.enabled):
+            # Answered by FastAPI from the cache or a shared request, after the same access checks as the fast path
+            request = ProxyRequest(scope)
+            try:
+                for check in self.pipeline_for(api.service).checks:
+                    check(request)
+            except HTTPException as e:
+                await MetricsMiddleware(partial(send_error, e))(scope, receive, send)
+                return
+            await self.fallback(scope, receive, send)
+            return
+        await self.handle(scope, receive, send)
+
+    def pipeline_for(self, svc: GatewayService) -> Pipeline:
+        pipeline = self.pipeline
+        if pipeline is None or pipeline.service is not svc:
+            pipeline = self.pipeline = Pipeline(svc)
+        return pipeline
+
+    async def proxy(self, scope, receive, send):
+        # Use the same configuration snapshot for the whole request, even if it is reloaded meanwhile
+        pipeline = self.pipeline_for(api.service)
+        request = ProxyRequest(scope)
+        try:
+            for check in pipeline.checks:
+                check(request)
+
+            body: AsyncIterator[bytes] | None = None
+            if 'content-length' in request.headers or 'transfer-encoding' in request.headers:
+                request.body_prefix, body = await peek_body(receive, pipeline.body_limit)
+
+            for stage in pipeline.stages:
+                response = stage(request)
+                if response is not None:
+                    await send_response(send, *response)
+                    return
+
+            await self.forward(pipeline.service, request, body, send)
+        except HTTPException as e:
+            await send_error(e, scope, receive, send)
+
+    async def forward(self, svc: GatewayService, request: ProxyRequest, body: AsyncIterator[bytes] | None, send):
+        """
+        Streams the request to the backends, following the retry policy, and the response back to the client.
+        """
+        headers = request.forward_headers
+        if headers is None:
+            headers = [(name.decode('latin-1'), value.decode('latin-1')) for name, value in request.raw_headers]
+        try:
+            next_server, response = await send_with_retries(
+                svc, api.upstream_pool, request.method, request.path, request.query, headers, body,
+                svc.routing_key(request.client_ip, request.headers, request.path) if svc.hash_key else None,
+            )
+        except HTTPException:
+            raise
+        except Exception as e:
+            await send_json(send, 500, {'detail': 'Error handling request', 'error': str(e)})
+            return
+
+        try:
+            await send({
+                'type': 'http.response.start',
+                'status': response.status_code,
+                'headers': [(name, value) for name, value in response.headers.raw if name.lower() not in HOP_BY_HOP_RAW_HEADERS],
+            })
+            async for chunk in response.aiter_raw():
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            await send({'type': 'http.response.body', 'body': b''})
+        finally:
+            svc.release_server(next_server)
+            await response.aclose()
+
+
+def static_paths(routes: list) -> list[str]:
+    """
+    Lists the paths of the routes without path parameters, including those of included routers.
+    """
+    paths = []
+    for route in routes:
+        path = getattr(route, 'path', None)
+        if path is not None:
+            if '{' not in path:
+                paths.append(path)
+            continue
+        nested = getattr(route, 'original_router', route)
+        paths.extend(static_paths(getattr(nested, 'routes', [])))
+    return paths
+
+
+async def peek_body(receive, limit: int) -> tuple[bytes, AsyncIterator[bytes]]:
+    """
+    Reads the first `limit` bytes of the request body without consuming the rest of the stream.
+
+    :param receive: The ASGI receive callable
+    :param limit: Number of bytes to buffer
+    :return: The buffered prefix and an iterator replaying the whole body
+    """
+    chunks: list[bytes] = []
+    size = 0
+    more_body = True
+    while more_body and size < limit:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            more_body = False
+            break
+        chunks.append(message.get('body', b''))
+        size += len(chunks[-1])
+        more_body = message.get('more_body', False)
+
+    async def body() -> AsyncIterator[bytes]:
+        nonlocal more_body
+        for chunk in chunks:
+            yield chunk
+        while more_body:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            yield message.get('body', b'')
+            more_body = message.get('more_body', False)
+
+    return b''.join(chunks)[:limit], body()
+
+
+async def send_response(send, status: int, headers: list[tuple[bytes, bytes]], body: bytes):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': headers + [(b'content-length', str(len(body)).encode())],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def send_error(error: HTTPException, scope, receive, send):
+    """
+    Answers with the JSON error response FastAPI would send for the exception.
+    """
+    headers = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in (error.headers or {}).items()]
+    await send_json(send, error.status_code, {'detail': error.detail}, headers)
+
+
+async def send_json(send, status: int, content: dict, headers: list[tuple[bytes, bytes]] | None = None):
+    await send_response(
+        send, status, [(b'content-type', b'application/json'), *(headers or [])],
+        json.dumps(content, separators=(',', ':')).encode(),
+    )
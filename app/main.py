@@ -1,15 +1,41 @@
 # app/main.py
 from __future__ import annotations
 
+import os
+from contextlib import asynccontextmanager
+
 import uvicorn
 from fastapi import FastAPI
 from fastapi.responses import PlainTextResponse
+from prometheus_client import CollectorRegistry
 from prometheus_client import generate_latest
+from prometheus_client import multiprocess
 
+from app.core.services.logger import stop_logging
+from app.interfaces import api
 from app.interfaces.api import router
+from app.interfaces.asgi_proxy import ProxyApp
 from app.middlewares.metrics_middleware import MetricsMiddleware
 
-app = FastAPI(title='Guardian Security Gateway')
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Ties the configuration reloader, the health checks, the upstream connection pool and
+    the log writer to the application lifetime.
+    """
+    if api.config.config_reload.get('enabled', False):
+        api.config_reloader.start()
+    health_check = api.config.load_balancing.get('health_check', {})
+    if health_check.get('enabled', False) and health_check.get('active', False):
+        api.health_checker.start()
+    yield
+    await api.health_checker.stop()
+    await api.config_reloader.stop()
+    await api.upstream_pool.aclose()
+    stop_logging()
+
+app = FastAPI(title='Guardian Security Gateway', lifespan=lifespan)
 
 # Add MetricsMiddleware to capture metrics on every request
 app.add_middleware(MetricsMiddleware)
@@ -20,10 +46,20 @@ def metrics():
     """
     Endpoint to expose Prometheus metrics for scraping.
     """
+    api.upstream_pool.update_metrics()
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        # Served by several workers (app.serve): merge the metrics each of them writes to the directory
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return PlainTextResponse(generate_latest(registry))
     return PlainTextResponse(generate_latest())
 
 # Include the API router
 app.include_router(router)
 
+# Optional fast path: proxies requests as raw ASGI and hands everything else to `app`
+# (uvicorn app.main:fast_app, or python -m app.serve for several worker processes)
+fast_app = ProxyApp(app)
+
 if __name__ == '__main__':
     uvicorn.run(app, host='0.0.0.0', port=8080, log_level='error')
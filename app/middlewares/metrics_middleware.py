@@ -1,12 +1,14 @@
 # app/middleware/metrics_middleware.py
 from __future__ import annotations
 
+import logging
+import re
 import time
 
 from prometheus_client import Counter
 from prometheus_client import Histogram
-from starlette.requests import Request
-from starlette.responses import Response
+
+from app.core.services.logger import access_logger
 
 # Define Prometheus metrics
 REQUEST_COUNT = Counter(
@@ -18,6 +20,105 @@ REQUEST_LATENCY = Histogram(
     'app_request_latency_seconds', 'Request latency', ['method', 'endpoint'],
 )
 
+# Time spent in each part of the gateway; the buckets start in the microseconds for in-process stages
+STAGE_LATENCY = Histogram(
+    'guardian_stage_latency_seconds', 'Time spent per gateway stage', ['stage'],
+    buckets=(
+        0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+        0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+    ),
+)
+WAF_LATENCY = STAGE_LATENCY.labels(stage='waf')
+RATE_LIMIT_LATENCY = STAGE_LATENCY.labels(stage='rate_limit')
+UPSTREAM_CONNECT_LATENCY = STAGE_LATENCY.labels(stage='upstream_connect')
+UPSTREAM_TTFB_LATENCY = STAGE_LATENCY.labels(stage='upstream_ttfb')
+STAGE_LATENCIES = {'waf': WAF_LATENCY, 'rate_limit': RATE_LIMIT_LATENCY}
+
+# Label of the paths beyond the endpoint cap, and of unknown methods
+OTHER_LABEL = 'other'
+
+HTTP_METHODS = frozenset({'GET', 'HEAD', 'POST', 'PUT', 'PATCH', 'DELETE', 'OPTIONS', 'CONNECT', 'TRACE'})
+
+# Path segments that identify a resource: numbers, UUIDs and long hexadecimal strings
+ID_SEGMENT = re.compile(
+    r'(?<=/)(?:\d+|[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|[0-9a-fA-F]{16,})(?=/|$)'
+)
+
+
+def observe_stage(stage: str, seconds: float):
+    """
+    Records the time spent in a gateway stage, see GatewayService.observe_stage.
+    """
+    STAGE_LATENCIES[stage].observe(seconds)
+
+
+def compile_templates(templates: list[str]) -> re.Pattern | None:
+    """
+    Compiles path templates into one regular expression, with one group per template.
+    `{name}` matches one path segment and a trailing `*` matches the rest of the path.
+
+    :param templates: Templates such as "/users/{user_id}/orders"
+    :return: The compiled expression, or None without templates
+    """
+    alternatives = []
+    for template in templates:
+        parts = re.split(r'(\{[^/{}]+\})', template.removesuffix('*'))
+        pattern = ''.join('[^/]+' if part.startswith('{') else re.escape(part) for part in parts)
+        alternatives.append(f"({pattern}{'.*' if template.endswith('*') else ''})")
+    return re.compile('|'.join(alternatives)) if alternatives else None
+
+
+class EndpointLabeler:
+    """
+    Maps request paths to the `endpoint` label of the request metrics.
+
+    Every distinct label value is a new series kept by prometheus_client for the life of the
+    process, and the proxy receives arbitrary paths, so paths are labelled with the first
+    matching route template, resource IDs are collapsed, and once `max_endpoints` distinct
+    labels have been seen any new one is counted as "other".
+    """
+
+    def __init__(self, metrics_config: dict | None = None):
+        """
+        :param metrics_config: The `metrics` settings
+        """
+        self.seen: set[str] = set()
+        self.configure(metrics_config or {})
+
+    def configure(self, metrics_config: dict):
+        """
+        Applies the settings. Labels already seen are kept, as their series still exist.
+
+        :param metrics_config: The `metrics` settings
+        """
+        self.templates: list[str] = metrics_config.get('path_templates', [])
+        self.pattern = compile_templates(self.templates)
+        self.normalize_ids = metrics_config.get('normalize_ids', True)
+        self.max_endpoints = metrics_config.get('max_endpoints', 1000)
+
+    def label(self, path: str) -> str:
+        """
+        :param path: The request path
+        :return: The endpoint label of the path
+        """
+        match = self.pattern.fullmatch(path) if self.pattern else None
+        if match is not None:
+            label = self.templates[match.lastindex - 1]  # type: ignore[operator]
+        elif self.normalize_ids:
+            label = ID_SEGMENT.sub('{id}', path)
+        else:
+            label = path
+        if label not in self.seen:
+            if len(self.seen) >= self.max_endpoints:
+                return OTHER_LABEL
+            self.seen.add(label)
+        return label
+
+
+# Shared by every middleware instance, configured with the gateway configuration
+endpoint_labeler = EndpointLabeler()
+
+
 class MetricsMiddleware:
     """
     Middleware to track Prometheus metrics for request count and response time.
@@ -32,11 +133,8 @@ class MetricsMiddleware:
             await self.app(scope, receive, send)
             return
 
-        # Create a request object from scope
-        request = Request(scope, receive=receive)
-
-        # Start time for calculating latency
-        start_time = time.time()
+        # Start time for calculating latency, from a monotonic clock
+        start_time = time.perf_counter()
 
         # Capture the status code from the response
         response_status = {'status_code': 500}  # Default to 500 in case of an issue
@@ -53,13 +151,26 @@ class MetricsMiddleware:
         await self.app(scope, receive, send_wrapper)
 
         # Calculate request latency
-        latency = time.time() - start_time
+        latency = time.perf_counter() - start_time
 
-        # Get request details
-        method = request.method
-        endpoint = request.url.path
+        # Get request details straight from the scope, without building a Request object
+        method = scope['method']
+        path = scope['path']
         status_code = str(response_status['status_code'])
+        method_label = method if method in HTTP_METHODS else OTHER_LABEL
+        endpoint = endpoint_labeler.label(path)
 
         # Update Prometheus metrics
-        REQUEST_COUNT.labels(method=method, endpoint=endpoint, http_status=status_code).inc()
-        REQUEST_LATENCY.labels(method=method, endpoint=endpoint).observe(latency)
+        REQUEST_COUNT.labels(method=method_label, endpoint=endpoint, http_status=status_code).inc()
+        REQUEST_LATENCY.labels(method=method_label, endpoint=endpoint).observe(latency)
+
+        if access_logger.isEnabledFor(logging.INFO):
+            client = scope.get('client')
+            access_logger.info('%s %s %s', method, path, status_code, extra={'fields': {
+                'client': client[0] if client else None,
+                'method': method,
+                'path': path,
+                'query': scope['query_string'].decode('latin-1'),
+                'status': response_status['status_code'],
+                'duration_ms': round(latency * 1000, 3),
+            }})
@@ -0,0 +1,216 @@
+# app/serve.py
+"""
+Production entry point serving the gateway with several worker processes.
+
+The application is imported once in the supervisor, which builds the service (WAF rule set,
+IP sets, redirection and route tables) and its shared memory state, then forks the workers so
+they share those pages copy-on-write. Each worker binds its own SO_REUSEPORT socket, letting
+the kernel spread connections over the workers, and runs uvicorn with the application
+lifespan (configuration reloader, health checks). Workers that exit are restarted.
+
+Prometheus metrics are written by every worker to a shared directory and merged on /metrics.
+Rate limiting and sessions use shared memory when their backend is "auto".
+
+Usage: python -m app.serve [--workers N] [--host HOST] [--port PORT] [--app MODULE:ATTRIBUTE]
+"""
+from __future__ import annotations
+
+import argparse
+import gc
+import importlib
+import logging
+import os
+import shutil
+import signal
+import socket
+import tempfile
+import time
+
+import uvicorn
+
+from app.core.services.logger import stop_logging
+
+logger = logging.getLogger('guardian')
+
+# Seconds given to the workers to finish their requests on shutdown
+GRACEFUL_TIMEOUT = 30.0
+
+# Workers exiting sooner than this after their start are restarted with a delay
+MIN_WORKER_LIFETIME = 1.0
+
+
+def listening_socket(host: str, port: int, reuse_port: bool) -> socket.socket:
+    """
+    Binds a TCP socket. With SO_REUSEPORT, several processes can bind the same address.
+    """
+    sock = socket.socket(socket.AF_INET6 if ':' in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if reuse_port:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind((host, port))
+    sock.set_inheritable(True)
+    return sock
+
+
+class Supervisor:
+    """
+    Forks the workers and restarts those that exit, until SIGTERM or SIGINT. SIGHUP is
+    forwarded to every worker, which reloads its configuration.
+    """
+
+    def __init__(self, app, host: str, port: int, workers: int, log_level: str):
+        """
+        :param app: The ASGI application, already imported
+        :param host: Address to listen on
+        :param port: Port to listen on, 0 for any free port
+        :param workers: Number of worker processes
+        :param log_level: uvicorn log level
+        """
+        self.app = app
+        self.host = host
+        self.workers = workers
+        self.log_level = log_level
+        self.reuse_port = hasattr(socket, 'SO_REUSEPORT')
+        # Without SO_REUSEPORT, the workers accept on this socket; with it, the socket only
+        # reserves the address (it never listens, so the kernel gives it no connections)
+        self.socket = listening_socket(host, port, self.reuse_port)
+        self.port = self.socket.getsockname()[1]
+        if not self.reuse_port:
+            self.socket.listen(2048)
+        self.children: dict[int, float] = {}  # pid -> start time
+        self.stopping = False
+
+    def spawn(self):
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                self.run_worker()
+                code = 0
+            except BaseException:
+                logger.exception('Worker %s failed', os.getpid())
+            finally:
+                # Exits without the cleanup of the supervisor, which owns the shared state
+                stop_logging()
+                os._exit(code)
+        self.children[pid] = time.monotonic()
+        logger.info('Started worker %s', pid)
+
+    def run_worker(self):
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGINT, signal.SIG_DFL)
+        # Reloads are started by the configuration reloader when it is enabled
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        if self.reuse_port:
+            self.socket.close()
+            sock = listening_socket(self.host, self.port, reuse_port=True)
+        else:
+            sock = self.socket
+        config = uvicorn.Config(self.app, log_level=self.log_level, access_log=False)
+        uvicorn.Server(config).run(sockets=[sock])
+
+    def forward(self, signum: int):
+        for pid in self.children:
+            try:
+                os.kill(pid, signum)
+            except ProcessLookupError:
+                pass
+
+    def stop(self, signum, frame):
+        self.stopping = True
+        self.forward(signal.SIGTERM)
+
+    def run(self):
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        signal.signal(signal.SIGHUP, lambda signum, frame: self.forward(signal.SIGHUP))
+        for _ in range(self.workers):
+            self.spawn()
+
+        deadline = None
+        while self.children:
+            if self.stopping and deadline is None:
+                deadline = time.monotonic() + GRACEFUL_TIMEOUT
+            if deadline is not None and time.monotonic() > deadline:
+                logger.warning('Workers still running after %s seconds, killing them', GRACEFUL_TIMEOUT)
+                self.forward(signal.SIGKILL)
+                deadline = float('inf')
+
+            pid, status = os.waitpid(-1, os.WNOHANG)
+            if pid == 0:
+                time.sleep(0.1)
+                continue
+            if pid not in self.children:
+                continue  # Another child, such as the resource tracker of multiprocessing
+            started = self.children.pop(pid)
+            mark_process_dead(pid)
+            if self.stopping:
+                continue
+            logger.warning('Worker %s exited with status %s, restarting it', pid, os.waitstatus_to_exitcode(status))
+            if time.monotonic() - started < MIN_WORKER_LIFETIME:
+                time.sleep(MIN_WORKER_LIFETIME)
+            self.spawn()
+        self.socket.close()
+
+
+def mark_process_dead(pid: int):
+    # Imported here, prometheus_client must only be loaded once the metrics directory is set
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(pid)
+
+
+def load_app(path: str):
+    module_name, _, attribute = path.partition(':')
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--host', help='defaults to general.listen_address')
+    parser.add_argument('--port', type=int, help='defaults to general.listen_port')
+    parser.add_argument('--app', default='app.main:fast_app', help='ASGI application, as module:attribute')
+    parser.add_argument('--log-level', default='warning')
+    args = parser.parse_args()
+
+    # prometheus_client picks the process-shared storage when it is imported, so this comes first
+    metrics_dir = os.environ.get('PROMETHEUS_MULTIPROC_DIR')
+    created_metrics_dir = metrics_dir is None
+    if metrics_dir is None:
+        metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='guardian-metrics-')
+    for name in os.listdir(metrics_dir):
+        if name.endswith('.db'):
+            os.remove(os.path.join(metrics_dir, name))
+
+    from app.infrastructure import shared_table
+
+    shared_table.multiple_workers = args.workers > 1
+    # Builds the service before forking, so every worker shares the compiled configuration
+    app = load_app(args.app)
+    from app.interfaces import api
+
+    for section in ('rate_limiting', 'session_management'):
+        settings = api.config.security.get(section, {})
+        if args.workers > 1 and settings.get('enabled', False) and settings.get('backend', 'local') == 'local':
+            logger.warning('security.%s uses the local backend: each of the %s workers keeps its own state', section, args.workers)
+
+    # Objects created so far are never freed: keep the garbage collector from touching their pages
+    gc.collect()
+    gc.freeze()
+
+    supervisor = Supervisor(
+        app, args.host or api.config.listen_address, api.config.listen_port if args.port is None else args.port,
+        args.workers, args.log_level,
+    )
+    logger.info('Serving on %s:%s with %s workers', supervisor.host, supervisor.port, args.workers)
+    try:
+        supervisor.run()
+    finally:
+        api.service.close()
+        if created_metrics_dir:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+# benchmarks/asgi_proxy_benchmark.py
+"""
+Compares the requests/second of the FastAPI router and of the raw ASGI fast path on the same
+configuration, in process, with an in-memory backend so only the gateway overhead is measured.
+
+config.yaml is used with response caching off (cached GETs always go through the router) and
+without rate limiting and allowed IP list, so every request reaches the backend on both paths.
+
+Usage: python -m benchmarks.asgi_proxy_benchmark [--requests N] [--concurrency N] [--method GET|POST]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import copy
+import logging
+import time
+
+import httpx
+
+from app.core.services.gateway_service import GatewayService
+from app.infrastructure.response_cache import ResponseCache
+from app.infrastructure.upstream_pool import UpstreamPool
+from app.interfaces import api
+from app.main import app
+from app.main import fast_app
+
+BODY = b'{"items": []}'
+
+
+async def backend(request: httpx.Request) -> httpx.Response:
+    async def body():
+        yield BODY
+
+    return httpx.Response(200, content=body(), headers={'content-type': 'application/json', 'content-length': str(len(BODY))})
+
+
+def configure_gateway():
+    gateway = copy.deepcopy(api.config)
+    gateway.allowed_ips = []
+    gateway.security['rate_limiting']['enabled'] = False
+    api.set_service(GatewayService(gateway))
+    api.response_cache = ResponseCache({'enabled': False})
+    api.upstream_pool = UpstreamPool(transport=httpx.MockTransport(backend))
+    for name in ('guardian', 'httpx'):
+        logging.getLogger(name).setLevel(logging.WARNING)
+
+
+async def call(application, method: str, body: bytes) -> int:
+    """
+    Sends one request straight through the ASGI interface.
+    """
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': method, 'scheme': 'http',
+        'path': '/items', 'raw_path': b'/items', 'root_path': '', 'query_string': b'page=1',
+        'headers': [(b'host', b'gateway'), (b'accept', b'application/json'), (b'content-length', str(len(body)).encode())],
+        'client': ('192.168.1.10', 50000), 'server': ('127.0.0.1', 8080),
+    }
+    status = 0
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+
+    async def receive():
+        return messages.pop() if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+
+    await application(scope, receive, send)
+    return status
+
+
+async def measure(application, method: str, requests: int, concurrency: int) -> float:
+    body = b'{"name": "item"}' if method == 'POST' else b''
+
+    async def worker(count: int):
+        for _ in range(count):
+            status = await call(application, method, body)
+            assert status == 200, status
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(requests // concurrency) for _ in range(concurrency)))
+    return (requests // concurrency * concurrency) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=20_000)
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--method', choices=['GET', 'POST'], default='GET')
+    args = parser.parse_args()
+
+    configure_gateway()
+    asyncio.run(measure(fast_app, args.method, 1000, args.concurrency))  # Warm up both paths
+    asyncio.run(measure(app, args.method, 1000, args.concurrency))
+    router_rps = asyncio.run(measure(app, args.method, args.requests, args.concurrency))
+    fast_rps = asyncio.run(measure(fast_app, args.method, args.requests, args.concurrency))
+
+    print(f"{args.method} /items, {args.concurrency} concurrent clients")
+    print(f"{'FastAPI router':<16} {router_rps:>10.0f} requests/s")
+    print(f"{'ASGI fast path':<16} {fast_rps:>10.0f} requests/s ({fast_rps / router_rps:.2f}x)")
+
+
+if __name__ == '__main__':
+    main()
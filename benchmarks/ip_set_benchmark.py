@@ -0,0 +1,64 @@
+# benchmarks/ip_set_benchmark.py
+"""
+Compares the compiled IPSet with the previous list membership test.
+
+Usage: python -m benchmarks.ip_set_benchmark [--entries N] [--lookups N]
+"""
+from __future__ import annotations
+
+import argparse
+import ipaddress
+import random
+import time
+
+from app.core.services.ip_set import IPSet
+
+
+def generate_entries(count: int, seed: int = 42) -> list[str]:
+    """
+    Generates a feed-like mix of IPv4 addresses, IPv4 ranges and IPv6 ranges.
+    """
+    rng = random.Random(seed)
+    entries = []
+    for index in range(count):
+        if index % 4 == 3:
+            entries.append(f"2001:db8:{rng.getrandbits(16):x}:{rng.getrandbits(16):x}::/64")
+        elif index % 4 == 2:
+            entries.append(f"{ipaddress.IPv4Address(rng.getrandbits(32) & 0xFFFFFF00)}/24")
+        else:
+            entries.append(str(ipaddress.IPv4Address(rng.getrandbits(32))))
+    return entries
+
+
+def measure(func, lookups: list[str]) -> float:
+    start = time.perf_counter()
+    for client_ip in lookups:
+        func(client_ip)
+    return len(lookups) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--entries', type=int, default=100_000)
+    parser.add_argument('--lookups', type=int, default=100_000)
+    args = parser.parse_args()
+
+    entries = generate_entries(args.entries)
+    rng = random.Random(7)
+    lookups = [str(ipaddress.IPv4Address(rng.getrandbits(32))) for _ in range(args.lookups)]
+
+    start = time.perf_counter()
+    ip_set = IPSet(entries)
+    build = time.perf_counter() - start
+
+    # The list scan is O(n) per lookup, so it is sampled on fewer lookups
+    list_rps = measure(entries.__contains__, lookups[:max(1, args.lookups // 100)])
+    set_rps = measure(ip_set.__contains__, lookups)
+
+    print(f"{args.entries} entries, {len(ip_set)} ranges, built in {build * 1000:.0f} ms")
+    print(f"{'list (previous)':<16} {list_rps:>12.0f} lookups/s")
+    print(f"{'IPSet':<16} {set_rps:>12.0f} lookups/s ({set_rps / list_rps:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
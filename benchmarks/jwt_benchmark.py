@@ -0,0 +1,78 @@
+# benchmarks/jwt_benchmark.py
+"""
+Compares token verification throughput of a full jose decode per request (previous), the
+prebuilt key set (cold cache) and the verified-token cache (warm), plus token issuance.
+
+Usage: python -m benchmarks.jwt_benchmark [--algorithm HS256|ES256] [--tokens N] [--requests N]
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+
+import ecdsa
+from jose import jwk
+from jose import jwt
+
+from app.core.services.auth import KeySet
+from app.core.services.auth import TokenVerifier
+
+
+def build_key_set(algorithm: str) -> tuple[KeySet, str | dict]:
+    """
+    Builds a key set signing with a fresh key, and the raw key the previous code would decode with.
+    """
+    if algorithm == 'HS256':
+        return KeySet.from_config({'secret_key': 'benchmark-secret', 'algorithm': algorithm}), 'benchmark-secret'
+    private = jwk.construct(ecdsa.SigningKey.generate(ecdsa.NIST256p).to_pem().decode(), algorithm)
+    public = private.public_key().to_dict()
+    return KeySet({'': (algorithm, private)}, signing_kid=''), public
+
+
+def measure(func, items: list) -> float:
+    start = time.perf_counter()
+    for item in items:
+        func(item)
+    return len(items) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--algorithm', choices=['HS256', 'ES256'], default='HS256')
+    parser.add_argument('--tokens', type=int, default=1_000, help='distinct bearer tokens in use')
+    parser.add_argument('--requests', type=int, default=20_000)
+    args = parser.parse_args()
+
+    key_set, raw_key = build_key_set(args.algorithm)
+    expiry = int(time.time()) + 3600
+    claims = [{'sub': f"user-{index}", 'exp': expiry} for index in range(args.tokens)]
+
+    encode_previous = measure(lambda claim: jwt.encode(claim, raw_key, algorithm=args.algorithm), claims) \
+        if args.algorithm == 'HS256' else None
+    encode_rps = measure(key_set.encode, claims)
+    tokens = [key_set.encode(claim) for claim in claims]
+
+    rng = random.Random(7)
+    requests = [rng.choice(tokens) for _ in range(args.requests)]
+    # Full decodes are slow with asymmetric keys, so they are sampled on fewer requests
+    sample = requests[:max(1, args.requests // (1 if args.algorithm == 'HS256' else 20))]
+
+    previous_rps = measure(lambda token: jwt.decode(token, raw_key, algorithms=[args.algorithm]), sample)
+    cold_rps = measure(TokenVerifier(key_set, cache_size=0).verify, sample)
+    verifier = TokenVerifier(key_set, cache_size=args.tokens)
+    for token in tokens:
+        verifier.verify(token)
+    warm_rps = measure(verifier.verify, requests)
+
+    print(f"{args.algorithm}, {args.tokens} distinct tokens")
+    if encode_previous is not None:
+        print(f"{'encode (previous)':<20} {encode_previous:>12.0f} tokens/s")
+    print(f"{'encode (key set)':<20} {encode_rps:>12.0f} tokens/s")
+    print(f"{'verify (previous)':<20} {previous_rps:>12.0f} tokens/s")
+    print(f"{'verify (cold)':<20} {cold_rps:>12.0f} tokens/s ({cold_rps / previous_rps:.1f}x)")
+    print(f"{'verify (warm)':<20} {warm_rps:>12.0f} tokens/s ({warm_rps / previous_rps:.0f}x)")
+
+
+if __name__ == '__main__':
+    main()
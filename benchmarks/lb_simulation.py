@@ -0,0 +1,117 @@
+# benchmarks/lb_simulation.py
+"""
+Simulates the load balancing strategies against heterogeneous fake backends and compares tail latency.
+
+Each backend serves a fixed number of requests in parallel and queues the others; service times are
+exponential around the backend's mean. Requests arrive as a Poisson process. The simulation runs in
+virtual time, feeding the strategies the same connection and response-time events as the proxy.
+
+Usage: python -m benchmarks.lb_simulation [--requests N] [--load F] [--seed N]
+"""
+from __future__ import annotations
+
+import argparse
+import heapq
+import random
+from collections import deque
+
+from app.core.services.load_balancer_service import LoadBalancerService
+
+STRATEGIES = (
+    'round-robin', 'random', 'least-connections', 'weighted-round-robin', 'power-of-two-choices', 'peak-ewma',
+)
+
+# (mean service time in seconds, parallel capacity, weight) of each fake backend
+BACKENDS = [(0.020, 8, 12)] * 6 + [(0.060, 8, 4)] * 3 + [(0.250, 8, 1)]
+
+
+class FakeBackend:
+    def __init__(self, mean: float, capacity: int):
+        self.mean = mean
+        self.capacity = capacity
+        self.busy = 0
+        self.queue: deque = deque()
+        self.served = 0
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def simulate(strategy: str, requests: int, load: float, seed: int) -> tuple[list[float], list[int]]:
+    """
+    Runs one strategy.
+
+    :return: Sorted request latencies and the number of requests served by each backend
+    """
+    random.seed(seed)
+    rng = random.Random(seed)
+    servers = [{'address': f"10.0.0.{i + 1}", 'port': 80, 'weight': weight} for i, (_, _, weight) in enumerate(BACKENDS)]
+    backends = {server['address']: FakeBackend(mean, capacity) for server, (mean, capacity, _) in zip(servers, BACKENDS)}
+    load_balancer = LoadBalancerService(strategy, servers)
+    now = 0.0
+    if hasattr(load_balancer.strategy, 'clock'):
+        load_balancer.strategy.clock = lambda: now
+
+    capacity = sum(capacity / mean for mean, capacity, _ in BACKENDS)
+    arrival_rate = capacity * load
+    events: list[tuple[float, int, str, object]] = [(0.0, 0, 'arrival', None)]
+    sequence = 1
+    arrived = 0
+    latencies = []
+
+    def start(server: dict, arrived_at: float):
+        nonlocal sequence
+        backend = backends[server['address']]
+        backend.busy += 1
+        heapq.heappush(events, (now + rng.expovariate(1 / backend.mean), sequence, 'done', (server, arrived_at)))
+        sequence += 1
+
+    while events:
+        now, _, kind, data = heapq.heappop(events)
+        if kind == 'arrival':
+            server = load_balancer.get_next_server()
+            load_balancer.increment_connection(server)
+            backend = backends[server['address']]
+            if backend.busy < backend.capacity:
+                start(server, now)
+            else:
+                backend.queue.append((server, now))
+            arrived += 1
+            if arrived < requests:
+                heapq.heappush(events, (now + rng.expovariate(arrival_rate), sequence, 'arrival', None))
+                sequence += 1
+        else:
+            server, arrived_at = data  # type: ignore[misc]
+            backend = backends[server['address']]
+            backend.busy -= 1
+            backend.served += 1
+            latencies.append(now - arrived_at)
+            load_balancer.record_response(server, now - arrived_at)
+            load_balancer.decrement_connection(server)
+            if backend.queue:
+                start(*backend.queue.popleft())
+
+    latencies.sort()
+    return latencies, [backend.served for backend in backends.values()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=100_000)
+    parser.add_argument('--load', type=float, default=0.7, help='Offered load as a fraction of the total backend capacity')
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    print(f"{len(BACKENDS)} backends, mean service times {sorted({mean for mean, _, _ in BACKENDS})} s, load {args.load:.0%}")
+    print(f"{'strategy':<22} {'p50 ms':>8} {'p99 ms':>9} {'p99.9 ms':>9} {'slowest backend share':>22}")
+    for strategy in STRATEGIES:
+        latencies, served = simulate(strategy, args.requests, args.load, args.seed)
+        print(
+            f"{strategy:<22} {percentile(latencies, 0.5) * 1000:>8.1f} {percentile(latencies, 0.99) * 1000:>9.1f}"
+            f" {percentile(latencies, 0.999) * 1000:>9.1f} {served[-1] / sum(served):>22.1%}",
+        )
+
+
+if __name__ == '__main__':
+    main()
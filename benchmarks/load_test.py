@@ -0,0 +1,454 @@
+# benchmarks/load_test.py
+"""
+Load test of the gateway over real sockets: starts stub backends and the gateway, drives a
+request mix with concurrent keep-alive clients, and writes the throughput, the latency
+percentiles and the per-stage latencies scraped from /metrics to a JSON file, so results can
+be compared between commits.
+
+The gateway (app.main:fast_app, served by uvicorn) and the backends run in this process by
+default, on the event loop of the load generator, which keeps profiling simple; --subprocess
+runs each of them in its own process instead. Absolute figures depend on the machine: only
+compare results measured on the same one.
+
+Scenarios:
+  baseline    GET and POST mix through the WAF, without rate limiting
+  rate-limit  a few client addresses against a low limit, so most requests are rejected
+  waf-rules   1000 extra WAF rules, and 10% of the requests carry an attack
+  failover    three backends, the first one stops halfway through the run
+
+Usage: python -m benchmarks.load_test [--scenario NAME] [--duration S] [--concurrency N] [--backends N]
+       [--get-ratio R] [--body-size B] [--waf-ratio R] [--clients N] [--subprocess]
+       [--output FILE] [--compare FILE]
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+import uvicorn
+import yaml
+from prometheus_client.parser import text_string_to_metric_families
+
+from benchmarks.waf_benchmark import generate_rules
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DEFAULT_SETTINGS = {
+    'duration': 10.0,  # seconds measured
+    'warmup': 2.0,  # seconds of load before the measurement
+    'concurrency': 16,  # clients, each with one request in flight
+    'backends': 1,
+    'get_ratio': 0.8,  # share of GET requests, the others are POST requests
+    'body_size': 1024,  # bytes of the POST bodies
+    'response_size': 512,  # bytes of the backend responses
+    'waf_ratio': 0.0,  # share of the requests carrying an attack the WAF blocks
+    'clients': 100,  # distinct client addresses, sent as X-Forwarded-For
+    'waf_rules': 0,  # generated rules added to the WAF rule set
+    'rate_limit': 0,  # requests per minute and client, 0 disables rate limiting
+    'stop_backend_at': None,  # share of the measurement after which the first backend stops
+}
+
+SCENARIOS = {
+    'baseline': {},
+    'rate-limit': {'clients': 4, 'rate_limit': 60},
+    'waf-rules': {'waf_rules': 1000, 'waf_ratio': 0.1},
+    'failover': {'backends': 3, 'stop_backend_at': 0.5},
+}
+
+ATTACK_QUERY = 'q=%3Cscript%3Ealert(1)%3C%2Fscript%3E'
+
+STAGE_METRIC = 'guardian_stage_latency_seconds'
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+async def wait_for_port(port: int, timeout: float = 20.0):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            _, writer = await asyncio.open_connection('127.0.0.1', port)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"Nothing listening on port {port} after {timeout} seconds")
+            await asyncio.sleep(0.05)
+            continue
+        writer.close()
+        return
+
+
+def gateway_config(settings: dict, backend_ports: list[int]) -> dict:
+    """
+    Derives the gateway configuration from config.yaml: the stub backends, no response cache,
+    coalescing, reload or logging, and the scenario's WAF rules and rate limit.
+    """
+    with open(os.path.join(REPO_ROOT, 'config.yaml')) as file:
+        config = yaml.safe_load(file)
+    config['access_control']['allowed_ips'] = []
+    config['caching']['enabled'] = False
+    config['coalescing']['enabled'] = False
+    config['config_reload']['enabled'] = False
+    config['logging'] = {'enabled': False}
+
+    load_balancing = config['load_balancing']
+    load_balancing['servers'] = [{'address': '127.0.0.1', 'port': port, 'weight': 1} for port in backend_ports]
+    load_balancing['health_check']['active'] = False  # failed backends are skipped passively
+
+    security = config['security']
+    security['rate_limiting']['enabled'] = settings['rate_limit'] > 0
+    security['rate_limiting']['max_requests_per_minute'] = settings['rate_limit']
+    security['rate_limiting']['backend'] = 'local'
+    security['waf']['rules'] += generate_rules(settings['waf_rules'])
+    return config
+
+
+async def read_request_body(reader: asyncio.StreamReader, head: bytes):
+    headers = dict(
+        line.split(b':', 1) for line in head.lower().split(b'\r\n')[1:] if b':' in line
+    )
+    if b'content-length' in headers:
+        await reader.readexactly(int(headers[b'content-length']))
+    elif b'chunked' in headers.get(b'transfer-encoding', b''):
+        while size := int((await reader.readline()).split(b';')[0], 16):
+            await reader.readexactly(size + 2)
+        await reader.readuntil(b'\r\n')
+
+
+class StubBackend:
+    """
+    Minimal keep-alive HTTP/1.1 server answering every request with the same JSON response.
+    """
+
+    def __init__(self, port: int, response_size: int):
+        self.port = port
+        body = json.dumps({'data': 'x' * max(0, response_size - 12)}).encode()
+        self.response = b'HTTP/1.1 200 OK\r\ncontent-type: application/json\r\ncontent-length: %d\r\n\r\n%s' % (
+            len(body), body,
+        )
+        self.server: asyncio.Server | None = None
+        self.connections: dict[asyncio.StreamWriter, asyncio.Task] = {}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections[writer] = asyncio.current_task()  # type: ignore[assignment]
+        try:
+            while True:
+                await read_request_body(reader, await reader.readuntil(b'\r\n\r\n'))
+                writer.write(self.response)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            del self.connections[writer]
+            writer.close()
+
+    async def start(self):
+        self.server = await asyncio.start_server(self.handle, '127.0.0.1', self.port)
+
+    async def stop(self):
+        # Closing the server only stops accepting, kept-alive connections are closed as well
+        self.server.close()  # type: ignore[union-attr]
+        connections = list(self.connections.items())
+        for writer, _ in connections:
+            writer.close()
+        await asyncio.gather(*(task for _, task in connections))
+        await self.server.wait_closed()  # type: ignore[union-attr]
+
+    async def serve_forever(self):
+        await self.start()
+        await self.server.serve_forever()  # type: ignore[union-attr]
+
+
+class InProcessGateway:
+    """
+    The gateway served by uvicorn on the event loop of the load generator.
+    """
+
+    def __init__(self, port: int, config: dict, workdir: str):
+        self.port = port
+        self.config_path = os.path.join(workdir, 'config.yaml')
+        with open(self.config_path, 'w') as file:
+            yaml.safe_dump(config, file)
+        self.server: uvicorn.Server | None = None
+        self.task: asyncio.Task | None = None
+
+    async def start(self):
+        # Imported here: importing the application builds the service from ./config.yaml
+        from app.infrastructure.config_loader import load_config
+        from app.interfaces import api
+        from app.main import fast_app
+
+        api.set_service(api.create_service(load_config(self.config_path)))
+        self.server = uvicorn.Server(uvicorn.Config(
+            fast_app, host='127.0.0.1', port=self.port, lifespan='off', log_level='warning',
+            access_log=False, proxy_headers=True, forwarded_allow_ips='*',
+        ))
+        self.task = asyncio.create_task(self.server.serve())
+        await wait_for_port(self.port)
+
+    async def stop(self):
+        from app.interfaces import api
+
+        self.server.should_exit = True  # type: ignore[union-attr]
+        await self.task  # type: ignore[misc]
+        await api.upstream_pool.aclose()
+
+
+class ChildProcess:
+    """
+    A server run as a subprocess, ready once it accepts connections on its port.
+    """
+
+    def __init__(self, port: int, command: list[str], cwd: str):
+        self.port = port
+        self.command = command
+        self.cwd = cwd
+        self.process: subprocess.Popen | None = None
+
+    async def start(self):
+        env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [REPO_ROOT, os.environ.get('PYTHONPATH')]))}
+        self.process = subprocess.Popen(self.command, cwd=self.cwd, env=env)
+        await wait_for_port(self.port)
+
+    async def stop(self):
+        self.process.terminate()  # type: ignore[union-attr]
+        await asyncio.to_thread(self.process.wait, 10)  # type: ignore[union-attr]
+
+
+def subprocess_gateway(port: int, config: dict, workdir: str) -> ChildProcess:
+    # The gateway reads ./config.yaml, so it runs in a directory holding the generated configuration
+    with open(os.path.join(workdir, 'config.yaml'), 'w') as file:
+        yaml.safe_dump(config, file)
+    return ChildProcess(port, [
+        sys.executable, '-m', 'uvicorn', 'app.main:fast_app', '--host', '127.0.0.1', '--port', str(port),
+        '--log-level', 'warning', '--no-access-log', '--proxy-headers', '--forwarded-allow-ips', '*',
+    ], workdir)
+
+
+def subprocess_backend(port: int, response_size: int) -> ChildProcess:
+    return ChildProcess(port, [
+        sys.executable, '-m', 'benchmarks.load_test', '--serve-backend', str(port), '--response-size', str(response_size),
+    ], REPO_ROOT)
+
+
+def stage_snapshot(metrics_text: str) -> dict[str, dict]:
+    """
+    Extracts the count, sum and cumulative buckets of every stage histogram.
+    """
+    stages: dict[str, dict] = {}
+    for family in text_string_to_metric_families(metrics_text):
+        if family.name != STAGE_METRIC:
+            continue
+        for sample in family.samples:
+            stage = stages.setdefault(sample.labels['stage'], {'count': 0.0, 'sum': 0.0, 'buckets': {}})
+            if sample.name.endswith('_count'):
+                stage['count'] = sample.value
+            elif sample.name.endswith('_sum'):
+                stage['sum'] = sample.value
+            elif sample.name.endswith('_bucket'):
+                stage['buckets'][float(sample.labels['le'])] = sample.value
+    return stages
+
+
+def stage_report(before: dict[str, dict], after: dict[str, dict]) -> dict[str, dict]:
+    """
+    Summarizes what each stage recorded between two snapshots. The 99th percentile is the
+    upper bound of the histogram bucket it falls in.
+    """
+    report = {}
+    for stage, totals in after.items():
+        previous = before.get(stage, {'count': 0.0, 'sum': 0.0, 'buckets': {}})
+        count = totals['count'] - previous['count']
+        if count <= 0:
+            continue
+        p99 = next(
+            bound for bound, value in sorted(totals['buckets'].items())
+            if value - previous['buckets'].get(bound, 0.0) >= 0.99 * count
+        )
+        report[stage] = {
+            'count': int(count),
+            'mean_ms': round((totals['sum'] - previous['sum']) / count * 1000, 4),
+            'p99_ms': round(p99 * 1000, 4) if p99 != float('inf') else None,
+        }
+    return report
+
+
+def percentile(ordered: list[float], share: float) -> float:
+    return ordered[min(len(ordered) - 1, int(share * len(ordered)))]
+
+
+async def generate_load(client: httpx.AsyncClient, settings: dict, end: float, seed: int) -> list[tuple[float, str]]:
+    """
+    Runs one client until `end`, sending one request at a time.
+
+    :return: The latency and the status ("error" for transport errors) of every request
+    """
+    rng = random.Random(seed)
+    addresses = [f"10.{index >> 16 & 255}.{index >> 8 & 255}.{index & 255}" for index in range(settings['clients'])]
+    body = b'a' * settings['body_size']
+    results = []
+    sequence = 0
+    while time.perf_counter() < end:
+        sequence += 1
+        query = ATTACK_QUERY if rng.random() < settings['waf_ratio'] else f"page={sequence}"
+        headers = {'x-forwarded-for': rng.choice(addresses)}
+        started = time.perf_counter()
+        try:
+            if rng.random() < settings['get_ratio']:
+                response = await client.get(f"/items?{query}", headers=headers)
+            else:
+                response = await client.post(f"/items?{query}", content=body, headers=headers)
+            status = str(response.status_code)
+        except httpx.HTTPError:
+            status = 'error'
+        results.append((time.perf_counter() - started, status))
+    return results
+
+
+async def run(settings: dict, in_subprocess: bool) -> dict:
+    backend_ports = [free_port() for _ in range(settings['backends'])]
+    gateway_port = free_port()
+    with tempfile.TemporaryDirectory(prefix='guardian-load-') as workdir:
+        config = gateway_config(settings, backend_ports)
+        if in_subprocess:
+            backends = [subprocess_backend(port, settings['response_size']) for port in backend_ports]
+            gateway = subprocess_gateway(gateway_port, config, workdir)
+        else:
+            backends = [StubBackend(port, settings['response_size']) for port in backend_ports]
+            gateway = InProcessGateway(gateway_port, config, workdir)
+        for backend in backends:
+            await backend.start()
+        await gateway.start()
+
+        limits = httpx.Limits(max_connections=settings['concurrency'], max_keepalive_connections=settings['concurrency'])
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{gateway_port}", limits=limits, timeout=30) as client:
+                warmup_end = time.perf_counter() + settings['warmup']
+                await asyncio.gather(*(
+                    generate_load(client, settings, warmup_end, seed) for seed in range(settings['concurrency'])
+                ))
+
+                before = stage_snapshot((await client.get('/metrics')).text)
+                started = time.perf_counter()
+                end = started + settings['duration']
+                stopper = None
+                if settings['stop_backend_at'] is not None:
+                    async def stop_first_backend():
+                        await asyncio.sleep(settings['duration'] * settings['stop_backend_at'])
+                        await backends.pop(0).stop()
+                    stopper = asyncio.create_task(stop_first_backend())
+                results = await asyncio.gather(*(
+                    generate_load(client, settings, end, seed) for seed in range(settings['concurrency'])
+                ))
+                elapsed = time.perf_counter() - started
+                if stopper is not None:
+                    await stopper
+                after = stage_snapshot((await client.get('/metrics')).text)
+        finally:
+            await gateway.stop()
+            for backend in backends:
+                await backend.stop()
+
+    latencies = sorted(latency for client_results in results for latency, _ in client_results)
+    statuses: dict[str, int] = {}
+    for client_results in results:
+        for _, status in client_results:
+            statuses[status] = statuses.get(status, 0) + 1
+    return {
+        'requests': len(latencies),
+        'rps': round(len(latencies) / elapsed, 1),
+        'latency_ms': {
+            'mean': round(sum(latencies) / len(latencies) * 1000, 3),
+            'p50': round(percentile(latencies, 0.50) * 1000, 3),
+            'p99': round(percentile(latencies, 0.99) * 1000, 3),
+            'p999': round(percentile(latencies, 0.999) * 1000, 3),
+            'max': round(latencies[-1] * 1000, 3),
+        },
+        'status': dict(sorted(statuses.items())),
+        'stages': stage_report(before, after),
+    }
+
+
+def current_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_report(report: dict, baseline: dict | None = None):
+    def change(value: float, previous: float | None) -> str:
+        return f" ({(value - previous) / previous:+.1%} vs {baseline['commit']})" if previous else ''  # type: ignore[index]
+
+    print(f"{report['scenario']} at {report['commit']}, {report['mode']}, {report['settings']['concurrency']} clients")
+    print(f"{'requests/s':<12} {report['rps']:>10.1f}{change(report['rps'], baseline and baseline['rps'])}")
+    for name, value in report['latency_ms'].items():
+        previous = baseline and baseline['latency_ms'].get(name)
+        print(f"{name + ' ms':<12} {value:>10.3f}{change(value, previous)}")
+    print('status      ', ', '.join(f"{status}: {count}" for status, count in report['status'].items()))
+    for stage, stats in report['stages'].items():
+        print(f"{stage:<16} mean {stats['mean_ms']:.4f} ms, p99 <= {stats['p99_ms']} ms ({stats['count']} samples)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenario', choices=sorted(SCENARIOS), default='baseline')
+    parser.add_argument('--duration', type=float)
+    parser.add_argument('--warmup', type=float)
+    parser.add_argument('--concurrency', type=int)
+    parser.add_argument('--backends', type=int)
+    parser.add_argument('--get-ratio', type=float)
+    parser.add_argument('--body-size', type=int)
+    parser.add_argument('--response-size', type=int)
+    parser.add_argument('--waf-ratio', type=float)
+    parser.add_argument('--clients', type=int)
+    parser.add_argument('--waf-rules', type=int)
+    parser.add_argument('--rate-limit', type=int)
+    parser.add_argument('--stop-backend-at', type=float)
+    parser.add_argument('--subprocess', action='store_true', help='run the gateway and the backends as subprocesses')
+    parser.add_argument('--output', help='JSON file the results are written to')
+    parser.add_argument('--compare', help='JSON file of a previous run to compare with')
+    parser.add_argument('--serve-backend', type=int, metavar='PORT', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_backend:
+        asyncio.run(StubBackend(args.serve_backend, args.response_size or DEFAULT_SETTINGS['response_size']).serve_forever())
+        return
+
+    overrides = {name: value for name, value in vars(args).items() if name in DEFAULT_SETTINGS and value is not None}
+    settings = {**DEFAULT_SETTINGS, **SCENARIOS[args.scenario], **overrides}
+    mode = 'subprocess' if args.subprocess else 'in-process'
+    report = {
+        'scenario': args.scenario,
+        'commit': current_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'mode': mode,
+        'settings': settings,
+        **asyncio.run(run(settings, args.subprocess)),
+    }
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as file:
+            baseline = json.load(file)
+    print_report(report, baseline)
+    if args.output:
+        with open(args.output, 'w') as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+# benchmarks/rate_limiter_benchmark.py
+"""
+Compares the rate limiting algorithms with the previous list-of-timestamps implementation.
+
+Usage: python -m benchmarks.rate_limiter_benchmark [--requests N] [--clients N] [--max-requests N]
+"""
+from __future__ import annotations
+
+import argparse
+import time
+import tracemalloc
+from collections import defaultdict
+
+from fastapi import HTTPException
+
+from app.core.services.rate_limiter import ALGORITHMS
+from app.core.services.rate_limiter import RateLimiter
+
+
+class ListRateLimiter:
+    """
+    The previous implementation: one list of timestamps per IP, rebuilt on every request.
+    """
+
+    def __init__(self, max_requests: int, ban_duration: int):
+        self.max_requests = max_requests
+        self.ban_duration = ban_duration
+        self.requests: dict[str, list[float]] = defaultdict(list)
+        self.banned_ips: dict[str, float] = {}
+
+    def is_allowed(self, client_ip: str) -> bool:
+        current_time = time.time()
+        if client_ip in self.banned_ips and current_time < self.banned_ips[client_ip]:
+            raise HTTPException(status_code=429, detail='Too many requests. You are temporarily banned.')
+        self.requests[client_ip] = [t for t in self.requests[client_ip] if current_time - t < 60]
+        if len(self.requests[client_ip]) >= self.max_requests:
+            self.banned_ips[client_ip] = current_time + self.ban_duration
+            raise HTTPException(status_code=429, detail='Too many requests. You are temporarily banned.')
+        self.requests[client_ip].append(current_time)
+        return True
+
+
+def send(limiter, client_ips: list[str], requests: int):
+    for i in range(requests):
+        try:
+            limiter.is_allowed(client_ips[i % len(client_ips)])
+        except HTTPException:
+            pass
+
+
+def run(factory, client_ips: list[str], requests: int, trace_memory: bool) -> tuple[float, int | None]:
+    """
+    Sends `requests` requests spread over the client IPs, once timed and optionally once with memory tracing.
+
+    :return: Requests per second and peak traced memory in bytes
+    """
+    start = time.perf_counter()
+    send(factory(), client_ips, requests)
+    rps = requests / (time.perf_counter() - start)
+    if not trace_memory:
+        return rps, None
+
+    tracemalloc.start()
+    send(factory(), client_ips, requests)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return rps, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--requests', type=int, default=10_000)
+    parser.add_argument('--clients', type=int, default=100_000)
+    parser.add_argument('--max-requests', type=int, default=None, help='Per-client limit, defaults to one that is never hit')
+    args = parser.parse_args()
+    # Banned clients short-circuit, so by default the limit is never reached
+    max_requests = args.max_requests or args.requests + 1
+
+    scenarios = {
+        'hot client': ['10.0.0.1'],
+        f"{args.clients} clients": [f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}" for i in range(args.clients)],
+    }
+    limiters = {'list (previous)': lambda: ListRateLimiter(max_requests, 300)}
+    for algorithm in ALGORITHMS:
+        limiters[algorithm] = lambda algorithm=algorithm: RateLimiter(max_requests, 300, algorithm=algorithm)
+
+    print(f"{'scenario':<16} {'limiter':<16} {'req/s':>10} {'peak memory':>14}")
+    for scenario, client_ips in scenarios.items():
+        for name, factory in limiters.items():
+            # Tracing the hot client would mostly measure the list copies of the previous implementation
+            rps, peak = run(factory, client_ips, args.requests, trace_memory=len(client_ips) > 1)
+            memory = f"{peak / 1024 / 1024:>11.1f} MB" if peak is not None else f"{'-':>14}"
+            print(f"{scenario:<16} {name:<16} {rps:>10.0f} {memory}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.infrastructure.upstream_pool import UpstreamPool
+from app.interfaces import api
+from app.main import app
+
+def echo_backend(request: httpx.Request) -> httpx.Response:
+    async def body():
+        yield b'echo:'
+        yield request.content
+
+    return httpx.Response(
+        201,
+        content=body(),
+        headers=[('content-type', 'text/plain'), ('set-cookie', 'a=1'), ('set-cookie', 'b=2'), ('x-path', request.url.raw_path.decode())],
+    )
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(api, 'upstream_pool', UpstreamPool(transport=httpx.MockTransport(echo_backend)))
+    return TestClient(app)
+
+def test_proxy_streams_non_json_response(client):
+    response = client.post('/upload?a=1&a=2', content=b'x' * (api.service.waf.max_body_size * 3))
+
+    assert response.status_code == 201
+    assert response.text == 'echo:' + 'x' * (api.service.waf.max_body_size * 3)
+    assert response.headers['x-path'] == '/upload?a=1&a=2'
+    assert response.headers.get_list('set-cookie') == ['a=1', 'b=2']
+
+def test_proxy_forwards_get_without_body(client):
+    response = client.get('/items')
+
+    assert response.status_code == 201
+    assert response.text == 'echo:'
+
+def test_proxy_blocks_waf_match_in_body(client):
+    response = client.put('/items', content=b'<script>alert(1)</script>')
+
+    assert response.status_code == 403
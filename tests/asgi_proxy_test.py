@@ -0,0 +1,80 @@
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.infrastructure.response_cache import ResponseCache
+from app.infrastructure.upstream_pool import UpstreamPool
+from app.interfaces import api
+from app.main import fast_app
+
+ALLOWED_CLIENT = ('192.168.1.10', 50000)
+
+@pytest.fixture
+def received(monkeypatch):
+    received = []
+
+    async def backend(request: httpx.Request) -> httpx.Response:
+        received.append(request)
+        content = await request.aread()
+
+        async def body():
+            yield b'echo:'
+            yield content
+
+        return httpx.Response(201, content=body(), headers=[
+            ('content-type', 'text/plain'), ('set-cookie', 'a=1'), ('set-cookie', 'b=2'), ('connection', 'close'),
+        ])
+
+    monkeypatch.setattr(api, 'upstream_pool', UpstreamPool(transport=httpx.MockTransport(backend)))
+    monkeypatch.setattr(api, 'response_cache', ResponseCache({'enabled': False}))
+    return received
+
+def send(method: str, url: str, client: tuple[str, int] = ALLOWED_CLIENT, **kwargs) -> httpx.Response:
+    async def request():
+        transport = httpx.ASGITransport(fast_app, client=client)
+        async with httpx.AsyncClient(transport=transport, base_url='http://gateway') as http_client:
+            return await http_client.request(method, url, **kwargs)
+
+    return asyncio.run(request())
+
+def test_fast_path_streams_request_and_response(received):
+    response = send('POST', '/upload?a=1&a=2', content=b'x' * 100_000, headers={'x-trace': '1'})
+
+    assert response.status_code == 201
+    assert response.text == 'echo:' + 'x' * 100_000
+    assert response.headers.get_list('set-cookie') == ['a=1', 'b=2']
+    assert 'connection' not in response.headers
+    assert str(received[0].url) == 'http://127.0.0.1:8001/upload?a=1&a=2'
+    assert received[0].headers['x-trace'] == '1'
+
+def test_fast_path_stages_reject_before_forwarding(received):
+    assert send('GET', '/items', client=('203.0.113.7', 50000)).status_code == 403
+    assert send('GET', '/items', client=('10.1.1.1', 50000)).status_code == 403
+    blocked = send('PUT', '/items', content=b'<script>alert(1)</script>')
+    assert blocked.status_code == 403
+    assert 'detail' in blocked.json()
+
+    redirect = send('GET', '/api/v1/users?page=2')
+    assert redirect.status_code == 307
+    assert redirect.headers['location'] == '/users?page=2'
+    assert received == []
+
+    assert send('GET', '/items').text == 'echo:'
+    assert len(received) == 1
+
+def test_cached_gets_get_the_access_checks_of_the_fast_path(received, monkeypatch):
+    monkeypatch.setattr(api, 'response_cache', ResponseCache({'enabled': True}))
+
+    # Handed to FastAPI for the cache, still rejected like on the fast path
+    assert send('GET', '/items', client=('203.0.113.5', 50000)).status_code == 403
+    assert send('GET', '/items', client=('10.1.1.1', 50000)).status_code == 403
+    assert received == []
+    assert send('GET', '/items').text == 'echo:'
+
+def test_admin_routes_use_fastapi(received):
+    assert send('GET', '/health').json() == {'status': 'healthy'}
+    assert send('GET', '/metrics').status_code == 200
+    assert received == []
@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import json
+import time
+from datetime import timedelta
+
+import ecdsa
+import pytest
+from fastapi import HTTPException
+from jose import jwk
+from jose import jwt
+
+from app.core.services.auth import create_access_token
+from app.core.services.auth import KeySet
+from app.core.services.auth import SECRET_KEY
+from app.core.services.auth import TokenVerifier
+from app.core.services.auth import verify_token
+
+
+def test_default_tokens_round_trip_and_match_jose():
+    token = create_access_token({'sub': 'alice'}, timedelta(minutes=5))
+
+    assert verify_token(token)['sub'] == 'alice'
+    # Tokens encoded with the precomputed header are standard JWTs
+    assert jwt.decode(token, SECRET_KEY, algorithms=['HS256'])['sub'] == 'alice'
+    with pytest.raises(HTTPException) as error:
+        verify_token(token[:-2] + 'xx')
+    assert error.value.status_code == 401
+
+def test_verified_tokens_are_cached_until_they_expire():
+    now = [time.time()]
+    key_set = KeySet.from_config({'secret_key': 'secret'})
+    verifier = TokenVerifier(key_set, cache_size=2, max_cache_ttl=300, clock=lambda: now[0])
+    decodes = []
+    decode = key_set.decode
+    key_set.decode = lambda token: decodes.append(token) or decode(token)  # type: ignore[method-assign]
+
+    token = key_set.encode({'sub': 'alice', 'exp': int(now[0]) + 60})
+    verifier.verify(token)
+    verifier.verify(token)
+    assert len(decodes) == 1
+
+    # The cached entry does not outlive the token, nor max_cache_ttl
+    now[0] += 61
+    verifier.verify(token)
+    assert len(decodes) == 2
+
+    no_expiry = key_set.encode({'sub': 'bob'})
+    now[0] = 0.0
+    verifier.verify(no_expiry)
+    now[0] = 299.0
+    verifier.verify(no_expiry)
+    now[0] = 301.0
+    verifier.verify(no_expiry)
+    assert decodes.count(no_expiry) == 2
+
+def test_cache_is_bounded():
+    key_set = KeySet.from_config({})
+    verifier = TokenVerifier(key_set, cache_size=3)
+    for user in range(10):
+        verifier.verify(key_set.encode({'sub': str(user)}))
+
+    assert len(verifier.verified) == 3
+
+def test_jwks_keys_are_selected_by_kid(tmp_path):
+    signing = jwk.construct(ecdsa.SigningKey.generate(ecdsa.NIST256p).to_pem().decode(), 'ES256').to_dict()
+    other = jwk.construct(ecdsa.SigningKey.generate(ecdsa.NIST256p).to_pem().decode(), 'ES256').to_dict()
+    other.pop('d')
+    jwks = tmp_path / 'keys.json'
+    jwks.write_text(json.dumps({'keys': [
+        {**signing, 'kid': 'current'}, {**other, 'kid': 'previous'},
+        {'kty': 'oct', 'k': 'c2VjcmV0', 'alg': 'HS256', 'kid': 'shared'},
+    ]}))
+
+    key_set = KeySet.from_config({'jwks_file': str(jwks), 'signing_key': 'current'})
+    verifier = TokenVerifier(key_set)
+    token = key_set.encode({'sub': 'alice'})
+
+    assert jwt.get_unverified_header(token) == {'alg': 'ES256', 'typ': 'JWT', 'kid': 'current'}
+    assert verifier.verify(token)['sub'] == 'alice'
+    assert verifier.verify(jwt.encode({'sub': 'bob'}, 'secret', 'HS256', headers={'kid': 'shared'}))['sub'] == 'bob'
+
+    # Unknown kids, tokens without kid, and a key used with another algorithm are rejected
+    for token in (
+        jwt.encode({'sub': 'eve'}, 'secret', 'HS256', headers={'kid': 'unknown'}),
+        jwt.encode({'sub': 'eve'}, 'secret', 'HS256'),
+        jwt.encode({'sub': 'eve'}, 'secret', 'HS512', headers={'kid': 'shared'}),
+    ):
+        with pytest.raises(HTTPException):
+            verifier.verify(token)
+
+    with pytest.raises(ValueError):
+        KeySet.from_config({'jwks_file': str(jwks), 'signing_key': 'previous'})
+    with pytest.raises(ValueError):
+        KeySet.from_config({'secret_key': 'secret', 'algorithm': 'none'})
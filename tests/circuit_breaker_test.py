@@ -0,0 +1,126 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import httpx
+
+from app.core.services import circuit_breaker
+from app.core.services.circuit_breaker import CircuitBreaker
+from app.core.services.circuit_breaker import CLOSED
+from app.core.services.circuit_breaker import HALF_OPEN
+from app.core.services.circuit_breaker import OPEN
+from app.core.services.circuit_breaker import RollingCounts
+from app.core.services.load_balancer_service import LoadBalancerService
+from app.main import app
+
+SERVERS = [{'address': '10.0.0.1', 'port': 80}, {'address': '10.0.0.2', 'port': 80}]
+FAILING = SERVERS[0]
+
+
+def test_rolling_counts_forget_requests_older_than_the_window():
+    counts = RollingCounts(window=10, buckets=5)
+    counts.add(100.0, failed=True, slow=False)
+    counts.add(104.0, failed=False, slow=True)
+    assert counts.counts(105.0) == (2, 1, 1)
+    # The slot of the first request is cleared once the window moved past it
+    assert counts.counts(110.5) == (1, 0, 1)
+    assert counts.counts(1000.0) == (0, 0, 0)
+
+def test_circuit_opens_on_failure_or_slow_rate_and_closes_after_probes():
+    now = [0.0]
+    breaker = CircuitBreaker({'min_requests': 4, 'failure_rate_threshold': 0.5, 'half_open_requests': 2}, clock=lambda: now[0])
+    for success in (True, False, True):
+        assert not breaker.record(0.01, success)
+    # Two failures out of four requests
+    assert breaker.record(0.01, False) and breaker.state == OPEN and not breaker.allows_requests()
+
+    breaker.transition(HALF_OPEN)
+    breaker.probes = 2
+    assert not breaker.allows_requests()
+    assert not breaker.record(0.01, True)
+    assert breaker.record(0.01, True) and breaker.state == CLOSED
+    assert breaker.snapshot()['requests'] == 0
+
+    slow = CircuitBreaker({'min_requests': 2, 'slow_call_duration': 1.0, 'slow_call_rate_threshold': 1.0}, clock=lambda: now[0])
+    slow.record(2.0, True)
+    assert slow.record(3.0, True) and slow.state == OPEN
+
+def test_open_circuits_are_skipped_then_probed():
+    changes = []
+    load_balancer = LoadBalancerService(
+        'round-robin', SERVERS, circuit_breaker={'min_requests': 2, 'open_duration': 0.05, 'half_open_requests': 1},
+        on_circuit_change=lambda server, state: changes.append((server['address'], state)),
+    )
+    load_balancer.record_response(FAILING, 0.01, success=False)
+    load_balancer.record_response(FAILING, 0.01, success=False)
+
+    assert changes == [('10.0.0.1', OPEN)]
+    assert {load_balancer.get_next_server()['address'] for _ in range(4)} == {'10.0.0.2'}
+
+    time.sleep(0.06)
+    picks = [load_balancer.get_next_server()['address'] for _ in range(4)]
+    # One probe request while half-open
+    assert picks.count('10.0.0.1') == 1 and changes[-1] == ('10.0.0.1', HALF_OPEN)
+    load_balancer.record_response(FAILING, 0.01, success=True)
+    assert changes[-1] == ('10.0.0.1', CLOSED)
+    assert {load_balancer.get_next_server()['address'] for _ in range(4)} == {'10.0.0.1', '10.0.0.2'}
+
+    states = load_balancer.circuit_states()
+    assert states['backends']['10.0.0.1:80']['state'] == CLOSED
+    assert [(change['from'], change['to']) for change in states['transitions']] == [
+        (CLOSED, OPEN), (OPEN, HALF_OPEN), (HALF_OPEN, CLOSED),
+    ]
+
+def test_reported_failures_only_open_the_circuit_through_its_failure_rate():
+    load_balancer = LoadBalancerService(
+        'round-robin', SERVERS, enable_health_checking=True, circuit_breaker={'min_requests': 2},
+    )
+    load_balancer.record_response(FAILING, 0.01, success=False)
+    load_balancer.handle_server_failure(FAILING)
+
+    # The circuit replaces the health check cooldown, and one failure is below min_requests
+    assert load_balancer.strategy.server_health['10.0.0.1:80'] and not load_balancer.strategy.failed_servers
+    assert load_balancer.circuit_states()['backends']['10.0.0.1:80']['state'] == CLOSED
+    assert {load_balancer.get_next_server()['address'] for _ in range(4)} == {'10.0.0.1', '10.0.0.2'}
+
+    load_balancer.record_response(FAILING, 0.01, success=False)
+    load_balancer.handle_server_failure(FAILING)
+    assert load_balancer.circuit_states()['backends']['10.0.0.1:80']['state'] == OPEN
+    assert {load_balancer.get_next_server()['address'] for _ in range(4)} == {'10.0.0.2'}
+
+def test_circuit_changes_reach_the_registered_listeners(monkeypatch):
+    changes = []
+
+    def listener(server: dict, state: str):
+        changes.append((server['address'], state))
+
+    monkeypatch.setattr(circuit_breaker, 'circuit_listeners', [])
+    circuit_breaker.add_circuit_listener(listener)
+    circuit_breaker.add_circuit_listener(listener)
+    load_balancer = LoadBalancerService(
+        'round-robin', SERVERS, circuit_breaker={'min_requests': 1}, on_circuit_change=circuit_breaker.notify_circuit_change,
+    )
+    load_balancer.record_response(FAILING, 0.01, success=False)
+    assert changes == [('10.0.0.1', OPEN)]
+
+def test_circuits_survive_a_reload_with_the_same_settings():
+    settings = {'min_requests': 1, 'open_duration': 30}
+    previous = LoadBalancerService('round-robin', SERVERS, circuit_breaker=settings)
+    previous.record_response(FAILING, 0.01, success=False)
+
+    reloaded = LoadBalancerService('round-robin', SERVERS, circuit_breaker=dict(settings))
+    reloaded.carry_over_health(previous)
+    assert reloaded.circuit_states()['backends']['10.0.0.1:80']['state'] == OPEN
+    assert {reloaded.get_next_server()['address'] for _ in range(4)} == {'10.0.0.2'}
+
+def test_admin_endpoint_reports_circuits_to_admin_clients_only():
+    async def scenario(client_address: str) -> httpx.Response:
+        transport = httpx.ASGITransport(app, client=(client_address, 50000))
+        async with httpx.AsyncClient(transport=transport, base_url='http://gateway') as client:
+            return await client.get('/admin/circuits')
+
+    response = asyncio.run(scenario('127.0.0.1'))
+    assert response.status_code == 200
+    assert set(response.json()['backends']['127.0.0.1:8001']) >= {'state', 'failure_rate', 'slow_call_rate'}
+    assert asyncio.run(scenario('203.0.113.7')).status_code == 403
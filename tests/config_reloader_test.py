@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import asyncio
+import os
+
+import pytest
+import yaml
+
+from app.core.services.gateway_service import GatewayService
+from app.infrastructure.config_loader import load_config
+from app.infrastructure.config_reloader import ConfigReloader
+
+CONFIG = {
+    'access_control': {'allowed_ips': [], 'blocked_ips': ['10.0.0.1']},
+    'logging': {'enabled': False},
+    'security': {
+        'rate_limiting': {'enabled': True, 'max_requests_per_minute': 100, 'ban_duration': 300},
+        'waf': {'enabled': True, 'rules': [{'name': 'Block XSS', 'pattern': '<script>', 'action': 'block'}]},
+        'session_management': {'enabled': True, 'session_timeout': 1800},
+    },
+}
+
+def write_config(path, config):
+    path.write_text(yaml.safe_dump(config))
+    # Make the change visible even on filesystems with coarse timestamps
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+@pytest.fixture
+def holder(tmp_path):
+    write_config(tmp_path / 'config.yaml', CONFIG)
+    return {'service': GatewayService(load_config(str(tmp_path / 'config.yaml')))}
+
+@pytest.fixture
+def reloader(holder, tmp_path):
+    return ConfigReloader(str(tmp_path / 'config.yaml'), lambda: holder['service'], lambda service: holder.update(service=service))
+
+def test_reload_swaps_service_and_keeps_state(reloader, holder, tmp_path):
+    old_service = holder['service']
+    session_id = old_service.start_session('alice')
+    old_service.rate_limiter.is_allowed('10.0.0.2')
+
+    write_config(tmp_path / 'config.yaml', {**CONFIG, 'access_control': {'allowed_ips': [], 'blocked_ips': ['10.0.0.0/8']}})
+    assert reloader.changed()
+    assert asyncio.run(reloader.reload())
+
+    new_service = holder['service']
+    assert new_service is not old_service
+    assert '10.9.9.9' in new_service.blocked_ips
+    assert '10.9.9.9' not in old_service.blocked_ips
+    assert new_service.rate_limiter is old_service.rate_limiter
+    new_service.validate_session(session_id)
+    assert not reloader.changed()
+
+def test_reload_carries_bans_over_new_rate_limits(reloader, holder, tmp_path):
+    old_service = holder['service']
+    old_service.rate_limiter.backend.ban('10.0.0.2', float('inf'))
+
+    rate_limiting = {**CONFIG['security']['rate_limiting'], 'algorithm': 'gcra'}
+    write_config(tmp_path / 'config.yaml', {**CONFIG, 'security': {**CONFIG['security'], 'rate_limiting': rate_limiting}})
+    assert asyncio.run(reloader.reload())
+
+    new_service = holder['service']
+    assert new_service.rate_limiter is not old_service.rate_limiter
+    assert new_service.rate_limiter.backend.is_banned('10.0.0.2', 0)
+
+def test_reload_closes_the_backends_not_carried_over(reloader, holder, tmp_path):
+    closed = []
+    for algorithm in ('gcra', 'token-bucket'):
+        old_service = holder['service']
+        old_service.rate_limiter.backend.close = lambda backend=old_service.rate_limiter.backend: closed.append(backend)
+        old_service.session_manager.backend.close = lambda: closed.append('sessions')
+
+        rate_limiting = {**CONFIG['security']['rate_limiting'], 'algorithm': algorithm}
+        write_config(tmp_path / 'config.yaml', {**CONFIG, 'security': {**CONFIG['security'], 'rate_limiting': rate_limiting}})
+        assert asyncio.run(reloader.reload())
+        # The replaced rate limiter is closed, the session store kept by the new service is not
+        assert closed[-1] is old_service.rate_limiter.backend
+        assert 'sessions' not in closed
+
+    assert len(closed) == 2 and closed[0] is not closed[1]
+
+def test_build_leaves_the_live_state_to_carry_over(reloader, holder, tmp_path):
+    old_service = holder['service']
+    old_service.rate_limiter.backend.ban('10.0.0.2', float('inf'))
+
+    security = {
+        **CONFIG['security'],
+        'rate_limiting': {**CONFIG['security']['rate_limiting'], 'algorithm': 'gcra'},
+        'session_management': {'enabled': True, 'session_timeout': 60},
+    }
+    write_config(tmp_path / 'config.yaml', {**CONFIG, 'security': security})
+    new_service = reloader.build(old_service)
+
+    # Nothing the running service uses was changed from the worker thread
+    assert old_service.session_manager.session_timeout == 1800
+    assert not new_service.rate_limiter.backend.is_banned('10.0.0.2', 0)
+
+    new_service.carry_over(old_service)
+    assert new_service.session_manager is old_service.session_manager
+    assert new_service.session_manager.session_timeout == 60
+    assert new_service.rate_limiter.backend.is_banned('10.0.0.2', 0)
+
+def test_invalid_config_keeps_current_service(reloader, holder, tmp_path):
+    old_service = holder['service']
+    waf = {'enabled': True, 'rules': [{'name': 'Bad zone', 'pattern': 'x', 'zones': ['cookies']}]}
+    write_config(tmp_path / 'config.yaml', {**CONFIG, 'security': {**CONFIG['security'], 'waf': waf}})
+
+    assert not asyncio.run(reloader.reload())
+    assert holder['service'] is old_service
+    # The broken file is not retried until it changes again
+    assert not reloader.changed()
+
+def test_run_reloads_on_request(reloader, holder):
+    old_service = holder['service']
+
+    async def scenario():
+        reloader.poll_interval = 60
+        reloader.start()
+        reloader.request_reload()
+        for _ in range(100):
+            if holder['service'] is not old_service:
+                break
+            await asyncio.sleep(0.01)
+        await reloader.stop()
+
+    asyncio.run(scenario())
+    assert holder['service'] is not old_service
@@ -0,0 +1,144 @@
+from __future__ import annotations
+
+import asyncio
+import socketserver
+import threading
+import time
+
+import httpx
+import pytest
+
+from app.core.services.retry_policy import RetryPolicy
+from app.infrastructure.upstream_pool import UpstreamPool
+from app.interfaces import api
+
+
+class RespStandIn(socketserver.ThreadingTCPServer):
+    """
+    In-memory stand-in for a Redis server, speaking just enough RESP2 for the gateway backends.
+    """
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), RespHandler)
+        self.data: dict[bytes, bytes] = {}
+        self.expiry: dict[bytes, float] = {}
+        self.lock = threading.Lock()
+        self.commands: list[list[bytes]] = []
+
+    def get(self, key: bytes) -> bytes | None:
+        if key in self.expiry and self.expiry[key] <= time.time():
+            self.data.pop(key, None)
+            self.expiry.pop(key, None)
+        return self.data.get(key)
+
+    def execute(self, command: list[bytes]):
+        self.commands.append(command)
+        name, args = command[0].upper(), command[1:]
+        if name == b'PING':
+            return 'PONG'
+        if name == b'GET':
+            return self.get(args[0])
+        if name == b'SET':
+            self.data[args[0]] = args[1]
+            self.expiry.pop(args[0], None)
+            if len(args) > 3 and args[2].upper() in (b'PX', b'EX'):
+                scale = 1000 if args[2].upper() == b'PX' else 1
+                self.expiry[args[0]] = time.time() + int(args[3]) / scale
+            return 'OK'
+        if name == b'INCRBY':
+            value = int(self.get(args[0]) or 0) + int(args[1])
+            self.data[args[0]] = str(value).encode()
+            return value
+        if name in (b'EXPIRE', b'PEXPIRE'):
+            if self.get(args[0]) is None:
+                return 0
+            self.expiry[args[0]] = time.time() + int(args[1]) / (1000 if name == b'PEXPIRE' else 1)
+            return 1
+        if name == b'PTTL':
+            if self.get(args[0]) is None:
+                return -2
+            if args[0] not in self.expiry:
+                return -1
+            return int((self.expiry[args[0]] - time.time()) * 1000)
+        if name == b'DEL':
+            return sum(self.data.pop(key, None) is not None for key in args)
+        return Exception(f"ERR unknown command '{name.decode()}'")
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = []
+            for _ in range(int(line[1:])):
+                length = int(self.rfile.readline()[1:])
+                command.append(self.rfile.read(length + 2)[:-2])
+            with self.server.lock:
+                reply = self.server.execute(command)
+            self.wfile.write(self.encode(reply))
+
+    def encode(self, reply) -> bytes:
+        if reply is None:
+            return b'$-1\r\n'
+        if isinstance(reply, Exception):
+            return f"-{reply}\r\n".encode()
+        if isinstance(reply, int):
+            return b':%d\r\n' % reply
+        if isinstance(reply, str):
+            return f"+{reply}\r\n".encode()
+        if isinstance(reply, bytes):
+            return b'$%d\r\n%s\r\n' % (len(reply), reply)
+        return b'*%d\r\n' % len(reply) + b''.join(self.encode(item) for item in reply)
+
+
+@pytest.fixture
+def resp_server():
+    server = RespStandIn()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+class Backend:
+    """
+    Counts requests and answers with a configurable Cache-Control header.
+    """
+
+    def __init__(self, cache_control: str = 'max-age=60', delay: float = 0.0, **headers):
+        self.calls = 0
+        self.cache_control = cache_control
+        self.delay = delay
+        self.headers = headers
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if request.headers.get('if-none-match') == '"v1"':
+            return httpx.Response(304, headers={'cache-control': self.cache_control, 'etag': '"v1"'})
+        body = f"call {self.calls} {request.headers.get('accept-language', '')}".encode()
+
+        async def stream():
+            # A generator body, so the mock response can be streamed like a network one
+            yield body
+
+        return httpx.Response(200, content=stream(), headers={
+            'cache-control': self.cache_control, 'etag': '"v1"', 'content-length': str(len(body)), **self.headers,
+        })
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    backend = Backend()
+    monkeypatch.setattr(api, 'upstream_pool', UpstreamPool(transport=httpx.MockTransport(backend)))
+    if api.service.retry_policy is not None:
+        # Response times of earlier tests would set the hedge delay
+        monkeypatch.setattr(api.service, 'retry_policy', RetryPolicy(api.config.load_balancing['retries']))
+    return backend
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import asyncio
+import copy
+import json
+import time
+
+import httpx
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from app.core.services.auth import KeySet
+from app.core.services.auth import TokenVerifier
+from app.core.services.edge_auth import EdgeAuthenticator
+from app.core.services.gateway_service import GatewayService
+from app.infrastructure.upstream_pool import UpstreamPool
+from app.interfaces import api
+from app.main import app
+from app.main import fast_app
+
+EDGE = {
+    'enabled': True,
+    'protected_paths': ['/api/*'],
+    'public_paths': ['/api/public/'],
+    'claim_headers': {'sub': 'X-Auth-Subject', 'scope': 'X-Auth-Scope', 'tenant': 'X-Auth-Tenant'},
+}
+
+@pytest.fixture
+def key_set():
+    return KeySet.from_config({'secret_key': 'edge-secret'})
+
+def test_protected_paths_longest_prefix_wins(key_set):
+    edge = EdgeAuthenticator(EDGE, TokenVerifier(key_set))
+
+    assert edge.is_protected('/api/orders')
+    assert not edge.is_protected('/api/public/status')
+    assert not edge.is_protected('/static/app.js')
+    assert edge.authenticate('/static/app.js', {}) is None
+
+def test_claims_replace_spoofed_headers(key_set):
+    edge = EdgeAuthenticator(EDGE, TokenVerifier(key_set))
+    token = key_set.encode({'sub': 'alice', 'scope': ['read', 'write'], 'exp': int(time.time()) + 60})
+
+    claims = edge.authenticate('/api/orders', {'authorization': f"Bearer {token}"})
+    headers = edge.upstream_headers([('authorization', f"Bearer {token}"), ('X-Auth-Subject', 'admin')], claims)
+
+    assert headers == [('authorization', f"Bearer {token}"), ('x-auth-subject', 'alice'), ('x-auth-scope', 'read write')]
+    # Spoofed claim headers are dropped on public paths too
+    assert edge.upstream_headers([('x-auth-tenant', 'other'), ('accept', '*/*')], None) == [('accept', '*/*')]
+
+@pytest.mark.parametrize('authorization', ['', 'Basic YWxpY2U6cHc=', 'Bearer not-a-token'])
+def test_invalid_credentials_are_rejected(key_set, authorization):
+    edge = EdgeAuthenticator(EDGE, TokenVerifier(key_set))
+
+    with pytest.raises(HTTPException) as error:
+        edge.authenticate('/api/orders', {'authorization': authorization} if authorization else {})
+    assert error.value.status_code == 401
+    assert error.value.headers['WWW-Authenticate'].startswith('Bearer')
+
+@pytest.fixture
+def gateway(monkeypatch):
+    received = []
+
+    def backend(request: httpx.Request) -> httpx.Response:
+        received.append(request)
+
+        async def body():
+            yield json.dumps({'subject': request.headers.get('x-auth-subject')}).encode()
+
+        return httpx.Response(200, content=body(), headers={'content-type': 'application/json'})
+
+    gateway = copy.deepcopy(api.service.gateway)
+    gateway.security['authentication'] = {'secret_key': 'edge-secret', 'edge': EDGE}
+    monkeypatch.setattr(api, 'service', GatewayService(gateway))
+    monkeypatch.setattr(api, 'upstream_pool', UpstreamPool(transport=httpx.MockTransport(backend)))
+    return TestClient(app), received
+
+def test_gateway_authenticates_before_forwarding(gateway):
+    client, received = gateway
+    token = api.service.authenticate_user('alice')
+
+    assert client.get('/api/orders').status_code == 401
+    assert client.get('/api/orders', headers={'authorization': 'Bearer forged'}).status_code == 401
+    assert received == []
+
+    response = client.get('/api/orders', headers={'authorization': f"Bearer {token}", 'x-auth-subject': 'admin'})
+    assert response.json() == {'subject': 'alice'}
+    assert client.get('/api/public/status', headers={'x-auth-subject': 'admin'}).json() == {'subject': None}
+    assert len(received) == 2
+
+def test_paths_are_matched_in_canonical_form(key_set):
+    edge = EdgeAuthenticator(EDGE, TokenVerifier(key_set))
+
+    assert edge.is_protected('/API/orders')
+    assert edge.is_protected('/api')
+    assert edge.is_protected('//api//orders')
+    assert not edge.is_protected('/api/public//status')
+    with pytest.raises(HTTPException) as error:
+        edge.is_protected('/api/public/../orders')
+    assert error.value.status_code == 400
+
+def test_gateway_rejects_paths_escaping_public_prefixes(gateway):
+    client, received = gateway
+
+    assert client.get('/api/public/%2e%2e/orders').status_code == 400
+    assert client.get('/API/orders').status_code == 401
+    assert client.get('/api').status_code == 401
+    assert received == []
+
+def test_fast_path_rejects_paths_escaping_public_prefixes(gateway):
+    _, received = gateway
+
+    async def send(path: str) -> httpx.Response:
+        transport = httpx.ASGITransport(fast_app, client=('192.168.1.10', 50000))
+        async with httpx.AsyncClient(transport=transport, base_url='http://gateway') as client:
+            return await client.post(path)
+
+    assert asyncio.run(send('/api/public/%2e%2e/orders')).status_code == 400
+    assert asyncio.run(send('/API/orders')).status_code == 401
+    assert asyncio.run(send('/api//orders')).status_code == 401
+    assert received == []
+    assert asyncio.run(send('/api/public/status')).status_code == 200
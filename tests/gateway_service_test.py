@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import copy
+
 import pytest
 from fastapi import HTTPException
 
@@ -55,3 +57,86 @@ def test_gateway_service_load_balancing(gateway_service):
     server = gateway_service.get_next_server()
     assert server['address'] == '192.168.2.20'
     assert server['port'] == 8081
+
+def test_gateway_service_check_access_blocked_cidr_from_feed(gateway_entity, tmp_path):
+    feed = tmp_path / 'blocked.txt'
+    feed.write_text('192.168.1.0/28\n')
+    gateway_entity.blocked_ip_feeds = [str(feed)]
+    gateway_entity.allowed_ips = []
+    gateway_service = GatewayService(gateway_entity)
+
+    with pytest.raises(HTTPException) as excinfo:
+        gateway_service.check_access('192.168.1.10')
+    assert excinfo.value.status_code == 403
+
+    gateway_service.check_access('192.168.1.20')
+
+def test_gateway_service_path_redirection_keeps_query(gateway_entity):
+    gateway_entity.redirection['rules'].append(
+        {'name': 'API', 'source_path': '/api/v1/*', 'destination_path': '/', 'action': 'redirect'},
+    )
+    gateway_service = GatewayService(gateway_entity)
+
+    assert gateway_service.handle_redirection('/api/v1/users', 8080, {'page': '2'}) == '/users?page=2'
+    assert gateway_service.handle_redirection('/users', 8080) == ''
+
+def test_gateway_service_no_healthy_server(gateway_entity):
+    gateway_entity.load_balancing['health_check'] = {'enabled': True}
+    gateway_service = GatewayService(gateway_entity)
+
+    server = gateway_service.get_next_server()
+    gateway_service.handle_server_failure(server)
+    gateway_service.release_server(server)
+
+    with pytest.raises(HTTPException) as excinfo:
+        gateway_service.get_next_server()
+    assert excinfo.value.status_code == 503
+
+@pytest.mark.parametrize(
+    ('hash_key', 'expected'), [
+        ('client_ip', '10.1.2.3'),
+        ('header:X-User', 'alice'),
+        ('cookie:session', 'abc'),
+        ('path_segment:1', 'orders'),
+        ('cookie:missing', None),
+    ],
+)
+def test_gateway_service_routing_key(gateway_entity, hash_key, expected):
+    gateway_entity.load_balancing.update(strategy='consistent_hash', hash_key=hash_key)
+    gateway_service = GatewayService(gateway_entity)
+    headers = {'x-user': 'alice', 'cookie': 'theme=dark; session=abc'}
+
+    assert gateway_service.routing_key('10.1.2.3', headers, '/api/orders/42') == expected
+    assert gateway_service.get_next_server(expected) == {'address': '192.168.2.20', 'port': 8081}
+
+def test_backend_factories_are_injected_and_kept_on_reload(gateway_entity):
+    built = []
+
+    def rate_limit_backends(settings: dict):
+        built.append(settings['algorithm'])
+        return None
+
+    gateway_entity.security = {'rate_limiting': {
+        'enabled': True, 'max_requests_per_minute': 10, 'ban_duration': 60, 'algorithm': 'gcra',
+    }}
+    service = GatewayService(gateway_entity, rate_limit_backends=rate_limit_backends)
+
+    reloaded_entity = copy.deepcopy(gateway_entity)
+    reloaded_entity.security['rate_limiting']['algorithm'] = 'token-bucket'
+    reloaded = GatewayService(reloaded_entity, previous=service)
+
+    assert built == ['gcra', 'token-bucket']
+    assert reloaded.rate_limit_backends is rate_limit_backends
+
+def test_stage_latencies_go_to_the_injected_observer(gateway_entity):
+    stages = []
+    gateway_entity.security = {
+        'rate_limiting': {'enabled': True, 'max_requests_per_minute': 10, 'ban_duration': 60},
+        'waf': {'enabled': True, 'rules': [{'name': 'Block XSS', 'pattern': '<script>', 'action': 'block'}]},
+    }
+    service = GatewayService(gateway_entity, observe_stage=lambda stage, seconds: stages.append(stage))
+
+    service.check_rate_limit('192.168.1.10')
+    with pytest.raises(HTTPException):
+        service.inspect_request_zones('/<script>', '', [])
+    assert stages == ['rate_limit', 'waf']
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+
+from app.core.services.load_balancer_service import LoadBalancerService
+from app.infrastructure.health_checker import HealthChecker
+from app.infrastructure.upstream_pool import UpstreamPool
+
+SERVERS = [{'address': '10.0.0.1', 'port': 8001}, {'address': '10.0.0.2', 'port': 8001}]
+
+def make_checker(down: set[str], **config) -> tuple[HealthChecker, LoadBalancerService]:
+    def backend(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(503 if request.url.host in down else 200)
+
+    load_balancer = LoadBalancerService('round-robin', SERVERS, enable_health_checking=True, cooldown_period=None)
+    pool = UpstreamPool(transport=httpx.MockTransport(backend))
+    return HealthChecker(lambda: load_balancer, pool, config), load_balancer
+
+def test_rise_and_fall_thresholds():
+    down = {'10.0.0.1'}
+    checker, load_balancer = make_checker(down, rise=2, fall=2)
+
+    async def scenario():
+        checker.sync()
+        probe = checker.probes['10.0.0.1:8001']
+        probe.task.cancel()
+        checker.probes['10.0.0.2:8001'].task.cancel()
+
+        checker.record(probe, await checker.probe(probe.server))
+        assert load_balancer.strategy.base_strategy.servers == SERVERS
+        checker.record(probe, await checker.probe(probe.server))
+        assert load_balancer.strategy.base_strategy.servers == SERVERS[1:]
+
+        down.clear()
+        checker.record(probe, await checker.probe(probe.server))
+        assert load_balancer.strategy.base_strategy.servers == SERVERS[1:]
+        checker.record(probe, await checker.probe(probe.server))
+        assert load_balancer.strategy.base_strategy.servers == SERVERS
+
+    asyncio.run(scenario())
+
+def test_backend_failed_by_a_request_is_restored_by_probes():
+    checker, load_balancer = make_checker(set(), rise=2)
+
+    async def scenario():
+        checker.sync()
+        for probe in checker.probes.values():
+            probe.task.cancel()
+        probe = checker.probes['10.0.0.1:8001']
+        # Without cooldown, only the probes can bring the backend back
+        load_balancer.handle_server_failure(probe.server)
+        assert load_balancer.strategy.base_strategy.servers == SERVERS[1:]
+
+        checker.record(probe, await checker.probe(probe.server))
+        assert load_balancer.strategy.base_strategy.servers == SERVERS[1:]
+        checker.record(probe, await checker.probe(probe.server))
+        assert load_balancer.strategy.base_strategy.servers == SERVERS
+
+    asyncio.run(scenario())
+
+def test_probes_run_concurrently_in_background():
+    checker, load_balancer = make_checker({'10.0.0.2'}, interval=0.01, fall=1)
+
+    async def scenario():
+        checker.start()
+        for _ in range(100):
+            if load_balancer.strategy.base_strategy.servers == SERVERS[:1]:
+                break
+            await asyncio.sleep(0.01)
+        await checker.stop()
+
+    asyncio.run(scenario())
+    assert load_balancer.get_next_server() == SERVERS[0]
+    assert checker.probes == {}
+
+def test_health_is_applied_to_reloaded_load_balancer():
+    checker, load_balancer = make_checker({'10.0.0.2'}, fall=1)
+    current = {'load_balancer': load_balancer}
+    checker.get_load_balancer = lambda: current['load_balancer']
+
+    async def scenario():
+        checker.sync()
+        probe = checker.probes['10.0.0.2:8001']
+        checker.record(probe, await checker.probe(probe.server))
+
+        current['load_balancer'] = LoadBalancerService('round-robin', SERVERS, enable_health_checking=True, cooldown_period=None)
+        checker.sync()
+        for probe in checker.probes.values():
+            probe.task.cancel()
+
+    asyncio.run(scenario())
+    assert current['load_balancer'].strategy.base_strategy.servers == SERVERS[:1]
@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+from app.core.services.ip_set import IPSet
+
+def test_ip_set_matches_addresses_and_ranges():
+    ip_set = IPSet(['192.168.1.100', '10.0.0.0/8', '10.1.0.0/16', '2001:db8::/32', 'not-an-ip'])
+
+    assert '192.168.1.100' in ip_set
+    assert '192.168.1.101' not in ip_set
+    assert '10.255.255.255' in ip_set
+    assert '11.0.0.0' not in ip_set
+    assert '2001:db8::1' in ip_set
+    assert '2001:db9::1' not in ip_set
+    assert '::ffff:10.1.2.3' in ip_set
+    assert 'testclient' not in ip_set
+    # The nested /16 is merged into the /8
+    assert len(ip_set) == 3
+
+def test_ip_set_merges_adjacent_ranges():
+    ip_set = IPSet(['10.0.0.0/25', '10.0.0.128/25', '10.0.1.0'])
+
+    assert len(ip_set) == 1
+    assert '10.0.1.0' in ip_set
+    assert '10.0.1.1' not in ip_set
+
+def test_ip_set_loads_feed_files(tmp_path):
+    feed = tmp_path / 'blocklist.txt'
+    feed.write_text('# threat feed\n198.51.100.0/24\n\n2001:db8::1  # single host\n')
+
+    ip_set = IPSet.from_sources(['192.168.1.100'], [str(feed)])
+
+    assert '198.51.100.7' in ip_set
+    assert '2001:db8::1' in ip_set
+    assert '192.168.1.100' in ip_set
+    assert '192.168.1.1' not in ip_set
+
+def test_empty_ip_set_is_falsy():
+    assert not IPSet()
+
+def test_ip_set_rejects_invalid_prefixes():
+    ip_set = IPSet(['10.0.0.0/33', '10.0.0.0/abc', '::ffff:0:0/64', '::ffff:10.0.0.0/120'])
+
+    assert len(ip_set) == 1
+    assert '10.0.0.1' in ip_set
+    assert '10.1.0.0' not in ip_set
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import pytest
+
+from app.core.services.load_balancer_service import LoadBalancerService
+from app.core.services.strategies.weighted_round_robin_strategy import WeightedRoundRobinStrategy
+
+SERVERS = [{'address': '10.0.0.1', 'port': 8001}, {'address': '10.0.0.1', 'port': 8002}, {'address': '10.0.0.2', 'port': 8001}]
+
+def test_round_robin_accepts_config_spelling():
+    load_balancer = LoadBalancerService('round_robin', SERVERS)
+
+    assert [load_balancer.get_next_server() for _ in range(4)] == SERVERS + SERVERS[:1]
+
+def test_unknown_strategy_is_rejected():
+    with pytest.raises(ValueError):
+        LoadBalancerService('fastest', SERVERS)
+
+def test_least_connections_tracks_active_connections():
+    load_balancer = LoadBalancerService('least-connections', SERVERS)
+
+    # Ties are broken in turn
+    selected = []
+    for _ in range(3):
+        server = load_balancer.get_next_server()
+        load_balancer.increment_connection(server)
+        selected.append(server)
+    assert selected == SERVERS
+
+    load_balancer.decrement_connection(SERVERS[1])
+    assert load_balancer.get_next_server() == SERVERS[1]
+
+    for _ in range(5):
+        load_balancer.decrement_connection(SERVERS[0])
+    # Decrements never go below zero
+    assert load_balancer.strategy.server_connections['10.0.0.1:8001'] == 0
+    load_balancer.increment_connection(SERVERS[1])
+    assert load_balancer.get_next_server() == SERVERS[0]
+
+def test_least_connections_with_many_servers():
+    servers = [{'address': f"10.0.{i // 256}.{i % 256}", 'port': 80} for i in range(500)]
+    load_balancer = LoadBalancerService('least-connections', servers)
+
+    for _ in range(1000):
+        load_balancer.increment_connection(load_balancer.get_next_server())
+
+    assert set(load_balancer.strategy.server_connections.values()) == {2}
+
+def test_health_checking_skips_failed_servers():
+    load_balancer = LoadBalancerService('least-connections', SERVERS, enable_health_checking=True)
+    load_balancer.handle_server_failure(SERVERS[0])
+    load_balancer.handle_server_failure(SERVERS[2])
+
+    for _ in range(3):
+        server = load_balancer.get_next_server()
+        load_balancer.increment_connection(server)
+        assert server == SERVERS[1]
+
+    load_balancer.handle_server_failure(SERVERS[1])
+    with pytest.raises(Exception, match='No healthy servers'):
+        load_balancer.get_next_server()
+
+def test_failed_servers_recover_after_cooldown(monkeypatch):
+    load_balancer = LoadBalancerService('round-robin', SERVERS, enable_health_checking=True)
+    load_balancer.handle_server_failure(SERVERS[0])
+    assert SERVERS[0] not in [load_balancer.get_next_server() for _ in range(4)]
+
+    load_balancer.strategy.failed_servers['10.0.0.1:8001'] -= 61
+    assert SERVERS[0] in [load_balancer.get_next_server() for _ in range(3)]
+
+def test_weighted_round_robin_interleaves_by_weight():
+    servers = [{'address': '10.0.0.1', 'port': 80, 'weight': 3}, {'address': '10.0.0.2', 'port': 80, 'weight': 1}]
+    load_balancer = LoadBalancerService('weighted_round_robin', servers)
+
+    picks = [load_balancer.get_next_server()['address'] for _ in range(8)]
+    assert picks.count('10.0.0.1') == 6
+    # The heavy server never gets the whole schedule in a row
+    assert picks[:4].count('10.0.0.2') == 1
+
+    load_balancer.record_response(servers[0], 0.1, success=False)
+    assert load_balancer.strategy.effective_weights['10.0.0.1:80'] == 1
+    load_balancer.record_response(servers[0], 0.1)
+    load_balancer.record_response(servers[0], 0.1)
+    assert load_balancer.strategy.effective_weights['10.0.0.1:80'] == 3
+
+def test_weighted_round_robin_rebuilds_at_most_once_per_interval():
+    now = [100.0]
+    servers = [{'address': '10.0.0.1', 'port': 80, 'weight': 3}, {'address': '10.0.0.2', 'port': 80, 'weight': 1}]
+    strategy = WeightedRoundRobinStrategy(servers, rebuild_interval=1.0, clock=lambda: now[0])
+    now[0] += 5
+
+    # The first change after a quiet period is applied by the next selection
+    strategy.record_response(servers[0], 0.1, success=False)
+    strategy.get_next_server()
+    assert len(strategy.schedule) == 2
+
+    # Recovering weights within the interval keep the current schedule
+    schedule = strategy.schedule
+    strategy.record_response(servers[0], 0.1)
+    strategy.record_response(servers[0], 0.1)
+    for _ in range(4):
+        strategy.get_next_server()
+    assert strategy.schedule is schedule
+
+    now[0] += 1
+    strategy.get_next_server()
+    assert len(strategy.schedule) == 4
+
+def test_power_of_two_choices_prefers_fewer_in_flight():
+    load_balancer = LoadBalancerService('power-of-two-choices', SERVERS[:2])
+    load_balancer.increment_connection(SERVERS[0])
+
+    assert all(load_balancer.get_next_server() == SERVERS[1] for _ in range(10))
+
+def test_peak_ewma_avoids_slow_server():
+    now = [0.0]
+    load_balancer = LoadBalancerService('peak-ewma', SERVERS[:2])
+    load_balancer.strategy.clock = lambda: now[0]
+
+    load_balancer.record_response(SERVERS[0], 0.5)
+    load_balancer.record_response(SERVERS[1], 0.01)
+    assert all(load_balancer.get_next_server() == SERVERS[1] for _ in range(10))
+
+    # Failures count as slow responses, and idle estimates decay so slow servers are retried
+    load_balancer.record_response(SERVERS[1], 0.01, success=False)
+    assert load_balancer.strategy.latency['10.0.0.1:8002'].get(now[0]) == 1.0
+    now[0] += 100
+    load_balancer.record_response(SERVERS[1], 0.01, success=False)
+    assert load_balancer.get_next_server() == SERVERS[0]
+
+def test_consistent_hash_is_sticky_and_remaps_minimally():
+    servers = [{'address': f"10.0.0.{i}", 'port': 80} for i in range(5)]
+    load_balancer = LoadBalancerService('consistent_hash', servers, enable_health_checking=True, cooldown_period=None)
+    keys = [f"client-{i}" for i in range(2000)]
+
+    before = {key: load_balancer.get_next_server(key)['address'] for key in keys}
+    assert all(load_balancer.get_next_server(key)['address'] == before[key] for key in keys[:100])
+    # Virtual nodes spread the keys evenly
+    assert all(250 < list(before.values()).count(server['address']) < 550 for server in servers)
+
+    load_balancer.set_server_health(servers[2], False)
+    after = {key: load_balancer.get_next_server(key)['address'] for key in keys}
+    moved = [key for key in keys if after[key] != before[key]]
+    assert moved and all(before[key] == '10.0.0.2' for key in moved)
+    assert '10.0.0.2' not in after.values()
+
+    # Requests without a key are spread in turn
+    assert {load_balancer.get_next_server()['address'] for _ in range(4)} == {'10.0.0.0', '10.0.0.1', '10.0.0.3', '10.0.0.4'}
+
+    # A retry goes where the key would go without the server already tried
+    load_balancer.set_server_health(servers[2], True)
+    key = next(key for key in keys if before[key] == '10.0.0.2')
+    assert load_balancer.get_next_server(key, exclude={'10.0.0.2:80'})['address'] == after[key]
+
+def test_excluded_servers_are_only_selected_when_no_other_is_left():
+    servers = [{'address': f"10.0.0.{i}", 'port': 80} for i in range(3)]
+    tried = {'10.0.0.0:80', '10.0.0.1:80'}
+    strategies = (
+        'round-robin', 'weighted-round-robin', 'random', 'least-connections', 'power-of-two-choices', 'peak-ewma',
+        'consistent-hash',
+    )
+    for strategy in strategies:
+        load_balancer = LoadBalancerService(strategy, servers, enable_health_checking=True)
+        for key in (None, 'client'):
+            assert all(load_balancer.get_next_server(key, exclude=tried) == servers[2] for _ in range(5)), strategy
+        assert load_balancer.get_next_server(exclude={'10.0.0.0:80', '10.0.0.1:80', '10.0.0.2:80'}) in servers
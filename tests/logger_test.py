@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import json
+import logging
+
+import pytest
+
+from app.core.services.logger import access_logger
+from app.core.services.logger import configure_logging
+from app.core.services.logger import LazyQueueHandler
+from app.core.services.logger import parse_size
+from app.core.services.logger import stop_logging
+from app.interfaces import api
+
+@pytest.fixture
+def log_dir(tmp_path):
+    yield tmp_path
+    # Put back the pipeline of the gateway configuration
+    stop_logging()
+    configure_logging(api.service.gateway.logging)
+
+def test_parse_size():
+    assert parse_size('10MB') == 10 * 1024 * 1024
+    assert parse_size('512 kb') == 512 * 1024
+    assert parse_size(100) == parse_size('100') == parse_size('100B') == 100
+    with pytest.raises(ValueError):
+        parse_size('ten')
+
+def test_records_are_written_by_the_background_writer(log_dir):
+    configure_logging({'enabled': True, 'log_file': str(log_dir / 'gateway.log'), 'log_format': '%(levelname)s %(message)s'})
+    logger = logging.getLogger('guardian')
+    backends = ['a']
+    logger.info('Backends: %s, client %s', backends, '10.0.0.1')
+    backends.append('b')
+    try:
+        raise ValueError('boom')
+    except ValueError:
+        logger.exception('Request failed')
+    stop_logging()
+
+    lines = (log_dir / 'gateway.log').read_text().splitlines()
+    # Mutable arguments are rendered when the call is made, not when the record is written
+    assert lines[0] == "INFO Backends: ['a'], client 10.0.0.1"
+    assert lines[1] == 'ERROR Request failed'
+    assert 'ValueError: boom' in lines[-1]
+
+def test_lazy_handler_keeps_immutable_arguments_unformatted():
+    handler = LazyQueueHandler(None)  # type: ignore[arg-type]
+    record = logging.LogRecord('guardian', logging.INFO, __file__, 1, 'Routing to %s:%s', ('127.0.0.1', 8001), None)
+
+    assert handler.prepare(record).args == ('127.0.0.1', 8001)
+
+def test_rotation_sampling_and_json_access_log(log_dir):
+    configure_logging({
+        'enabled': True,
+        'log_file': str(log_dir / 'gateway.log'),
+        'log_rotation': {'enabled': True, 'max_size': '1KB', 'backup_count': 2},
+        'sample_rate': 0.0,
+        'access_log': {'enabled': True, 'log_file': str(log_dir / 'access.log')},
+    })
+    logger = logging.getLogger('guardian')
+    for index in range(100):
+        logger.info('Dropped by sampling %d', index)
+        logger.warning('Kept %d %s', index, 'x' * 50)
+    access_logger.info('GET /items 200', extra={'fields': {'status': 200, 'path': '/items'}})
+    stop_logging()
+
+    assert sorted(path.name for path in log_dir.iterdir()) == ['access.log', 'gateway.log', 'gateway.log.1', 'gateway.log.2']
+    assert (log_dir / 'gateway.log').stat().st_size <= 1024
+    assert 'Dropped' not in (log_dir / 'gateway.log').read_text()
+    assert 'GET /items' not in (log_dir / 'gateway.log').read_text()
+    entry = json.loads((log_dir / 'access.log').read_text())
+    assert entry['status'] == 200 and entry['path'] == '/items' and entry['message'] == 'GET /items 200'
@@ -0,0 +1,81 @@
+from __future__ import annotations
+
+import asyncio
+
+from prometheus_client import REGISTRY
+
+from app.infrastructure.upstream_pool import UpstreamPool
+from app.interfaces import api
+from app.middlewares.metrics_middleware import EndpointLabeler
+from app.middlewares.metrics_middleware import MetricsMiddleware
+
+def stage_count(stage: str) -> float:
+    return REGISTRY.get_sample_value('guardian_stage_latency_seconds_count', {'stage': stage}) or 0.0
+
+def test_paths_are_labelled_with_templates_and_ids():
+    labeler = EndpointLabeler({'path_templates': ['/users/{user_id}/orders', '/static/*']})
+
+    assert labeler.label('/users/alice/orders') == '/users/{user_id}/orders'
+    assert labeler.label('/users/alice/orders/12') == '/users/alice/orders/{id}'
+    assert labeler.label('/static/css/site.css') == '/static/*'
+    assert labeler.label('/items/123e4567-e89b-12d3-a456-426614174000/tags/7') == '/items/{id}/tags/{id}'
+    assert labeler.label('/v2/items') == '/v2/items'
+    assert EndpointLabeler({'normalize_ids': False}).label('/items/42') == '/items/42'
+
+def test_distinct_endpoints_are_capped():
+    labeler = EndpointLabeler({'max_endpoints': 2, 'normalize_ids': False})
+
+    assert [labeler.label(f"/page/{index}") for index in range(4)] == ['/page/0', '/page/1', 'other', 'other']
+    assert labeler.label('/page/1') == '/page/1'
+
+def test_middleware_labels_request_metrics():
+    async def app(scope, receive, send):
+        await send({'type': 'http.response.start', 'status': 204, 'headers': []})
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def send(message):
+        pass
+
+    def run(method: str, path: str):
+        scope = {'type': 'http', 'method': method, 'path': path, 'query_string': b'', 'headers': []}
+        asyncio.run(MetricsMiddleware(app)(scope, None, send))
+
+    labels = {'method': 'GET', 'endpoint': '/orders/{id}', 'http_status': '204'}
+    before = REGISTRY.get_sample_value('app_requests_total', labels) or 0.0
+    run('GET', '/orders/1')
+    run('GET', '/orders/2')
+    run('BREW', '/orders/3')
+
+    assert REGISTRY.get_sample_value('app_requests_total', labels) == before + 2
+    assert REGISTRY.get_sample_value('app_requests_total', {**labels, 'method': 'other'}) >= 1
+
+def test_gateway_stages_are_timed():
+    svc = api.service
+    inspections, checks = stage_count('waf'), stage_count('rate_limit')
+    svc.inspect_request_zones('/items', 'page=1', [(b'accept', b'*/*')])
+    svc.check_rate_limit('198.51.100.7')
+
+    assert stage_count('waf') == inspections + 1
+    assert stage_count('rate_limit') == checks + 1
+
+def test_upstream_connect_and_first_byte_are_timed():
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        await reader.readuntil(b'\r\n\r\n')
+        writer.write(b'HTTP/1.1 200 OK\r\ncontent-length: 2\r\n\r\nok')
+        await writer.drain()
+        writer.close()
+
+    async def run():
+        server = await asyncio.start_server(handle, '127.0.0.1', 0)
+        pool = UpstreamPool()
+        response = await pool.stream({'address': '127.0.0.1', 'port': server.sockets[0].getsockname()[1]}, 'GET', '/')
+        body = await response.aread()
+        await response.aclose()
+        await pool.aclose()
+        server.close()
+        return body
+
+    connects, first_bytes = stage_count('upstream_connect'), stage_count('upstream_ttfb')
+    assert asyncio.run(run()) == b'ok'
+    assert stage_count('upstream_connect') == connects + 1
+    assert stage_count('upstream_ttfb') == first_bytes + 1
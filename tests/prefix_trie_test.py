@@ -0,0 +1,20 @@
+from __future__ import annotations
+
+from app.core.services.prefix_trie import PrefixTrie
+
+def test_longest_match_prefers_longest_prefix():
+    trie: PrefixTrie[str] = PrefixTrie()
+    trie.insert('/api/', 'api')
+    trie.insert('/api/v1/', 'v1')
+    trie.insert('/api/', 'duplicate')
+
+    assert trie.longest_match('/api/v1/users') == (8, 'v1')
+    assert trie.longest_match('/api/v2/users') == (5, 'api')
+    assert trie.longest_match('/static/app.js') is None
+    assert len(trie) == 2
+
+def test_empty_prefix_matches_everything():
+    trie: PrefixTrie[int] = PrefixTrie()
+    trie.insert('', 0)
+
+    assert trie.longest_match('/anything') == (0, 0)
@@ -0,0 +1,189 @@
+from __future__ import annotations
+
+import os
+import socket
+import uuid
+
+import pytest
+from fastapi import HTTPException
+
+from app.core.services.rate_limiter import RateLimiter
+from app.infrastructure.rate_limit_backends import create_rate_limit_backend
+from app.infrastructure.rate_limit_backends import RedisRateLimitBackend
+from app.infrastructure.rate_limit_backends import SharedMemoryRateLimitBackend
+from app.infrastructure.shared_table import key_hash
+
+NOW = 6000.0  # Start of a window, so the previous window carries no weight
+
+@pytest.fixture
+def shared_memory_name():
+    return f"guardian_test_{uuid.uuid4().hex[:8]}"
+
+def test_shared_memory_backend_shares_counts_between_instances(shared_memory_name):
+    first = SharedMemoryRateLimitBackend(max_requests=3, name=shared_memory_name, slots=64)
+    second = SharedMemoryRateLimitBackend(max_requests=3, name=shared_memory_name, slots=64)
+    try:
+        assert first.hit('10.0.0.1', NOW)
+        assert second.hit('10.0.0.1', NOW)
+        assert first.hit('10.0.0.1', NOW)
+        assert not second.hit('10.0.0.1', NOW)
+        assert second.hit('10.0.0.2', NOW)
+
+        first.ban('10.0.0.1', NOW + 10)
+        assert second.is_banned('10.0.0.1', NOW + 5)
+        assert not second.is_banned('10.0.0.1', NOW + 11)
+    finally:
+        second.close()
+        first.close()
+
+def test_shared_memory_backend_shares_counts_with_forked_workers(shared_memory_name):
+    backend = SharedMemoryRateLimitBackend(max_requests=100, name=shared_memory_name, slots=64)
+    try:
+        children = []
+        for _ in range(4):
+            pid = os.fork()
+            if pid == 0:
+                for _ in range(10):
+                    backend.hit('10.0.0.1', NOW)
+                os._exit(0)
+            children.append(pid)
+        for pid in children:
+            os.waitpid(pid, 0)
+
+        hashed = key_hash('10.0.0.1')
+        assert backend.table.read(backend.table.find(hashed))[:3] == (hashed, int(NOW // 60), 40)
+    finally:
+        backend.close()
+
+def test_forked_worker_closing_a_backend_keeps_the_block_shared(shared_memory_name):
+    backend = SharedMemoryRateLimitBackend(max_requests=100, name=shared_memory_name, slots=64)
+    try:
+        pid = os.fork()
+        if pid == 0:
+            # What a configuration reload does in a worker
+            backend.close()
+            os._exit(0)
+        os.waitpid(pid, 0)
+
+        backend.hit('10.0.0.1', NOW)
+        attached = SharedMemoryRateLimitBackend(max_requests=100, name=shared_memory_name, slots=64)
+        hashed = key_hash('10.0.0.1')
+        assert attached.table.read(attached.table.find(hashed))[2] == 1
+        attached.close()
+    finally:
+        backend.close()
+
+def test_shared_memory_backend_evicts_when_full(shared_memory_name):
+    backend = SharedMemoryRateLimitBackend(max_requests=5, name=shared_memory_name, slots=8)
+    try:
+        for i in range(100):
+            assert backend.hit(f"10.0.0.{i}", NOW + i)
+    finally:
+        backend.close()
+
+def test_shared_memory_backend_keeps_banned_clients_until_the_ban_ends(shared_memory_name):
+    backend = SharedMemoryRateLimitBackend(max_requests=5, name=shared_memory_name, slots=8)
+    try:
+        backend.hit('10.1.0.1', NOW)
+        backend.ban('10.1.0.1', NOW + 1000)
+        for i in range(8):
+            backend.hit(f"10.0.0.{i}", NOW + 120 + i * 60)
+        # Kept over clients seen after its window, as its ban ends later
+        assert backend.is_banned('10.1.0.1', NOW + 500)
+
+        backend.hit('10.0.1.1', NOW + 5000)
+        # The ban is over: the client was active the longest ago
+        with backend.table.locked():
+            assert backend.table.find(key_hash('10.1.0.1')) is None
+    finally:
+        backend.close()
+
+def test_redis_backend_shares_counts_through_server(resp_server):
+    port = resp_server.server_address[1]
+    first = RedisRateLimitBackend(max_requests=4, port=port, flush_interval=3600)
+    second = RedisRateLimitBackend(max_requests=4, port=port, flush_interval=3600)
+    try:
+        assert first.hit('10.0.0.1', NOW)
+        assert first.hit('10.0.0.1', NOW)
+        assert second.hit('10.0.0.1', NOW)
+        first.flush(NOW)
+        second.flush(NOW)
+
+        # The second replica has seen the 3 requests and allows a single one more
+        assert second.hit('10.0.0.1', NOW)
+        assert not second.hit('10.0.0.1', NOW)
+        second.flush(NOW)
+
+        # The first replica catches up on its next flush
+        first.hit('10.0.0.1', NOW)
+        first.flush(NOW)
+        assert not first.hit('10.0.0.1', NOW)
+
+        # Counters are sent as one pipelined batch per flush
+        assert [command[0] for command in resp_server.commands[:3]] == [b'INCRBY', b'EXPIRE', b'GET']
+
+        # Bans reach the other replica with the next flush of that client's counts
+        first.ban('10.0.0.1', NOW + 10)
+        first.flush(NOW)
+        second.hit('10.0.0.1', NOW)
+        second.flush(NOW)
+        assert second.is_banned('10.0.0.1', NOW)
+    finally:
+        first.close()
+        second.close()
+
+def test_redis_backend_counts_locally_when_server_is_down():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    backend = RedisRateLimitBackend(max_requests=2, port=port, flush_interval=3600, timeout=0.05)
+    try:
+        assert backend.hit('10.0.0.1', NOW)
+        backend.flush(NOW)
+        assert backend.hit('10.0.0.1', NOW)
+        assert not backend.hit('10.0.0.1', NOW)
+    finally:
+        backend.close()
+
+def test_redis_backend_drops_ended_windows_while_server_is_down():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        port = sock.getsockname()[1]
+
+    backend = RedisRateLimitBackend(max_requests=2, port=port, flush_interval=3600, timeout=0.05)
+    try:
+        for i in range(100):
+            backend.hit(f"10.0.0.{i}", NOW)
+        backend.ban('10.0.0.1', NOW + 30)
+        backend.flush(NOW)
+        assert len(backend.pending) == 100
+
+        # Still weighs on the next window
+        backend.flush(NOW + 60)
+        assert len(backend.pending) == 100
+
+        backend.hit('10.0.1.1', NOW + 120)
+        backend.flush(NOW + 120)
+        assert list(backend.pending) == ['10.0.1.1']
+        assert backend.pending_bans == {}
+    finally:
+        backend.close()
+
+def test_rate_limiter_uses_configured_backend(shared_memory_name):
+    backend = create_rate_limit_backend({
+        'max_requests_per_minute': 1,
+        'backend': 'shared-memory',
+        'shared_memory': {'name': shared_memory_name, 'slots': 64},
+    })
+    try:
+        rate_limiter = RateLimiter(max_requests=1, ban_duration=60, backend=backend)
+        assert rate_limiter.is_allowed('10.0.0.1')
+        with pytest.raises(HTTPException):
+            rate_limiter.is_allowed('10.0.0.1')
+    finally:
+        backend.close()
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        create_rate_limit_backend({'max_requests_per_minute': 1, 'backend': 'memcached'})
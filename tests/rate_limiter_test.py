@@ -4,8 +4,16 @@ from __future__ import annotations
 import pytest
 from fastapi import HTTPException
 
+from app.core.services import rate_limiter as rate_limiter_module
+from app.core.services.rate_limiter import ALGORITHMS
 from app.core.services.rate_limiter import RateLimiter
 
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1_000_000.0]
+    monkeypatch.setattr(rate_limiter_module, 'time', lambda: now[0])
+    return now
+
 def test_rate_limiter_allows_requests_within_limit():
     rate_limiter = RateLimiter(max_requests=5, ban_duration=300)
     client_ip = '192.168.1.10'
@@ -47,3 +55,45 @@ def test_rate_limiter_blocks_after_exceeding_limit():
 
 #     # Request should be allowed again
 #     assert rate_limiter.is_allowed(client_ip) == True
+
+@pytest.mark.parametrize('algorithm', sorted(ALGORITHMS))
+def test_rate_limiter_algorithms_enforce_limit_and_ban(algorithm, clock):
+    rate_limiter = RateLimiter(max_requests=5, ban_duration=10, algorithm=algorithm)
+    client_ip = '192.168.1.10'
+
+    for _ in range(5):
+        assert rate_limiter.is_allowed(client_ip) == True
+    with pytest.raises(HTTPException):
+        rate_limiter.is_allowed(client_ip)
+
+    # Still banned, then allowed again once the ban and the window have passed
+    clock[0] += 5
+    with pytest.raises(HTTPException):
+        rate_limiter.is_allowed(client_ip)
+    clock[0] += 60
+    assert rate_limiter.is_allowed(client_ip) == True
+
+@pytest.mark.parametrize('algorithm', sorted(ALGORITHMS))
+def test_rate_limiter_evicts_idle_clients(algorithm, clock):
+    rate_limiter = RateLimiter(max_requests=1000, ban_duration=10, algorithm=algorithm)
+
+    for i in range(100):
+        rate_limiter.is_allowed(f"10.0.0.{i}")
+    assert len(rate_limiter.backend.requests) == 100
+
+    clock[0] += 61
+    for _ in range(50):
+        rate_limiter.is_allowed('192.168.1.10')
+        clock[0] += 1.2
+    assert list(rate_limiter.backend.requests) == ['192.168.1.10']
+
+def test_rate_limiter_caps_tracked_clients(clock):
+    rate_limiter = RateLimiter(max_requests=5, ban_duration=10, max_tracked_clients=10)
+
+    for i in range(100):
+        rate_limiter.is_allowed(f"10.0.0.{i}")
+    assert list(rate_limiter.backend.requests) == [f"10.0.0.{i}" for i in range(90, 100)]
+
+def test_rate_limiter_rejects_unknown_algorithm():
+    with pytest.raises(ValueError):
+        RateLimiter(max_requests=5, ban_duration=10, algorithm='leaky')
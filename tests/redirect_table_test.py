@@ -0,0 +1,36 @@
+from __future__ import annotations
+
+from app.core.services.redirect_table import RedirectTable
+
+REDIRECTION = {
+    'enabled': True,
+    'rules': [
+        {'name': 'HTTPS', 'source_port': 80, 'destination_port': 443, 'action': 'redirect'},
+        {'name': 'API', 'source_path': '/api/*', 'destination_path': '/legacy/', 'action': 'redirect'},
+        {'name': 'API v1', 'source_path': '/api/v1/*', 'destination_path': '/', 'action': 'redirect'},
+        {'name': 'Disabled', 'source_path': '/old/*', 'destination_path': '/new/', 'action': 'allow'},
+    ],
+}
+
+def test_port_rules_take_precedence():
+    table = RedirectTable(REDIRECTION, 'gateway.local')
+
+    assert table.resolve(80, '/api/v1/users') == 'https://gateway.local:443/api/v1/users'
+
+def test_longest_path_prefix_wins():
+    table = RedirectTable(REDIRECTION, 'gateway.local')
+
+    assert table.resolve(8080, '/api/v1/users') == '/users'
+    assert table.resolve(8080, '/api/v2/users') == '/legacy/v2/users'
+    # Prefixes match at the start of the path only
+    assert table.resolve(8080, '/docs/api/v1/users') == ''
+    assert table.resolve(8080, '/old/page') == ''
+
+def test_resolved_redirects_are_cached():
+    table = RedirectTable(REDIRECTION, 'gateway.local', cache_size=2)
+
+    for path in ('/api/a', '/api/a', '/api/b', '/api/c'):
+        table.resolve(8080, path)
+
+    info = table.resolve.cache_info()
+    assert (info.hits, info.misses, info.currsize) == (1, 3, 2)
@@ -0,0 +1,146 @@
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.infrastructure.response_cache import CachedResponse
+from app.infrastructure.response_cache import DiskTier
+from app.infrastructure.response_cache import MemoryTier
+from app.infrastructure.response_cache import parse_cache_control
+from app.infrastructure.response_cache import ResponseCache
+from app.interfaces import api
+from app.main import app
+
+def entry(body: bytes = b'x', **headers) -> CachedResponse:
+    return CachedResponse(200, list(headers.items()), body, 0.0, 10.0, 20.0)
+
+def test_parse_cache_control():
+    assert parse_cache_control('public, max-age=60, no-cache="set-cookie"') == {
+        'public': None, 'max-age': '60', 'no-cache': 'set-cookie',
+    }
+
+def test_memory_tier_admission_keeps_popular_entries():
+    tier = MemoryTier(max_size=2000)
+    for _ in range(5):
+        tier.get('popular')
+    assert tier.put('popular', entry(b'p' * 600))
+    tier.get('one-off')
+    assert tier.put('one-off', entry(b'o' * 600))
+
+    # Storing a third entry would evict the least recently used one, which is requested more often
+    tier.get('new')
+    assert not tier.put('new', entry(b'n' * 600))
+    assert list(tier.entries) == ['popular', 'one-off']
+
+def test_memory_tier_evicts_least_recently_used():
+    tier = MemoryTier(max_size=3000)
+    for key in ('a', 'b', 'c'):
+        tier.get(key)
+        assert tier.put(key, entry(b'x' * 600))
+    tier.get('a')
+    tier.get('d')
+    tier.get('d')
+    assert tier.put('d', entry(b'x' * 600))
+
+    assert list(tier.entries) == ['c', 'a', 'd']
+    assert tier.size <= tier.max_size
+
+def test_disk_tier_round_trip_and_bound(tmp_path):
+    tier = DiskTier(str(tmp_path), max_size=2000)
+    tier.put('a', entry(b'a' * 900, etag='"1"'))
+    tier.put('b', entry(b'b' * 900))
+    tier.put('c', entry(b'c' * 900))
+
+    assert tier.get('a') is None
+    stored = tier.get('c')
+    assert stored.body == b'c' * 900
+
+    # A new process reuses the files
+    reopened = DiskTier(str(tmp_path), max_size=2000)
+    assert reopened.get('b').body == b'b' * 900
+
+def test_vary_headers_are_remembered_for_a_bounded_number_of_urls():
+    cache = ResponseCache({'enabled': True, 'default_ttl': 60, 'max_vary_keys': 2})
+
+    async def store(path: str):
+        response = httpx.Response(200, headers={'vary': 'Accept-Language', 'content-length': '1'}, stream=httpx.ByteStream(b'x'))
+        await cache.store(f"{path}?", path, {'accept-language': 'en'}, response)
+
+    asyncio.run(store('/a'))
+    asyncio.run(store('/b'))
+    # Looking /a up makes /b the least recently used
+    assert cache.key_for('/a', '', {'accept-language': 'en'}) == '/a?\nen'
+    asyncio.run(store('/c'))
+
+    assert list(cache.vary) == ['/a?', '/c?']
+    assert cache.key_for('/b', '', {'accept-language': 'en'}) == '/b?'
+
+@pytest.fixture
+def backend(backend, monkeypatch):
+    monkeypatch.setattr(api, 'response_cache', ResponseCache({'enabled': True, 'routes': [{'path': '/static/', 'ttl': 30}]}))
+    return backend
+
+def get(*requests: tuple[str, dict]) -> list[httpx.Response]:
+    async def send():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url='http://gateway') as client:
+            return await asyncio.gather(*(client.get(url, headers=headers) for url, headers in requests))
+
+    return asyncio.run(send())
+
+def test_cache_hit_and_conditional_request(backend):
+    first, second, conditional = get(('/items?page=1', {}), ('/items?page=1', {}), ('/items?page=1', {'if-none-match': '"v1"'}))
+
+    assert backend.calls == 1
+    assert first.text == second.text == 'call 1 '
+    assert {first.headers['x-cache'], second.headers['x-cache']} == {'MISS', 'HIT'}
+    assert conditional.status_code == 304
+    assert get(('/items?page=2', {}))[0].text == 'call 2 '
+
+def test_concurrent_misses_are_coalesced(backend):
+    backend.delay = 0.05
+    responses = get(*[('/slow', {})] * 10)
+
+    assert backend.calls == 1
+    assert {response.text for response in responses} == {'call 1 '}
+
+def test_uncacheable_responses_are_not_stored(backend):
+    backend.cache_control = 'private, max-age=60'
+    get(('/private', {}))
+    get(('/private', {}))
+    get(('/items', {'authorization': 'Bearer token'}))
+
+    assert backend.calls == 3
+
+def test_route_ttl_and_vary(backend):
+    backend.cache_control = ''
+    backend.headers = {'vary': 'Accept-Language'}
+    english, french, english_again = get(
+        ('/static/app.js', {'accept-language': 'en'}), ('/static/app.js', {'accept-language': 'fr'}),
+        ('/static/app.js', {'accept-language': 'en'}),
+    )
+    # Without a route TTL nor max-age, nothing is cached
+    get(('/other', {}))
+    get(('/other', {}))
+
+    assert english.text.endswith('en') and english_again.text.endswith('en')
+    assert french.text.endswith('fr')
+    assert backend.calls == 4
+
+def test_stale_while_revalidate_serves_stale_then_refreshes(backend):
+    backend.cache_control = 'max-age=0, stale-while-revalidate=60'
+    backend.headers = {}
+
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url='http://gateway') as client:
+            await client.get('/feed')
+            stale = await client.get('/feed', headers={'accept-language': 'en'})
+            await asyncio.gather(*api.response_cache.revalidating)
+            return stale
+
+    stale = asyncio.run(scenario())
+    assert stale.headers['x-cache'] == 'STALE'
+    assert stale.text == 'call 1 '
+    # The background revalidation used the stored ETag and the backend answered 304
+    assert backend.calls == 2
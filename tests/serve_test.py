@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+import time
+import uuid
+
+import httpx
+import pytest
+import yaml
+
+from app.core.services.logger import configure_logging
+from app.core.services.logger import stop_logging
+from app.infrastructure import shared_table
+from app.infrastructure.rate_limit_backends import create_rate_limit_backend
+from app.infrastructure.rate_limit_backends import SharedMemoryRateLimitBackend
+from app.interfaces import api
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def test_auto_backend_is_shared_with_several_workers(monkeypatch):
+    name = f"guardian_test_{uuid.uuid4().hex[:8]}"
+    settings = {'backend': 'auto', 'max_requests_per_minute': 10, 'shared_memory': {'name': name, 'slots': 64}}
+    assert create_rate_limit_backend(settings) is None
+
+    monkeypatch.setattr(shared_table, 'multiple_workers', True)
+    backend = create_rate_limit_backend(settings)
+    try:
+        assert isinstance(backend, SharedMemoryRateLimitBackend)
+    finally:
+        backend.close()  # type: ignore[union-attr]
+
+def test_forked_workers_write_their_own_logs(tmp_path):
+    configure_logging({'enabled': True, 'log_file': str(tmp_path / 'gateway.log'), 'log_format': '%(message)s'})
+    try:
+        pid = os.fork()
+        if pid == 0:
+            logging.getLogger('guardian').warning('From worker')
+            stop_logging()
+            os._exit(0)
+        os.waitpid(pid, 0)
+        logging.getLogger('guardian').warning('From supervisor')
+    finally:
+        stop_logging()
+        configure_logging(api.service.gateway.logging)
+
+    assert sorted((tmp_path / 'gateway.log').read_text().splitlines()) == ['From supervisor', 'From worker']
+
+@pytest.fixture
+def served_gateway(tmp_path):
+    """
+    Runs app.serve with two workers, from a directory holding a configuration without IP lists or logging.
+    """
+    with open(os.path.join(REPO_ROOT, 'config.yaml')) as file:
+        config = yaml.safe_load(file)
+    config['access_control']['allowed_ips'] = []
+    config['logging'] = {'enabled': False}
+    config['config_reload']['enabled'] = False
+    config['load_balancing']['health_check']['active'] = False
+    config['security']['rate_limiting']['shared_memory']['name'] = f"guardian_test_{uuid.uuid4().hex[:8]}"
+    config['security']['session_management']['shared_memory']['name'] = f"guardian_test_{uuid.uuid4().hex[:8]}"
+    with open(tmp_path / 'config.yaml', 'w') as file:
+        yaml.safe_dump(config, file)
+
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'app.serve', '--workers', '2', '--host', '127.0.0.1', '--port', str(port)],
+        cwd=tmp_path, env={**os.environ, 'PYTHONPATH': REPO_ROOT},
+    )
+    deadline = time.monotonic() + 20
+    while True:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            break
+        except OSError:
+            assert time.monotonic() < deadline and process.poll() is None
+            time.sleep(0.1)
+    yield process, f"http://127.0.0.1:{port}"
+    if process.poll() is None:
+        process.kill()
+        process.wait()
+
+def test_workers_share_metrics_and_are_restarted(served_gateway):
+    process, url = served_gateway
+    for _ in range(10):
+        # A new connection per request, spread over the workers by the kernel
+        assert httpx.get(f"{url}/health").status_code == 200
+    metrics = httpx.get(f"{url}/metrics").text
+    assert 'app_requests_total{endpoint="/health",http_status="200",method="GET"} 10.0' in metrics
+
+    workers = subprocess.run(['pgrep', '-P', str(process.pid), '-f', 'app.serve'], capture_output=True, text=True).stdout.split()
+    assert len(workers) == 2
+    os.kill(int(workers[0]), signal.SIGKILL)
+    time.sleep(1.5)
+    restarted = subprocess.run(['pgrep', '-P', str(process.pid), '-f', 'app.serve'], capture_output=True, text=True).stdout.split()
+    assert len(restarted) == 2 and workers[0] not in restarted
+    assert httpx.get(f"{url}/health").status_code == 200
+
+    process.send_signal(signal.SIGTERM)
+    assert process.wait(timeout=15) == 0
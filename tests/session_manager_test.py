@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import uuid
+
+import pytest
+
+from app.core.services.session_manager import LocalSessionBackend
+from app.core.services.session_manager import SessionManager
+from app.infrastructure.session_backends import create_session_backend
+from app.infrastructure.session_backends import RedisSessionBackend
+from app.infrastructure.session_backends import SharedMemorySessionBackend
+
+def test_session_ids_are_random_and_validate():
+    manager = SessionManager(session_timeout=60)
+    first, second = manager.create_session('alice'), manager.create_session('alice')
+
+    assert first != second and 'alice' not in first and len(first) >= 43
+    assert manager.validate_session(first)
+    manager.revoke_session(first)
+    assert not manager.validate_session(first)
+    assert manager.is_session_active(second)
+
+def test_local_backend_expires_sliding_sessions():
+    backend = LocalSessionBackend()
+    backend.create('a', 'alice', now=0, timeout=10)
+    backend.create('b', 'bob', now=0, timeout=10)
+
+    assert backend.touch('a', now=8, timeout=10)
+    assert backend.touch('a', now=16, timeout=10)
+    assert not backend.touch('b', now=16, timeout=10)
+    assert not backend.touch('a', now=27, timeout=10)
+    assert backend.sessions == {}
+
+def test_local_backend_sweeps_abandoned_sessions():
+    backend = LocalSessionBackend(sweep_batch=2)
+    for index in range(100):
+        backend.create(str(index), 'user', now=0, timeout=10)
+    backend.create('active', 'user', now=5, timeout=10)
+
+    # Abandoned sessions go away without being validated, a few per call
+    for _ in range(60):
+        backend.touch('active', now=11, timeout=10)
+    assert list(backend.sessions) == ['active']
+    assert len(backend.expiry) == 1
+
+def test_local_backend_evicts_least_recently_active():
+    backend = LocalSessionBackend(max_sessions=3)
+    for index in range(3):
+        backend.create(str(index), 'user', now=index, timeout=100)
+    backend.touch('0', now=5, timeout=100)
+    backend.create('3', 'user', now=6, timeout=100)
+
+    assert set(backend.sessions) == {'0', '2', '3'}
+
+def test_revoked_sessions_do_not_accumulate_in_the_index():
+    backend = LocalSessionBackend()
+    for index in range(1000):
+        backend.create(str(index), 'user', now=0, timeout=100)
+        backend.revoke(str(index))
+
+    assert backend.sessions == {}
+    assert len(backend.expiry) <= 65
+
+@pytest.fixture
+def shared_memory_name():
+    return f"guardian_test_{uuid.uuid4().hex[:8]}"
+
+def test_shared_memory_backend_shares_sessions(shared_memory_name):
+    first = SharedMemorySessionBackend(name=shared_memory_name, slots=64)
+    second = SharedMemorySessionBackend(name=shared_memory_name, slots=64)
+    try:
+        first.create('session', 'alice', now=0, timeout=10)
+        assert second.touch('session', now=8, timeout=10)
+        assert first.touch('session', now=16, timeout=10)
+        assert not first.touch('other', now=16, timeout=10)
+        second.revoke('session')
+        assert not first.touch('session', now=17, timeout=10)
+
+        with pytest.raises(ValueError):
+            first.create('long', 'x' * 65, now=0, timeout=10)
+    finally:
+        second.close()
+        first.close()
+
+def test_shared_memory_backend_evicts_when_full(shared_memory_name):
+    backend = SharedMemorySessionBackend(name=shared_memory_name, slots=8)
+    try:
+        for index in range(20):
+            backend.create(str(index), 'user', now=index, timeout=100)
+        assert backend.touch('19', now=20, timeout=100)
+        assert not backend.touch('0', now=20, timeout=100)
+    finally:
+        backend.close()
+
+def test_redis_backend_stores_sessions_with_ttl(resp_server):
+    backend = RedisSessionBackend(port=resp_server.server_address[1])
+    try:
+        manager = SessionManager(session_timeout=60, backend=backend)
+        session_id = manager.create_session('alice')
+
+        assert resp_server.data[f"guardian:session:{session_id}".encode()] == b'alice'
+        assert manager.validate_session(session_id)
+        assert resp_server.commands[-1][0] == b'PEXPIRE'
+        manager.revoke_session(session_id)
+        assert not manager.validate_session(session_id)
+    finally:
+        backend.close()
+
+def test_unknown_session_backend_is_rejected():
+    assert create_session_backend({}) is None
+    with pytest.raises(ValueError):
+        create_session_backend({'backend': 'memcached'})
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+import pytest
+
+from app.infrastructure.response_cache import ResponseCache
+from app.infrastructure.single_flight import RequestCoalescer
+from app.infrastructure.single_flight import SingleFlight
+from app.interfaces import api
+from app.main import app
+
+
+def test_concurrent_calls_share_one_call():
+    flights = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return calls
+
+    async def scenario():
+        return await asyncio.gather(*(flights.do('key', fetch) for _ in range(5)))
+
+    results = asyncio.run(scenario())
+    assert calls == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert {result for result, _ in results} == {1}
+    assert not flights.in_flight('key')
+
+def test_exceptions_are_shared():
+    flights = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ConnectionError('backend down')
+
+    async def scenario():
+        return await asyncio.gather(*(flights.do('key', fail) for _ in range(3)), return_exceptions=True)
+
+    assert all(isinstance(result, ConnectionError) for result in asyncio.run(scenario()))
+
+def test_waiters_retry_when_the_leader_is_cancelled():
+    flights = SingleFlight()
+    calls = 0
+
+    async def fetch():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.02)
+        return calls
+
+    async def scenario():
+        leader = asyncio.create_task(flights.do('key', fetch))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(flights.do('key', fetch))
+        await asyncio.sleep(0.005)
+        leader.cancel()
+        return await waiter
+
+    # The waiter started its own call instead of failing with the leader
+    assert asyncio.run(scenario()) == (2, False)
+
+def test_key_normalization_and_credentials():
+    coalescer = RequestCoalescer({'enabled': True, 'routes': ['/api/'], 'headers': ['accept']})
+
+    first = coalescer.key_for('GET', '/api/items', 'b=2&a=1', {'accept': 'application/json'})
+    assert first == coalescer.key_for('GET', '/api/items', 'a=1&b=2', {'accept': 'application/json', 'user-agent': 'x'})
+    assert first != coalescer.key_for('GET', '/api/items', 'a=1&b=2', {'accept': 'text/html'})
+    assert coalescer.key_for('POST', '/api/items', '', {}) is None
+    assert coalescer.key_for('GET', '/static/app.js', '', {}) is None
+    assert coalescer.key_for('GET', '/api/items', '', {'authorization': 'Bearer token'}) is None
+
+    # Credentials part of the key only coalesce requests of the same client
+    per_client = RequestCoalescer({'routes': ['/api/'], 'headers': ['authorization']})
+    assert per_client.key_for('GET', '/api/items', '', {'authorization': 'Bearer a'}) != \
+        per_client.key_for('GET', '/api/items', '', {'authorization': 'Bearer b'})
+
+@pytest.fixture
+def coalescing(backend, monkeypatch):
+    monkeypatch.setattr(api, 'request_coalescer', RequestCoalescer({'enabled': True, 'routes': ['/api/']}))
+    monkeypatch.setattr(api, 'response_cache', ResponseCache({'enabled': False}))
+    backend.cache_control = 'no-store'
+    backend.delay = 0.05
+    return backend
+
+def get_concurrently(url: str, count: int) -> list[httpx.Response]:
+    async def send():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app), base_url='http://gateway') as client:
+            return await asyncio.gather(*(client.get(url) for _ in range(count)))
+
+    return asyncio.run(send())
+
+def test_identical_uncacheable_requests_share_one_backend_request(coalescing):
+    responses = get_concurrently('/api/report', 10)
+
+    assert coalescing.calls == 1
+    assert {response.text for response in responses} == {'call 1 '}
+    assert all(response.status_code == 200 and 'x-cache' not in response.headers for response in responses)
+
+    get_concurrently('/other', 3)
+    assert coalescing.calls == 4
+
+def test_responses_setting_cookies_are_not_shared(coalescing):
+    coalescing.headers = {'set-cookie': 'session=abc'}
+    responses = get_concurrently('/api/login', 3)
+
+    assert coalescing.calls == 3
+    assert all(response.headers['set-cookie'] == 'session=abc' for response in responses)
@@ -0,0 +1,57 @@
+from __future__ import annotations
+
+import asyncio
+
+import httpx
+
+from app.infrastructure.upstream_pool import UpstreamPool
+
+SERVER = {'address': '127.0.0.1', 'port': 8001}
+
+def test_upstream_pool_reuses_client_per_backend():
+    pool = UpstreamPool({'servers': [SERVER]})
+    client = pool.client_for(SERVER)
+
+    assert pool.client_for(dict(SERVER)) is client
+    assert pool.client_for({'address': '127.0.0.1', 'port': 8002}) is not client
+    assert str(client.base_url) == 'http://127.0.0.1:8001'
+
+def test_upstream_pool_applies_per_backend_overrides():
+    pool = UpstreamPool({'connection_pool': {'max_connections': 10, 'read_timeout': 3}})
+    settings = pool._settings_for({**SERVER, 'connection_pool': {'max_connections': 2}})
+
+    assert settings['max_connections'] == 2
+    assert settings['read_timeout'] == 3
+    assert pool.client_for(SERVER).timeout.read == 3
+
+def test_upstream_pool_forwards_and_closes():
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(str(request.url))
+        return httpx.Response(200, json={'ok': True})
+
+    pool = UpstreamPool(transport=httpx.MockTransport(handler))
+
+    async def run():
+        response = await pool.client_for(SERVER).get('/items', params={'q': '1'})
+        await pool.aclose()
+        return response
+
+    response = asyncio.run(run())
+    assert response.json() == {'ok': True}
+    assert seen == ['http://127.0.0.1:8001/items?q=1']
+    assert pool.clients == {}
+
+def test_upstream_pool_stats_for_idle_backend():
+    pool = UpstreamPool()
+    pool.client_for(SERVER)
+
+    assert pool.stats() == {'127.0.0.1:8001': {'active': 0, 'idle': 0, 'waiting': 0}}
+    pool.update_metrics()
+
+def test_upstream_pool_stats_degrade_without_a_connection_pool():
+    pool = UpstreamPool(transport=httpx.MockTransport(lambda request: httpx.Response(200)))
+    pool.client_for(SERVER)
+
+    assert pool.stats() == {'127.0.0.1:8001': {'active': 0, 'idle': 0, 'waiting': 0}}
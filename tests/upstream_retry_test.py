@@ -0,0 +1,164 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from app.core.entities.gateway_entity import GatewayEntity
+from app.core.services.gateway_service import GatewayService
+from app.core.services.retry_policy import LatencyTracker
+from app.core.services.retry_policy import RetryBudget
+from app.infrastructure.upstream_pool import UpstreamPool
+from app.infrastructure.upstream_retry import send_with_retries
+
+SERVERS = [{'address': '10.0.0.1', 'port': 80}, {'address': '10.0.0.2', 'port': 80}]
+
+
+def make_service(health_check: bool = True, **retries) -> GatewayService:
+    return GatewayService(GatewayEntity(
+        name='Test Gateway', version='1.0.0', listen_address='0.0.0.0', listen_port=8080,
+        allowed_ips=[], blocked_ips=[],
+        load_balancing={
+            'enabled': True, 'strategy': 'least_connections', 'servers': SERVERS,
+            'health_check': {'enabled': health_check},
+            'retries': {'enabled': True, 'backoff': {'base': 0.001, 'max': 0.001}, **retries},
+        },
+        logging={'enabled': False},
+    ))
+
+class Backends:
+    """
+    Answers per backend address: an exception to raise, a status, and a delay.
+    """
+
+    def __init__(self, **behaviour):
+        self.behaviour = behaviour
+        self.calls: list[str] = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.host
+        self.calls.append(host)
+        error, status, delay = self.behaviour.get(host, (None, 200, 0.0))
+        if delay:
+            await asyncio.sleep(delay)
+        if error is not None:
+            raise error
+        return httpx.Response(status, text=host)
+
+def send(svc: GatewayService, backends: Backends, method: str = 'GET', body=None) -> tuple[dict, httpx.Response]:
+    async def scenario():
+        pool = UpstreamPool(transport=httpx.MockTransport(backends))
+        server, response = await send_with_retries(svc, pool, method, '/items', '', [], body)
+        await response.aread()
+        svc.release_server(server)
+        await response.aclose()
+        return server, response
+
+    return asyncio.run(scenario())
+
+def connections(svc: GatewayService) -> dict:
+    return svc.load_balancer.strategy.base_strategy.server_connections
+
+def test_retry_budget_allows_a_share_of_the_requests():
+    now = [0.0]
+    budget = RetryBudget(ratio=0.5, min_per_second=1, window=2, clock=lambda: now[0])
+    # Starts with the allowance of a full window
+    assert budget.withdraw() and budget.withdraw() and not budget.withdraw()
+    budget.deposit()
+    budget.deposit()
+    assert budget.withdraw() and not budget.withdraw()
+    now[0] = 1.0
+    assert budget.withdraw() and not budget.withdraw()
+
+def test_latency_tracker_estimates_the_percentile_of_recent_samples():
+    tracker = LatencyTracker(95, size=100, refresh=10, min_samples=20)
+    for latency in range(19):
+        tracker.record(latency / 1000)
+    assert tracker.estimate() is None
+    for latency in range(19, 100):
+        tracker.record(latency / 1000)
+    assert tracker.estimate() == pytest.approx(0.095)
+    # Older samples are replaced
+    for _ in range(100):
+        tracker.record(0.001)
+    assert tracker.estimate() == 0.001
+
+def test_failed_attempt_is_retried_on_another_backend_and_reported():
+    svc = make_service()
+    backends = Backends(**{'10.0.0.1': (httpx.ConnectError('refused'), 200, 0.0)})
+
+    server, response = send(svc, backends)
+
+    assert backends.calls == ['10.0.0.1', '10.0.0.2']
+    assert server['address'] == '10.0.0.2' and response.text == '10.0.0.2'
+    # handle_server_failure took the failed backend out of the rotation
+    assert svc.load_balancer.strategy.server_health == {'10.0.0.1:80': False, '10.0.0.2:80': True}
+
+def test_least_connections_retries_on_a_busier_backend():
+    # Without health checks, the failed backend is still the least loaded one
+    svc = make_service(health_check=False, max_attempts=2)
+    for _ in range(3):
+        svc.load_balancer.increment_connection(SERVERS[1])
+    backends = Backends(**{'10.0.0.1': (httpx.ConnectError('refused'), 200, 0.0)})
+
+    server, response = send(svc, backends)
+
+    assert backends.calls == ['10.0.0.1', '10.0.0.2']
+    assert response.text == '10.0.0.2'
+    assert svc.load_balancer.strategy.server_connections == {'10.0.0.1:80': 0, '10.0.0.2:80': 3}
+
+def test_slow_request_is_hedged_on_another_backend():
+    svc = make_service(hedging={'enabled': True, 'max_delay': 0.05})
+    backends = Backends(**{'10.0.0.1': (None, 200, 1.0)})
+
+    started = time.perf_counter()
+    server, response = send(svc, backends)
+
+    assert time.perf_counter() - started < 0.5
+    assert response.text == '10.0.0.2'
+    assert backends.calls == ['10.0.0.1', '10.0.0.2']
+    # The losing attempt was cancelled and released, without counting as a failure
+    assert connections(svc) == {'10.0.0.1:80': 0, '10.0.0.2:80': 0}
+    assert all(svc.load_balancer.strategy.server_health.values())
+
+def test_per_try_and_overall_timeouts():
+    backends = Backends(**{'10.0.0.1': (None, 200, 1.0), '10.0.0.2': (None, 200, 1.0)})
+    svc = make_service(per_try_timeout=0.05)
+    with pytest.raises(HTTPException) as error:
+        send(svc, backends)
+    assert error.value.status_code == 504
+    assert backends.calls == ['10.0.0.1', '10.0.0.2']
+
+    backends.calls.clear()
+    svc = make_service(timeout=0.05)
+    started = time.perf_counter()
+    with pytest.raises(HTTPException) as error:
+        send(svc, backends)
+    assert error.value.status_code == 504 and time.perf_counter() - started < 0.5
+    assert backends.calls == ['10.0.0.1']
+    assert connections(svc) == {'10.0.0.1:80': 0, '10.0.0.2:80': 0}
+
+def test_retryable_status_is_returned_when_every_attempt_gets_it():
+    svc = make_service(max_attempts=2)
+    backends = Backends(**{'10.0.0.1': (None, 503, 0.0), '10.0.0.2': (None, 503, 0.0)})
+
+    server, response = send(svc, backends)
+
+    assert response.status_code == 503 and len(backends.calls) == 2
+    assert connections(svc) == {'10.0.0.1:80': 0, '10.0.0.2:80': 0}
+
+def test_requests_with_a_body_or_not_idempotent_are_sent_once():
+    backends = Backends(**{'10.0.0.1': (httpx.ConnectError('refused'), 200, 0.0)})
+
+    async def body():
+        yield b'{}'
+
+    with pytest.raises(HTTPException) as error:
+        send(make_service(), backends, 'PUT', body())
+    assert error.value.status_code == 502
+    with pytest.raises(HTTPException):
+        send(make_service(), backends, 'POST')
+    assert backends.calls == ['10.0.0.1', '10.0.0.1']
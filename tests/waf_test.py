@@ -1,6 +1,8 @@
 # tests/test_waf.py
 from __future__ import annotations
 
+import time
+
 import pytest
 from fastapi import HTTPException
 
@@ -56,3 +58,89 @@ def test_waf_blocks_xss():
 
     assert excinfo.value.status_code == 403
     assert 'Blocked by WAF rule: Block XSS' in str(excinfo.value.detail)
+
+def test_waf_reports_matching_rule_among_many():
+    waf_config = {
+        'enabled': True,
+        'rules': [
+            {'name': 'Block SQL Injection', 'pattern': 'SELECT|UPDATE|DELETE|INSERT', 'action': 'block'},
+            {'name': 'Block Traversal', 'pattern': r'\.\./', 'action': 'block'},
+            {'name': 'Block Selector', 'pattern': 'SEL|SELECTOR', 'action': 'block'},
+            {'name': 'Block Repeats', 'pattern': r'(\w)\1{5}', 'action': 'block'},
+        ],
+    }
+    waf = WAF(waf_config)
+
+    assert waf.rule_set.match('GET /home HTTP/1.1') is None
+    assert waf.rule_set.match('id=1; select * from users')['name'] == 'Block SQL Injection'
+    assert waf.rule_set.match('GET /a/../../etc/passwd')['name'] == 'Block Traversal'
+    assert waf.rule_set.match('css selector')['name'] == 'Block SQL Injection'
+    assert waf.rule_set.match('sel=1')['name'] == 'Block Selector'
+    assert waf.rule_set.match('aaaaaaaa')['name'] == 'Block Repeats'
+
+def test_waf_disabled_allows_everything():
+    waf = WAF({'enabled': False, 'rules': [{'name': 'Block XSS', 'pattern': '<script>', 'action': 'block'}]})
+
+    waf.inspect_request('<script>')
+
+def test_waf_inspects_only_declared_zones():
+    waf_config = {
+        'enabled': True,
+        'max_body_size': 16,
+        'rules': [
+            {'name': 'Block SQL Injection', 'pattern': 'SELECT|DROP', 'action': 'block', 'zones': ['query', 'body']},
+            {'name': 'Block Scanner', 'pattern': r'sqlmap/\d', 'action': 'block', 'zones': ['header:user-agent']},
+        ],
+    }
+    waf = WAF(waf_config)
+
+    # Neither the path nor unrelated headers are inspected
+    waf.inspect_zones(path='/select', headers=[(b'x-note', b'sqlmap/1')])
+    # Content past max_body_size is not inspected
+    waf.inspect_zones(body=b'{"padding": "..."} DROP TABLE users')
+
+    with pytest.raises(HTTPException) as excinfo:
+        waf.inspect_zones(query='q=1 union select 1')
+    assert 'Block SQL Injection' in str(excinfo.value.detail)
+
+    with pytest.raises(HTTPException) as excinfo:
+        waf.inspect_zones(headers=[(b'user-agent', b'SQLMap/1.7')])
+    assert 'Block Scanner' in str(excinfo.value.detail)
+
+    assert waf.body_inspection_limit == 16
+
+def test_waf_rejects_unknown_zone():
+    with pytest.raises(ValueError):
+        WAF({'enabled': True, 'rules': [{'name': 'Bad', 'pattern': 'x', 'action': 'block', 'zones': ['cookie']}]})
+
+def test_waf_keeps_rules_that_cannot_be_merged_apart():
+    waf_config = {
+        'enabled': True,
+        'rules': [
+            {'name': 'Block Card Numbers', 'pattern': r'\d{12,19}', 'action': 'block'},
+            {'name': 'Block Tagged Digit', 'pattern': r'(?P<n>\w)\d', 'action': 'block', 'zones': ['query']},
+            {'name': 'Block Tagged Dash', 'pattern': r'(?P<n>\w)-', 'action': 'block', 'zones': ['query']},
+            {'name': 'Block Digit Letter', 'pattern': r'(?i)\d\w', 'action': 'block', 'zones': ['path']},
+        ],
+    }
+    waf = WAF(waf_config)
+
+    assert waf.rule_set.match('1234567890123')['name'] == 'Block Card Numbers'
+    assert waf.query_rules.match('x-y')['name'] == 'Block Tagged Dash'
+    assert waf.query_rules.match('a1')['name'] == 'Block Tagged Digit'
+    assert waf.path_rules.match('/9z')['name'] == 'Block Digit Letter'
+    assert waf.path_rules.match('/home') is None
+
+def test_waf_confirms_each_rule_once_however_often_its_literal_repeats():
+    waf = WAF({
+        'enabled': True,
+        'max_body_size': 256 * 1024,
+        'rules': [{'name': 'Block XSS', 'pattern': r'<script[^>]*>\s*alert', 'action': 'block', 'zones': ['body']}],
+    })
+
+    started = time.perf_counter()
+    waf.inspect_zones(body=b'<script> ok ' * 16384)
+    assert time.perf_counter() - started < 1.0
+
+    with pytest.raises(HTTPException):
+        waf.inspect_zones(body=b'<script> ok ' * 1000 + b'<script>alert(1)')